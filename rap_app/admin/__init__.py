@@ -11,8 +11,9 @@ from .commentaires_admin import CommentaireAdmin
 from .historiques_formations_admin import HistoriqueFormationAdmin
 from .rapports_admin import RapportAdmin
 from .parametres_admin import ParametreAdmin
-from .recherches_admin import RechercheAdmin
+from .recherches_admin import AgregatRechercheAdmin, RechercheAdmin
 from .entreprises_admin import EntrepriseAdmin  # Nouveau
 from .evenements_admin import EvenementAdmin    # Nouveau
 from .documents_admin import DocumentAdmin      # Nouveau
+from .taches_admin import TacheAdmin
 
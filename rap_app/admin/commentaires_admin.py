@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from ..models.commentaires import Commentaire
+from ..utils.recalculs_differes import recalculs_differes
 
 
 Utilisateur = get_user_model()
@@ -54,4 +55,9 @@ class CommentaireAdmin(admin.ModelAdmin):
             else:
                 obj.utilisateur = Utilisateur.objects.get(pk=request.user.pk)  # Convertit en `Utilisateur`
         
-        obj.save()
\ No newline at end of file
+        obj.save()
+
+    def delete_queryset(self, request, queryset):
+        """Suppression groupée : les formations concernées sont recalculées une seule fois chacune."""
+        with recalculs_differes():
+            super().delete_queryset(request, queryset)
@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from ..models import Document, Formation
+from ..utils import miniatures
 
 
 @admin.register(Document)
@@ -65,10 +66,12 @@ class DocumentAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         """
-        Affiche un aperçu de l'image si le document est de type `image`.
+        Affiche la miniature du document (image ou première page d'un PDF), générée en tâche de fond.
         """
-        if obj.type_document == Document.IMAGE and obj.fichier:
-            return format_html('<img src="{}" width="150" style="border:1px solid #ddd; padding:5px;"/>', obj.fichier.url)
+        if obj.miniature:
+            return format_html('<img src="{}" width="150" style="border:1px solid #ddd; padding:5px;"/>', obj.miniature.url)
+        if obj.fichier and miniatures.apercu_disponible(obj.fichier.name):
+            return "Aperçu en cours de génération"
         return "Aperçu non disponible"
     
     image_preview.short_description = "Aperçu"
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import reverse
 from django.utils.html import format_html
 from ..models import Evenement
+from ..utils.recalculs_differes import recalculs_differes
 
 
 @admin.register(Evenement)
@@ -46,4 +47,9 @@ class EvenementAdmin(admin.ModelAdmin):
             preview = obj.details[:50] + ('...' if len(obj.details) > 50 else '')
             return preview
         return "-"
-    details_preview.short_description = 'Détails'
\ No newline at end of file
+    details_preview.short_description = 'Détails'
+
+    def delete_queryset(self, request, queryset):
+        """Suppression groupée : les formations concernées sont recalculées une seule fois chacune."""
+        with recalculs_differes():
+            super().delete_queryset(request, queryset)
@@ -1,8 +1,30 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
-from django.db.models import F, Sum
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import timedelta
 
 from ..models.formations import Formation
+from ..models.rapport import Rapport
+from ..models.taches import Tache
+from ..utils.import_formations import ErreurImport, ImportFormations
+from ..utils.recalculs_differes import recalculs_differes
+
+
+# Nombre maximal d'erreurs de lignes détaillées après un import
+ERREURS_IMPORT_AFFICHEES = 20
+
+
+class ImportFormationsForm(forms.Form):
+    """Formulaire d'envoi d'un fichier de formations à importer"""
+    fichier = forms.FileField(
+        label="Fichier CSV ou XLSX",
+        help_text="Export Kairos ou tableau des offres : les formations existantes sont retrouvées par numéro Kairos, sinon par numéro d'offre."
+    )
 
 @admin.register(Formation)
 class FormationAdmin(admin.ModelAdmin):
@@ -43,7 +65,9 @@ class FormationAdmin(admin.ModelAdmin):
     # Actions personnalisées
     actions = [
         'marquer_convocation_envoyee', 
-        'reset_convocation_envoyee'
+        'reset_convocation_envoyee',
+        'generer_rapports_mensuels',
+        'recalculer_indicateurs',
     ]
     
     # Champs pour édition rapide depuis la liste
@@ -102,12 +126,16 @@ class FormationAdmin(admin.ModelAdmin):
                 'assistante', 
                 'nombre_evenements',
                 'dernier_commentaire',
+                'saturation',
                 'entreprises'
             ),
             'classes': ('collapse',)  # Cette section est rétractable
         })
     )
     
+    # Maintenus par les signaux des commentaires
+    readonly_fields = ('dernier_commentaire', 'saturation')
+    
     # Sauvegarde automatique des ManyToMany relations
     save_on_top = True
     
@@ -118,7 +146,7 @@ class FormationAdmin(admin.ModelAdmin):
     
     def places_dispo_display(self, obj):
         """Affiche le nombre de places disponibles avec formatage"""
-        places = obj.get_places_disponibles()
+        places = obj.places_disponibles
         color = 'green' if places > 5 else 'orange' if places > 0 else 'red'
         return format_html('<span style="color: {};">{}</span>', color, places)
     places_dispo_display.short_description = "Places disponibles"
@@ -126,7 +154,7 @@ class FormationAdmin(admin.ModelAdmin):
     
     def taux_saturation_display(self, obj):
         """Affiche le taux de saturation avec une barre de progression"""
-        taux = obj.get_taux_saturation()
+        taux = obj.taux_saturation
         color = 'green' if taux < 70 else 'orange' if taux < 95 else 'red'
         return format_html(
             '<div style="width:100px; border:1px solid #ccc;">'
@@ -151,17 +179,73 @@ class FormationAdmin(admin.ModelAdmin):
         self.message_user(request, f"Statut d'envoi des convocations réinitialisé pour {updated} formations.")
     reset_convocation_envoyee.short_description = "Réinitialiser statut d'envoi des convocations"
     
-    # Surcharge pour ajouter des annotations
-    def get_queryset(self, request):
-        """Surcharge pour ajouter des calculs agrégés à la requête"""
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(
-            places_disponibles=F('prevus_crif') + F('prevus_mp') - F('inscrits_crif') - F('inscrits_mp'),
-            taux_saturation=100 * (F('inscrits_crif') + F('inscrits_mp')) / 
-                           (F('prevus_crif') + F('prevus_mp'))
+    # Actions longues, confiées à une tâche de fond (voir manage.py executer_taches)
+    
+    def generer_rapports_mensuels(self, request, queryset):
+        """Génère en arrière-plan les rapports du mois en cours pour les formations sélectionnées"""
+        aujourd_hui = timezone.now().date()
+        debut = aujourd_hui.replace(day=1)
+        fin = (debut + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        tache = Tache.objects.mettre_en_file('generer_rapports', {
+            'periode': Rapport.MENSUEL,
+            'date_debut': debut.isoformat(),
+            'date_fin': fin.isoformat(),
+            'formations': list(queryset.values_list('id', flat=True)),
+        }, utilisateur=request.user)
+        self.message_user(request, f"Génération des rapports mensuels lancée en arrière-plan (tâche n°{tache.pk}).")
+    generer_rapports_mensuels.short_description = "Générer les rapports du mois (arrière-plan)"
+    
+    def recalculer_indicateurs(self, request, queryset):
+        """Recalcule en arrière-plan les indicateurs de remplissage des formations sélectionnées"""
+        tache = Tache.objects.mettre_en_file(
+            'recalculer_indicateurs', {'formations': list(queryset.values_list('id', flat=True))}, utilisateur=request.user
         )
-        return queryset
-
+        self.message_user(request, f"Recalcul des indicateurs lancé en arrière-plan (tâche n°{tache.pk}).")
+    recalculer_indicateurs.short_description = "Recalculer les indicateurs (arrière-plan)"
+    
+    def delete_queryset(self, request, queryset):
+        """Suppression groupée : les commentaires et événements supprimés en cascade ne recalculent rien ligne par ligne."""
+        with recalculs_differes():
+            super().delete_queryset(request, queryset)
+    
+    # Import en masse depuis un fichier (voir aussi manage.py import_formations)
+    
+    def get_urls(self):
+        urls = [
+            path('importer/', self.admin_site.admin_view(self.importer_view), name='rap_app_formation_importer'),
+        ]
+        return urls + super().get_urls()
+    
+    def importer_view(self, request):
+        """Importe un fichier CSV / XLSX de formations et résume le résultat (créations, mises à jour, erreurs)"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:rap_app_formation_changelist')
+        
+        form = ImportFormationsForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            fichier = form.cleaned_data['fichier']
+            try:
+                rapport = ImportFormations(request.user).importer(fichier, fichier.name)
+            except ErreurImport as erreur:
+                form.add_error('fichier', str(erreur))
+            else:
+                niveau = messages.WARNING if rapport['erreurs'] else messages.SUCCESS
+                self.message_user(request, (
+                    f"{rapport['lignes']} ligne(s) lue(s) : {rapport['crees']} formation(s) créée(s), "
+                    f"{rapport['mis_a_jour']} mise(s) à jour, {len(rapport['erreurs'])} erreur(s)."
+                ), niveau)
+                for numero, message in rapport['erreurs'][:ERREURS_IMPORT_AFFICHEES]:
+                    self.message_user(request, f"Ligne {numero} : {message}", messages.ERROR)
+                return redirect('admin:rap_app_formation_changelist')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Importer des formations",
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/rap_app/formation/importer.html', context)
+    
     # Statistiques personnalisées
     def changelist_view(self, request, extra_context=None):
         """Ajout de statistiques en haut de la liste des formations"""
@@ -174,8 +258,8 @@ class FormationAdmin(admin.ModelAdmin):
             # Calculer les statistiques globales
             stats = queryset.aggregate(
                 total_formations=Sum('id', distinct=True),
-                total_places=Sum(F('prevus_crif') + F('prevus_mp')),
-                total_inscrits=Sum(F('inscrits_crif') + F('inscrits_mp')),
+                total_places=Sum('total_places'),
+                total_inscrits=Sum('total_inscrits'),
             )
             
             # Ajouter les statistiques au contexte
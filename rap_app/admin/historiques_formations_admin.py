@@ -59,6 +59,8 @@ class HistoriqueFormationAdmin(admin.ModelAdmin):
         "mois",
         "annee",
         "details",
+        "changements",
+        "instantane",
         "created_at",
         "updated_at",
     )
@@ -76,7 +78,7 @@ class HistoriqueFormationAdmin(admin.ModelAdmin):
             "fields": ("semaine", "mois", "annee")
         }),
         ("Détails Supplémentaires", {
-            "fields": ("details",),
+            "fields": ("details", "changements", "instantane"),
             "classes": ("collapse",)
         }),
         ("Métadonnées", {
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from ..models.recherches import Recherche
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+from ..models.recherches import AgregatRecherche, Recherche
+from ..utils import referentiel
 
 
 @admin.register(Recherche)
@@ -57,3 +60,59 @@ class RechercheAdmin(admin.ModelAdmin):
         return "✅ Oui" if obj.a_trouve_resultats else "❌ Non"
     a_trouve_resultats_display.short_description = "Résultats trouvés"
 
+
+
+@admin.register(AgregatRecherche)
+class AgregatRechercheAdmin(admin.ModelAdmin):
+    """
+    Agrégats quotidiens des recherches (calculés par `manage.py agreger_recherches`), en lecture seule.
+    """
+
+    list_display = ("jour", "nb_recherches", "taux_sans_resultat_display", "temps_p50", "temps_p95", "temps_p99")
+    date_hierarchy = "jour"
+    ordering = ("-jour",)
+    list_per_page = 31
+
+    readonly_fields = (
+        "jour", "nb_recherches", "nb_sans_resultat", "temps_p50", "temps_p95", "temps_p99",
+        "termes_display", "filtres_display",
+    )
+    fieldsets = (
+        ("Volume", {
+            "fields": ("jour", "nb_recherches", "nb_sans_resultat")
+        }),
+        ("Temps d'exécution (ms)", {
+            "fields": ("temps_p50", "temps_p95", "temps_p99")
+        }),
+        ("Termes et filtres", {
+            "fields": ("termes_display", "filtres_display")
+        }),
+    )
+
+    def taux_sans_resultat_display(self, obj):
+        """Part des recherches sans résultat."""
+        return f"{obj.taux_sans_resultat:.1f} %"
+    taux_sans_resultat_display.short_description = "Sans résultat"
+
+    def termes_display(self, obj):
+        """Termes les plus fréquents, avec le nombre de recherches sans résultat."""
+        return format_html_join(
+            mark_safe('<br>'), "{} : {} ({} sans résultat)", (tuple(terme) for terme in obj.termes[:20])
+        ) or "-"
+    termes_display.short_description = "Termes les plus fréquents"
+
+    def filtres_display(self, obj):
+        """Filtres les plus utilisés, libellés lus dans le référentiel."""
+        tables = {'centre': referentiel.centres, 'type_offre': referentiel.types_offre, 'statut': referentiel.statuts}
+        return format_html_join(mark_safe('<br>'), "{} : {} ({})", (
+            (nom, tables[nom].libelle(pk, defaut=f"#{pk}"), nombre)
+            for nom, lignes in obj.filtres.items() for pk, nombre in lignes[:5]
+        )) or "-"
+    filtres_display.short_description = "Filtres les plus utilisés"
+
+    def has_add_permission(self, request):
+        """Les agrégats sont calculés, jamais saisis."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,50 @@
+from django.contrib import admin
+from django.utils.html import format_html
+
+from ..models.taches import Tache
+
+
+@admin.register(Tache)
+class TacheAdmin(admin.ModelAdmin):
+    """
+    Suivi des tâches de fond (lecture seule : les tâches sont créées par l'application
+    et exécutées par `manage.py executer_taches`).
+    """
+
+    # ✅ Affichage des principales informations dans la liste
+    list_display = ("id", "type_tache", "statut", "progression_display", "tentatives", "utilisateur", "created_at", "fin_execution")
+
+    # ✅ Filtres et recherche
+    list_filter = ("statut", "type_tache", "created_at")
+    search_fields = ("type_tache", "message", "utilisateur__username")
+
+    # ✅ Relance manuelle des tâches en échec
+    actions = ["relancer"]
+
+    readonly_fields = (
+        "type_tache", "parametres", "statut", "utilisateur", "executer_apres", "tentatives", "max_tentatives",
+        "executeur", "debut_execution", "fin_execution", "progression", "message", "resultat", "fichier",
+        "erreur", "created_at", "updated_at",
+    )
+
+    def progression_display(self, obj):
+        """Barre de progression de la tâche"""
+        return format_html(
+            '<div style="width:100px; background-color:#f1f1f1; border-radius:3px;">'
+            '<div style="width:{}px; background-color:#17a2b8; height:10px; border-radius:3px;"></div>'
+            '</div>{}%',
+            obj.progression, obj.progression
+        )
+    progression_display.short_description = "Progression"
+
+    def relancer(self, request, queryset):
+        """Remet en file les tâches sélectionnées en échec"""
+        from django.utils import timezone
+        relancees = queryset.filter(statut=Tache.ECHEC).update(
+            statut=Tache.EN_ATTENTE, tentatives=0, executer_apres=timezone.now(), erreur='', message=''
+        )
+        self.message_user(request, f"{relancees} tâche(s) remise(s) en file.")
+    relancer.short_description = "Relancer les tâches en échec"
+
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class RapAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rap_app'
+
+    def ready(self):
+        """Connecte les signaux qui ne sont pas déclarés dans les modules de modèles et enregistre les tâches de fond."""
+        from .utils import index_recherche, referentiel, versions_cache
+        index_recherche.connecter_signaux()
+        referentiel.connecter_signaux()
+        versions_cache.connecter_signaux()
+
+        # Enregistre les traitements exécutables en tâche de fond
+        from . import taches  # noqa: F401
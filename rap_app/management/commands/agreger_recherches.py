@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...models import AgregatRecherche
+
+
+class Command(BaseCommand):
+    """
+    Agrège les recherches des journées terminées (une ligne `AgregatRecherche` par jour),
+    puis supprime les recherches brutes agrégées plus anciennes que la durée de rétention.
+    À planifier chaque nuit (cron). Exemples :
+    - `python manage.py agreger_recherches`
+    - `python manage.py agreger_recherches --retention 7`
+    - `python manage.py agreger_recherches --sans-purge`
+    """
+    help = "Agrège les recherches par jour et purge les recherches brutes agrégées."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention', type=int, default=settings.RAP_APP_RECHERCHES_RETENTION_JOURS,
+            help="Nombre de jours pendant lesquels les recherches brutes agrégées sont conservées."
+        )
+        parser.add_argument('--sans-purge', action='store_true', help="Conserve toutes les recherches brutes.")
+
+    def handle(self, *args, **options):
+        agreges = AgregatRecherche.objects.agreger()
+        self.stdout.write(self.style.SUCCESS(f"{agreges} journée(s) agrégée(s)."))
+
+        if not options['sans_purge']:
+            supprimees = AgregatRecherche.objects.purger(max(options['retention'], 0))
+            self.stdout.write(self.style.SUCCESS(f"{supprimees} recherche(s) brute(s) supprimée(s)."))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...models import Tache
+from ...utils import taches
+
+
+class Command(BaseCommand):
+    """
+    Worker des tâches de fond : réserve les tâches en attente (verrouillage ligne par ligne) et les exécute.
+    Exemples :
+    - `python manage.py executer_taches` (boucle infinie, à lancer sous un superviseur)
+    - `python manage.py executer_taches --une-fois` (vide la file puis s'arrête, ex: depuis cron)
+    """
+    help = "Exécute les tâches de fond en attente."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help="S'arrête dès que la file est vide.")
+        parser.add_argument('--intervalle', type=float, default=2.0, help="Secondes d'attente lorsque la file est vide.")
+        parser.add_argument('--max-taches', type=int, default=0, help="Nombre maximal de tâches avant arrêt (0 : illimité).")
+
+    def handle(self, *args, **options):
+        executeur = taches.identifiant_executeur()
+        traitees = 0
+        self.stdout.write(f"Worker {executeur} démarré.")
+
+        try:
+            while not options['max_taches'] or traitees < options['max_taches']:
+                close_old_connections()
+                liberees = Tache.objects.liberer_bloquees()
+                if liberees:
+                    self.stdout.write(self.style.WARNING(f"{liberees} tâche(s) bloquée(s) remise(s) en file."))
+
+                tache = taches.traiter_suivante(executeur)
+                if tache is None:
+                    if options['une_fois']:
+                        break
+                    time.sleep(options['intervalle'])
+                    continue
+
+                traitees += 1
+                tache.refresh_from_db()
+                style = self.style.SUCCESS if tache.statut == Tache.TERMINEE else self.style.ERROR
+                self.stdout.write(style(f"{tache} : {tache.message or tache.get_statut_display()}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé.")
+
+        self.stdout.write(f"{traitees} tâche(s) traitée(s).")
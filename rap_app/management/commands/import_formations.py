@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.import_formations import TAILLE_LOT, ErreurImport, ImportFormations
+
+
+class Command(BaseCommand):
+    """
+    Importe (crée ou met à jour) des formations depuis un fichier CSV ou XLSX (export Kairos, tableau des offres).
+    Les formations existantes sont retrouvées par `num_kairos`, sinon par `num_offre`.
+    Exemples :
+    - `python manage.py import_formations offres_2025.xlsx`
+    - `python manage.py import_formations kairos.csv --utilisateur admin --taille-lot 1000`
+    """
+    help = "Importe des formations depuis un fichier CSV ou XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Chemin du fichier CSV ou XLSX.")
+        parser.add_argument('--utilisateur', help="Nom de l'utilisateur auquel attribuer les créations et l'historique.")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT, help="Nombre de lignes écrites par lot.")
+
+    def handle(self, *args, **options):
+        utilisateur = None
+        if options['utilisateur']:
+            try:
+                utilisateur = get_user_model().objects.get(username=options['utilisateur'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Utilisateur inconnu : {options['utilisateur']}")
+
+        debut = time.monotonic()
+        try:
+            with open(options['fichier'], 'rb') as fichier:
+                rapport = ImportFormations(utilisateur, options['taille_lot']).importer(fichier, options['fichier'])
+        except (OSError, ErreurImport) as erreur:
+            raise CommandError(str(erreur))
+        duree = time.monotonic() - debut
+
+        for numero, message in rapport['erreurs']:
+            self.stdout.write(self.style.ERROR(f"Ligne {numero} : {message}"))
+        self.stdout.write(
+            f"{rapport['lignes']} ligne(s) lue(s) en {duree:.1f} s "
+            f"({rapport['lignes'] / duree if duree else rapport['lignes']:.0f} lignes/s)."
+        )
+        style = self.style.WARNING if rapport['erreurs'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{rapport['crees']} formation(s) créée(s), {rapport['mis_a_jour']} mise(s) à jour, "
+            f"{len(rapport['erreurs'])} erreur(s)."
+        ))
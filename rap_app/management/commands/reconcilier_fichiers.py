@@ -0,0 +1,127 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...models import Document, Tache
+from ...utils.stockage import stockage_documents
+
+
+# Dossiers de MEDIA_ROOT gérés par l'application (voir les `upload_to` de Document et Tache)
+DOSSIERS_GERES = ('formations', 'taches')
+
+# Dossier des fichiers des documents (fichiers et miniatures), rangés par `stockage_documents`
+DOSSIER_DOCUMENTS = 'formations'
+
+
+def _lister_dossier(chemin):
+    """Fichiers (chemin, date de modification) et sous-dossiers d'un dossier, sans descendre dans l'arborescence."""
+    fichiers, sous_dossiers = [], []
+    try:
+        with os.scandir(chemin) as entrees:
+            for entree in entrees:
+                if entree.is_dir(follow_symlinks=False):
+                    sous_dossiers.append(entree.path)
+                elif entree.is_file(follow_symlinks=False):
+                    fichiers.append((entree.path, entree.stat(follow_symlinks=False).st_mtime))
+    except FileNotFoundError:
+        pass
+    return fichiers, sous_dossiers
+
+
+def parcourir(racines, travailleurs):
+    """
+    Parcourt les arborescences en parallèle (un dossier par tâche du pool)
+    et retourne `{chemin absolu: date de modification}` de tous les fichiers trouvés.
+    """
+    trouves = {}
+    with ThreadPoolExecutor(max_workers=travailleurs) as pool:
+        en_cours = {pool.submit(_lister_dossier, racine) for racine in racines}
+        while en_cours:
+            terminees, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+            for future in terminees:
+                fichiers, sous_dossiers = future.result()
+                trouves.update(fichiers)
+                en_cours |= {pool.submit(_lister_dossier, dossier) for dossier in sous_dossiers}
+    return trouves
+
+
+class Command(BaseCommand):
+    """
+    Rapproche les fichiers de MEDIA_ROOT des lignes `Document` (fichiers et miniatures) et `Tache` (exports) :
+    - fichiers orphelins : présents sur le disque mais référencés par aucune ligne
+      (transaction annulée après l'upload, suppression interrompue...) ;
+    - fichiers manquants : référencés par un document mais absents du disque.
+    Exemples :
+    - `python manage.py reconcilier_fichiers` (rapport seul)
+    - `python manage.py reconcilier_fichiers --supprimer-orphelins --age-minimum 1440`
+    """
+    help = "Détecte (et supprime) les fichiers orphelins et signale les fichiers manquants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supprimer-orphelins', action='store_true', help="Supprime les fichiers orphelins.")
+        parser.add_argument(
+            '--age-minimum', type=int, default=60,
+            help="Âge minimal (minutes) d'un fichier orphelin pour être supprimé : protège les uploads en cours."
+        )
+        parser.add_argument('--travailleurs', type=int, default=8, help="Nombre de dossiers parcourus en parallèle.")
+
+    def supprimer(self, nom, chemin):
+        """
+        Supprime un fichier orphelin. Un fichier des documents est libéré par le stockage par empreinte :
+        sa date ne dit rien d'une réutilisation récente (contenu déjà stocké, non réécrit), ses références
+        sont donc recomptées sous le verrou du fichier, dans la transaction de la suppression.
+        """
+        try:
+            if nom.startswith(f"{DOSSIER_DOCUMENTS}/"):
+                return stockage_documents.liberer(nom, champ=None)
+            os.remove(chemin)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def handle(self, *args, **options):
+        racine_media = os.path.abspath(settings.MEDIA_ROOT)
+        debut = time.monotonic()
+
+        references = set()
+        documents_par_fichier = {}
+        for pk, fichier, miniature in Document.objects.values_list('pk', 'fichier', 'miniature').iterator():
+            for nom in (fichier, miniature):
+                if nom:
+                    references.add(nom)
+            if fichier:
+                documents_par_fichier.setdefault(fichier, []).append(pk)
+        references.update(nom for nom in Tache.objects.exclude(fichier='').exclude(fichier__isnull=True)
+                          .values_list('fichier', flat=True).iterator())
+
+        trouves = parcourir([os.path.join(racine_media, dossier) for dossier in DOSSIERS_GERES], options['travailleurs'])
+        noms_trouves = {os.path.relpath(chemin, racine_media).replace(os.sep, '/'): chemin for chemin in trouves}
+
+        limite = time.time() - options['age_minimum'] * 60
+        orphelins = sorted(nom for nom in noms_trouves.keys() - references)
+        manquants = sorted(nom for nom in documents_par_fichier.keys() - noms_trouves.keys())
+
+        supprimes = 0
+        for nom in orphelins:
+            chemin = noms_trouves[nom]
+            recent = trouves[chemin] > limite
+            if options['verbosity'] >= 2 or (options['supprimer_orphelins'] and not recent):
+                self.stdout.write(f"Orphelin{' (récent, conservé)' if recent else ''} : {nom}")
+            if options['supprimer_orphelins'] and not recent and self.supprimer(nom, chemin):
+                supprimes += 1
+
+        for nom in manquants:
+            documents = ', '.join(f"#{pk}" for pk in documents_par_fichier[nom])
+            self.stdout.write(self.style.ERROR(f"Manquant : {nom} (document(s) {documents})"))
+
+        self.stdout.write(
+            f"{len(noms_trouves)} fichier(s) parcouru(s) en {time.monotonic() - debut:.1f} s, "
+            f"{len(references)} référence(s) en base."
+        )
+        style = self.style.WARNING if orphelins else self.style.SUCCESS
+        self.stdout.write(style(f"{len(orphelins)} fichier(s) orphelin(s), {supprimes} supprimé(s)."))
+        style = self.style.ERROR if manquants else self.style.SUCCESS
+        self.stdout.write(style(f"{len(manquants)} fichier(s) manquant(s)."))
@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import AgregatHistoriqueFormation
+
+
+class Command(BaseCommand):
+    """
+    Recalcule les agrégats de l'historique des formations (jour, semaine, mois) depuis l'historique brut.
+    À lancer après la migration qui les introduit, ou après des écritures en masse dans l'historique.
+    Exemples :
+    - `python manage.py reconstruire_agregats_historique`
+    - `python manage.py reconstruire_agregats_historique --depuis 2025-01-01`
+    """
+    help = "Recalcule les agrégats de l'historique des formations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depuis', help="Ne recalcule que les périodes contenant ou suivant cette date (AAAA-MM-JJ)."
+        )
+
+    def handle(self, *args, **options):
+        depuis = None
+        if options['depuis']:
+            try:
+                depuis = datetime.date.fromisoformat(options['depuis'])
+            except ValueError:
+                raise CommandError(f"Date invalide : {options['depuis']} (format attendu : AAAA-MM-JJ).")
+
+        total = AgregatHistoriqueFormation.objects.reconstruire(depuis)
+        self.stdout.write(self.style.SUCCESS(f"{total} agrégat(s) écrit(s)."))
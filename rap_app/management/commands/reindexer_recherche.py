@@ -0,0 +1,18 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from ...utils import index_recherche
+
+
+class Command(BaseCommand):
+    """
+    Reconstruit l'index de recherche plein texte (formations, commentaires, événements, documents).
+    Exemple : `python manage.py reindexer_recherche`
+    """
+    help = "Reconstruit l'index de recherche plein texte."
+
+    def handle(self, *args, **options):
+        index_recherche.creer_tables()
+        for label in index_recherche.CHAMPS_INDEXES:
+            total = index_recherche.reconstruire(apps.get_model(label))
+            self.stdout.write(self.style.SUCCESS(f"{label} : {total} objet(s) indexé(s)."))
@@ -0,0 +1,77 @@
+"""
+Middlewares de l'application RAP.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('rap_app.requetes_sql')
+
+# En-têtes de réponse exposant la mesure
+ENTETE_NOMBRE = 'X-Requetes-SQL'
+ENTETE_DUREE = 'X-Duree-SQL-Ms'
+
+# Nombre de requêtes au-delà duquel la mesure est journalisée en avertissement
+SEUIL_REQUETES_DEFAUT = 30
+
+
+class CompteurRequetes:
+    """
+    Wrapper d'exécution (`connection.execute_wrapper`) comptant les requêtes SQL et leur durée cumulée.
+    Fonctionne aussi avec `DEBUG = False` (contrairement à `connection.queries`).
+    """
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.nombre += 1
+
+    def mesurer(self):
+        """Context manager installant le compteur sur toutes les connexions configurées."""
+        pile = ExitStack()
+        for alias in connections:
+            pile.enter_context(connections[alias].execute_wrapper(self))
+        return pile
+
+
+class InstrumentationSQLMiddleware:
+    """
+    Mesure le nombre de requêtes SQL et leur durée totale pour chaque requête HTTP.
+
+    La mesure est ajoutée aux en-têtes de la réponse (`X-Requetes-SQL`, `X-Duree-SQL-Ms`)
+    et journalisée sur le logger `rap_app.requetes_sql` : en `DEBUG`, ou en `WARNING`
+    au-delà de `RAP_APP_SEUIL_REQUETES_SQL` requêtes.
+    Les requêtes exécutées pendant la diffusion d'une réponse en streaming ne sont pas comptées.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.seuil = getattr(settings, 'RAP_APP_SEUIL_REQUETES_SQL', SEUIL_REQUETES_DEFAUT)
+
+    def __call__(self, request):
+        compteur = CompteurRequetes()
+        with compteur.mesurer():
+            response = self.get_response(request)
+
+        duree_ms = round(compteur.duree * 1000, 2)
+        response[ENTETE_NOMBRE] = str(compteur.nombre)
+        response[ENTETE_DUREE] = str(duree_ms)
+
+        niveau = logging.WARNING if compteur.nombre > self.seuil else logging.DEBUG
+        logger.log(
+            niveau, "%s %s : %d requêtes SQL en %.2f ms",
+            request.method, request.path, compteur.nombre, duree_ms,
+            extra={'requetes_sql': compteur.nombre, 'duree_sql_ms': duree_ms, 'chemin': request.path},
+        )
+        return response
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:22
+
+from django.db import migrations, models
+from django.db.models.lookups import GreaterThan
+
+
+def backfill_indicateurs(apps, schema_editor):
+    """Calcule les indicateurs de remplissage des formations existantes en une seule requête."""
+    Formation = apps.get_model('rap_app', 'Formation')
+    total_places = models.F('prevus_crif') + models.F('prevus_mp')
+    total_inscrits = models.F('inscrits_crif') + models.F('inscrits_mp')
+
+    def restantes(prevus, inscrits):
+        return models.Case(
+            models.When(GreaterThan(prevus, inscrits), then=prevus - inscrits),
+            default=models.Value(0),
+            output_field=models.PositiveIntegerField(),
+        )
+
+    Formation.objects.update(
+        total_places=total_places,
+        total_inscrits=total_inscrits,
+        places_restantes_crif=restantes(models.F('prevus_crif'), models.F('inscrits_crif')),
+        places_restantes_mp=restantes(models.F('prevus_mp'), models.F('inscrits_mp')),
+        places_disponibles=restantes(total_places, total_inscrits),
+        taux_saturation=models.Case(
+            models.When(
+                GreaterThan(total_places, models.Value(0)),
+                then=models.ExpressionWrapper(
+                    models.Value(100.0) * total_inscrits / total_places, output_field=models.FloatField()
+                ),
+            ),
+            default=models.Value(0.0),
+            output_field=models.FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0012_document_utilisateur_alter_entreprise_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formation',
+            name='places_disponibles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Places disponibles'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='places_restantes_crif',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Places restantes CRIF'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='places_restantes_mp',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Places restantes MP'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='taux_saturation',
+            field=models.FloatField(default=0, editable=False, verbose_name='Taux de saturation (%)'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='total_inscrits',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total inscrits'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='total_places',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total places'),
+        ),
+        migrations.RunPython(backfill_indicateurs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='formation',
+            index=models.Index(fields=['total_places'], name='rap_app_for_total_p_6a14ba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formation',
+            index=models.Index(fields=['total_inscrits'], name='rap_app_for_total_i_0c3a1d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formation',
+            index=models.Index(fields=['places_disponibles'], name='rap_app_for_places__5bda10_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formation',
+            index=models.Index(fields=['taux_saturation'], name='rap_app_for_taux_sa_ca5ede_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+# Index créés par cette migration : table indexée -> champs (état figé de `rap_app.utils.index_recherche`)
+CHAMPS_INDEXES = {
+    'rap_app_formation': ('nom', 'num_offre', 'num_kairos'),
+    'rap_app_commentaire': ('contenu',),
+    'rap_app_evenement': ('details', 'description_autre'),
+    'rap_app_document': ('nom_fichier', 'source'),
+}
+
+
+def creer_index(apps, schema_editor):
+    """Crée les tables d'index plein texte et y indexe les objets existants."""
+    connection = schema_editor.connection
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+
+    quote = connection.ops.quote_name
+    for table_indexee, champs in CHAMPS_INDEXES.items():
+        table = quote(f"{table_indexee}_fts")
+        if connection.vendor == 'sqlite':
+            colonnes = ', '.join(champs)
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                f"USING fts5({colonnes}, tokenize='unicode61 remove_diacritics 2')"
+            )
+            schema_editor.execute(
+                f"INSERT INTO {table} (rowid, {colonnes}) "
+                f"SELECT id, {', '.join(f'COALESCE({champ}, %s)' for champ in champs)} FROM {quote(table_indexee)}",
+                [''] * len(champs)
+            )
+        else:
+            index = quote(f"{table_indexee}_fts_document_idx")
+            schema_editor.execute(f"CREATE TABLE IF NOT EXISTS {table} (id bigint PRIMARY KEY, document tsvector NOT NULL)")
+            schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING GIN (document)")
+            poids = ['A'] + ['B'] * (len(champs) - 1)
+            document = ' || '.join(
+                f"setweight(to_tsvector('french', COALESCE({champ}, '')), '{p}')" for champ, p in zip(champs, poids)
+            )
+            schema_editor.execute(f"INSERT INTO {table} (id, document) SELECT id, {document} FROM {quote(table_indexee)}")
+
+
+def supprimer_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for table_indexee in CHAMPS_INDEXES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(f'{table_indexee}_fts')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0013_formation_indicateurs_remplissage'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rap_app', '0014_index_recherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+                ('type_tache', models.CharField(db_index=True, max_length=100, verbose_name='Type de tâche')),
+                ('parametres', models.JSONField(blank=True, default=dict, verbose_name='Paramètres')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echec', 'Échec')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('executer_apres', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Exécutable à partir de')),
+                ('tentatives', models.PositiveIntegerField(default=0, verbose_name='Tentatives')),
+                ('max_tentatives', models.PositiveIntegerField(default=3, verbose_name='Nombre maximal de tentatives')),
+                ('executeur', models.CharField(blank=True, default='', max_length=255, verbose_name='Worker')),
+                ('debut_execution', models.DateTimeField(blank=True, null=True, verbose_name="Début d'exécution")),
+                ('fin_execution', models.DateTimeField(blank=True, null=True, verbose_name="Fin d'exécution")),
+                ('progression', models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)')),
+                ('message', models.CharField(blank=True, default='', max_length=255, verbose_name='Message')),
+                ('resultat', models.JSONField(blank=True, null=True, verbose_name='Résultat')),
+                ('fichier', models.FileField(blank=True, null=True, upload_to='taches/', verbose_name='Fichier produit')),
+                ('erreur', models.TextField(blank=True, default='', verbose_name='Dernière erreur')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='taches', to=settings.AUTH_USER_MODEL, verbose_name='Demandée par')),
+            ],
+            options={
+                'verbose_name': 'Tâche de fond',
+                'verbose_name_plural': 'Tâches de fond',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['statut', 'executer_apres'], name='rap_app_tac_statut_d1564c_idx'), models.Index(fields=['created_at'], name='rap_app_tac_created_459071_idx')],
+            },
+        ),
+    ]
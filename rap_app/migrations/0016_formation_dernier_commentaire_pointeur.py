@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_dernier_commentaire(apps, schema_editor):
+    """Fait pointer chaque formation vers son dernier commentaire (et sa dernière saturation) en une seule requête."""
+    Formation = apps.get_model('rap_app', 'Formation')
+    Commentaire = apps.get_model('rap_app', 'Commentaire')
+    commentaires = Commentaire.objects.filter(formation=models.OuterRef('pk')).order_by('-created_at', '-pk')
+    Formation.objects.update(
+        dernier_commentaire=models.Subquery(commentaires.values('pk')[:1]),
+        saturation=models.Subquery(commentaires.filter(saturation__isnull=False).values('saturation')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0015_tache'),
+    ]
+
+    operations = [
+        # L'ancienne copie texte du dernier commentaire est remplacée par une clé étrangère
+        migrations.RemoveField(
+            model_name='formation',
+            name='dernier_commentaire',
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='dernier_commentaire',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='rap_app.commentaire', verbose_name='Dernier commentaire'),
+        ),
+        migrations.AddField(
+            model_name='formation',
+            name='saturation',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Niveau de saturation (dernier commentaire, %)'),
+        ),
+        migrations.RunPython(backfill_dernier_commentaire, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:45
+
+from django.db import migrations, models
+import rap_app.utils.stockage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0016_formation_dernier_commentaire_pointeur'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='fichier',
+            field=models.FileField(db_index=True, storage=rap_app.utils.stockage.get_stockage_documents, upload_to='formations/documents/', verbose_name='Fichier'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:47
+
+from django.db import migrations, models
+import rap_app.utils.stockage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0017_document_stockage_dedoublonne'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='miniature',
+            field=models.FileField(blank=True, db_index=True, editable=False, null=True, storage=rap_app.utils.stockage.get_stockage_documents, upload_to='formations/miniatures/', verbose_name='Miniature'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_centre_type_offre(apps, schema_editor):
+    """Rattache l'historique existant au centre et au type d'offre actuels de sa formation."""
+    Formation = apps.get_model('rap_app', 'Formation')
+    HistoriqueFormation = apps.get_model('rap_app', 'HistoriqueFormation')
+    formation = Formation.objects.filter(pk=models.OuterRef('formation_id'))
+    HistoriqueFormation.objects.filter(formation__isnull=False).update(
+        centre=models.Subquery(formation.values('centre_id')[:1]),
+        type_offre=models.Subquery(formation.values('type_offre_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0018_document_miniature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiqueformation',
+            name='centre',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='rap_app.centre', verbose_name="Centre (au moment de l'écriture)"),
+        ),
+        migrations.AddField(
+            model_name='historiqueformation',
+            name='type_offre',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='rap_app.typeoffre', verbose_name="Type d'offre (au moment de l'écriture)"),
+        ),
+        migrations.CreateModel(
+            name='AgregatHistoriqueFormation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularite', models.CharField(choices=[('jour', 'Jour'), ('semaine', 'Semaine'), ('mois', 'Mois')], max_length=10, verbose_name='Granularité')),
+                ('debut_periode', models.DateField(verbose_name='Début de la période')),
+                ('nb_historiques', models.PositiveIntegerField(default=0, verbose_name="Nombre de lignes d'historique")),
+                ('nb_inscrits', models.PositiveIntegerField(default=0, verbose_name='Somme des inscrits')),
+                ('nb_formations', models.PositiveIntegerField(default=0, verbose_name='Nombre de formations distinctes')),
+                ('centre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rap_app.centre', verbose_name='Centre')),
+                ('type_offre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rap_app.typeoffre', verbose_name="Type d'offre")),
+            ],
+            options={
+                'verbose_name': "Agrégat de l'historique des formations",
+                'verbose_name_plural': "Agrégats de l'historique des formations",
+                'ordering': ['granularite', 'debut_periode'],
+                'indexes': [models.Index(fields=['granularite', 'debut_periode'], name='rap_app_agr_granula_da3300_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='agregathistoriqueformation',
+            constraint=models.UniqueConstraint(fields=('granularite', 'debut_periode', 'centre', 'type_offre'), name='agregat_historique_unique'),
+        ),
+        # Les agrégats sont ensuite calculés par `python manage.py reconstruire_agregats_historique`
+        migrations.RunPython(backfill_centre_type_offre, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0019_historique_agregats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiqueformation',
+            name='changements',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Champs modifiés (nouvelles valeurs)'),
+        ),
+        migrations.AddField(
+            model_name='historiqueformation',
+            name='instantane',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Instantané complet (point de contrôle)'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueformation',
+            index=models.Index(fields=['formation', 'created_at'], name='rap_app_his_formati_5da2df_idx'),
+        ),
+    ]
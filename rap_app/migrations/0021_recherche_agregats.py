@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0020_historique_changements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregatRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True, verbose_name='Jour')),
+                ('nb_recherches', models.PositiveIntegerField(default=0, verbose_name='Nombre de recherches')),
+                ('nb_sans_resultat', models.PositiveIntegerField(default=0, verbose_name='Recherches sans résultat')),
+                ('temps_p50', models.FloatField(blank=True, null=True, verbose_name="Temps d'exécution p50 (ms)")),
+                ('temps_p95', models.FloatField(blank=True, null=True, verbose_name="Temps d'exécution p95 (ms)")),
+                ('temps_p99', models.FloatField(blank=True, null=True, verbose_name="Temps d'exécution p99 (ms)")),
+                ('termes', models.JSONField(blank=True, default=list, verbose_name='Termes les plus fréquents')),
+                ('filtres', models.JSONField(blank=True, default=dict, verbose_name='Filtres utilisés')),
+            ],
+            options={
+                'verbose_name': 'Agrégat des recherches',
+                'verbose_name_plural': 'Agrégats des recherches',
+                'ordering': ['-jour'],
+            },
+        ),
+    ]
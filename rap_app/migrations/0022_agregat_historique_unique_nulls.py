@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:23
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def fusionner_doublons(apps, schema_editor):
+    """Fusionne les agrégats en double (centre ou type d'offre absent) avant la nouvelle contrainte."""
+    AgregatHistoriqueFormation = apps.get_model('rap_app', 'AgregatHistoriqueFormation')
+    conserves = {}
+    for agregat in AgregatHistoriqueFormation.objects.order_by('pk'):
+        cle = (agregat.granularite, agregat.debut_periode, agregat.centre_id, agregat.type_offre_id)
+        conserve = conserves.setdefault(cle, agregat)
+        if conserve is agregat:
+            continue
+        conserve.nb_historiques += agregat.nb_historiques
+        conserve.nb_inscrits += agregat.nb_inscrits
+        conserve.nb_formations = max(conserve.nb_formations, agregat.nb_formations)
+        conserve.save()
+        agregat.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0021_recherche_agregats'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='agregathistoriqueformation',
+            name='agregat_historique_unique',
+        ),
+        # Les valeurs exactes sont rétablies par `python manage.py reconstruire_agregats_historique`
+        migrations.RunPython(fusionner_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='agregathistoriqueformation',
+            constraint=models.UniqueConstraint(models.F('granularite'), models.F('debut_periode'), django.db.models.functions.comparison.Coalesce('centre', models.Value(0)), django.db.models.functions.comparison.Coalesce('type_offre', models.Value(0)), name='agregat_historique_unique'),
+        ),
+    ]
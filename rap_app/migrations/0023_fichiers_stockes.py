@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:30
+
+from django.db import migrations, models
+import django.utils.timezone
+import rap_app.utils.stockage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0022_agregat_historique_unique_nulls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichierStocke',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+                ('nom', models.CharField(max_length=255, unique=True, verbose_name='Nom stocké')),
+            ],
+            options={
+                'verbose_name': 'Fichier stocké',
+                'verbose_name_plural': 'Fichiers stockés',
+            },
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='fichier',
+            field=models.FileField(db_index=True, max_length=255, storage=rap_app.utils.stockage.get_stockage_documents, upload_to='formations/documents/', verbose_name='Fichier'),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='miniature',
+            field=models.FileField(blank=True, db_index=True, editable=False, max_length=255, null=True, storage=rap_app.utils.stockage.get_stockage_documents, upload_to='formations/miniatures/', verbose_name='Miniature'),
+        ),
+    ]
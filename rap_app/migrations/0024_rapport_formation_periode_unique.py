@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:56
+
+from django.db import migrations, models
+
+
+def supprimer_doublons(apps, schema_editor):
+    """Conserve le plus ancien rapport de chaque formation et période avant la nouvelle contrainte."""
+    Rapport = apps.get_model('rap_app', 'Rapport')
+    vus = set()
+    doublons = []
+    for pk, *cle in Rapport.objects.filter(formation__isnull=False).order_by('pk').values_list(
+        'pk', 'formation_id', 'periode', 'date_debut', 'date_fin'
+    ).iterator():
+        if tuple(cle) in vus:
+            doublons.append(pk)
+        vus.add(tuple(cle))
+    for debut in range(0, len(doublons), 500):
+        Rapport.objects.filter(pk__in=doublons[debut:debut + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rap_app', '0023_fichiers_stockes'),
+    ]
+
+    operations = [
+        migrations.RunPython(supprimer_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rapport',
+            constraint=models.UniqueConstraint(condition=models.Q(('formation__isnull', False)), fields=('formation', 'periode', 'date_debut', 'date_fin'), name='rapport_formation_periode_unique'),
+        ),
+    ]
@@ -5,11 +5,12 @@ from .types_offre import TypeOffre
 from .formations import Formation, FormationManager
 from .commentaires import Commentaire
 from .evenements import Evenement
-from .documents import Document
-from .historique_formations import HistoriqueFormation
+from .documents import Document, FichierStocke
+from .historique_formations import HistoriqueFormation, AgregatHistoriqueFormation
 from .rapport import Rapport
 from .parametres import Parametre
-from .recherches import Recherche
+from .recherches import Recherche, AgregatRecherche
+from .taches import Tache
 
 __all__ = [
     'BaseModel',
@@ -22,8 +23,12 @@ __all__ = [
     'Entreprise',
     'Evenement',
     'Document',
+    'FichierStocke',
     'HistoriqueFormation',
+    'AgregatHistoriqueFormation',
     'Rapport',
     'Parametre',
     'Recherche',
+    'AgregatRecherche',
+    'Tache',
 ]
\ No newline at end of file
@@ -1,8 +1,10 @@
 from django.db import models
-from django.db.models.signals import post_save, post_delete
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from .base import BaseModel
 from .formations import Formation
+from ..utils.recalculs_differes import differer
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -17,6 +19,18 @@ class Commentaire(BaseModel):
     contenu = models.TextField(verbose_name="Contenu du commentaire")
     saturation = models.PositiveIntegerField(null=True, blank=True,verbose_name="Niveau de saturation (%)")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Mémorise la formation enregistrée en base, pour recalculer aussi l'ancienne formation
+        d'un commentaire déplacé. Si `formation` est un champ différé, elle est lue au besoin
+        (voir `memoriser_formation_initiale`).
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'formation_id' in instance.__dict__:
+            instance._formation_id_initial = instance.formation_id
+        return instance
+
     def __str__(self):
         """
         Retourne une représentation lisible du commentaire.
@@ -33,36 +47,66 @@ class Commentaire(BaseModel):
         ]
 
 
+def recalculer_dernier_commentaire(formations):
+    """
+    Reporte sur les formations données leur dernier commentaire et leur dernière saturation renseignée,
+    en une seule requête `UPDATE` avec sous-requêtes (mêmes règles que `FormationManager.recalculer_compteurs`).
+    """
+    restants = Commentaire.objects.filter(formation=OuterRef('pk')).order_by('-created_at', '-pk')
+    formations.update(
+        dernier_commentaire=Subquery(restants.values('pk')[:1]),
+        saturation=Subquery(restants.filter(saturation__isnull=False).values('saturation')[:1]),
+    )
+
+@receiver(pre_save, sender=Commentaire)
+def memoriser_formation_initiale(sender, instance, **kwargs):
+    """
+    Formation enregistrée en base, si elle n'est pas connue depuis le chargement (`from_db`) :
+    commentaire créé, construit à la main avec une clé primaire existante ou chargé sans `formation`.
+    """
+    if hasattr(instance, '_formation_id_initial'):
+        return
+    instance._formation_id_initial = None
+    if not instance._state.adding and instance.pk:
+        instance._formation_id_initial = (
+            Commentaire.objects.filter(pk=instance.pk).values_list('formation_id', flat=True).first()
+        )
+
 @receiver(post_save, sender=Commentaire)
-def update_formation_saturation(sender, instance, **kwargs):
+def update_formation_saturation(sender, instance, created, **kwargs):
     """
-    Met à jour la `saturation` de la formation avec la dernière valeur de saturation du commentaire.
-    Met également à jour le `dernier_commentaire` pour un affichage rapide.
+    Création : fait pointer `Formation.dernier_commentaire` vers le commentaire et reporte sa saturation,
+    en une seule requête `UPDATE` conditionnelle (le pointeur n'est déplacé que s'il est vide
+    ou s'il désigne un commentaire plus ancien, sans relecture des commentaires de la formation).
+    Modification : le commentaire a pu changer de formation ou perdre sa saturation ; l'ancienne
+    et la nouvelle formation sont recalculées (`recalculer_dernier_commentaire`).
+    Dans un bloc `recalculs_differes()`, les formations sont seulement notées pour un recalcul unique.
     """
-    if instance.formation:
-        # Mise à jour directe via update() pour court-circuiter les méthodes save()
-        updates = {}
-        
-        if instance.saturation is not None:
-            updates['saturation'] = instance.saturation
-        
-        # Récupérer le dernier commentaire
-        dernier_commentaire = Commentaire.objects.filter(formation=instance.formation).order_by('-created_at').first()
-        updates['dernier_commentaire'] = dernier_commentaire.contenu if dernier_commentaire else None
-        
-        # Appliquer toutes les mises à jour en une seule opération
-        if updates:
-            Formation.objects.filter(id=instance.formation.id).update(**updates)
+    formation_initiale = instance._formation_id_initial
+    instance._formation_id_initial = instance.formation_id
+    if differer(instance.formation_id, formation_initiale):
+        return
+
+    if not created:
+        recalculer_dernier_commentaire(Formation.objects.filter(pk__in={instance.formation_id, formation_initiale} - {None}))
+        return
+
+    updates = {'dernier_commentaire': instance}
+    if instance.saturation is not None:
+        updates['saturation'] = instance.saturation
+    Formation.objects.filter(pk=instance.formation_id).filter(
+        Q(dernier_commentaire__isnull=True) | Q(dernier_commentaire__created_at__lte=instance.created_at)
+    ).update(**updates)
 
 @receiver(post_delete, sender=Commentaire)
 def handle_commentaire_delete(sender, instance, **kwargs):
     """
     Met à jour la formation après la suppression d'un commentaire :
-    - Met à jour le `dernier_commentaire` avec le commentaire précédent s'il en reste un.
+    le pointeur, remis à `NULL` par `on_delete=SET_NULL`, est reporté sur le commentaire précédent
+    et la saturation sur la dernière saturation renseignée, en une seule requête `UPDATE`.
+    Dans un bloc `recalculs_differes()`, la formation est seulement notée pour un recalcul unique.
     """
-    if instance.formation:
-        # Récupérer directement le dernier commentaire à partir du modèle
-        dernier_commentaire = Commentaire.objects.filter(formation=instance.formation).order_by('-created_at').first()
-        Formation.objects.filter(id=instance.formation.id).update(
-            dernier_commentaire=dernier_commentaire.contenu if dernier_commentaire else None
-        )
\ No newline at end of file
+    if differer(instance.formation_id):
+        return
+
+    recalculer_dernier_commentaire(Formation.objects.filter(pk=instance.formation_id, dernier_commentaire__isnull=True))
@@ -1,11 +1,17 @@
-from django.db import models
-from django.db.models.signals import post_delete, pre_save
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 import os
-from django.conf import settings
 from django.core.exceptions import ValidationError
 from .base import BaseModel
 from .formations import Formation, User
+from .taches import Tache
+from ..utils import miniatures
+from ..utils.stockage import get_stockage_documents, liberer_apres_validation
+
+
+# Champs fichiers dont le cycle de vie est suivi (libération des fichiers remplacés ou supprimés)
+CHAMPS_FICHIERS = ('fichier', 'miniature')
 
 
 class Document(BaseModel):
@@ -29,11 +35,37 @@ class Document(BaseModel):
 
     formation = models.ForeignKey(Formation, on_delete=models.CASCADE, related_name="documents",  verbose_name="Formation associée")
     nom_fichier = models.CharField(max_length=255, verbose_name="Nom du fichier",db_index=True)
-    fichier = models.FileField(upload_to='formations/documents/', verbose_name="Fichier")
+    fichier = models.FileField(
+        upload_to='formations/documents/', storage=get_stockage_documents, max_length=255, db_index=True,
+        verbose_name="Fichier"
+    )
+    """
+    Fichier stocké par empreinte de contenu (`rap_app.utils.stockage`) : partagé entre les documents identiques.
+    """
+
     source = models.TextField(null=True, blank=True, verbose_name="Source du document")
     type_document = models.CharField( max_length=20, choices=TYPE_DOCUMENT_CHOICES, default=AUTRE,verbose_name="Type de document")
     taille_fichier = models.PositiveIntegerField(null=True,blank=True, verbose_name="Taille du fichier (Ko)")
     utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    miniature = models.FileField(
+        upload_to='formations/miniatures/', storage=get_stockage_documents, max_length=255, null=True, blank=True,
+        editable=False, db_index=True, verbose_name="Miniature"
+    )
+    """
+    Aperçu JPEG de quelques Ko (image réduite, première page d'un PDF), généré en tâche de fond après l'upload.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Mémorise les noms des fichiers tels qu'enregistrés en base, pour repérer un remplacement
+        au prochain enregistrement sans relire la ligne.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._fichiers_enregistres = {
+            champ: instance.__dict__[champ] for champ in CHAMPS_FICHIERS if champ in instance.__dict__
+        }
+        return instance
 
     def __str__(self):
         """
@@ -53,13 +85,16 @@ class Document(BaseModel):
         """
         - Vérifie les règles de validation avant la sauvegarde (`full_clean()`).
         - Met à jour automatiquement la taille du fichier en Ko.
+        - Enregistre le fichier et la ligne dans la même transaction : le verrou du fichier stocké
+          (voir `StockageDedoublonne._save`) est tenu jusqu'à ce que le document soit visible.
         """
         self.full_clean()  # Exécute la validation avant la sauvegarde.
 
         if self.fichier and hasattr(self.fichier, 'size'):
             self.taille_fichier = max(1, self.fichier.size // 1024)  # Au moins 1 Ko pour éviter les zeros
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     class Meta:
         verbose_name = "Document"
         verbose_name_plural = "Documents"
@@ -69,6 +104,22 @@ class Document(BaseModel):
         ]
 
 
+class FichierStocke(BaseModel):
+    """
+    Fichier du stockage par empreinte de contenu (`rap_app.utils.stockage`), une ligne par nom stocké.
+    Sa ligne sert de verrou entre le dépôt d'un contenu et la libération de son fichier.
+    """
+
+    nom = models.CharField(max_length=255, unique=True, verbose_name="Nom stocké")
+
+    def __str__(self):
+        return self.nom
+
+    class Meta:
+        verbose_name = "Fichier stocké"
+        verbose_name_plural = "Fichiers stockés"
+
+
 ### 🚀 Validation : Empêcher l'upload d'un fichier invalide
 def validate_file_extension(value, type_doc=None):
     """
@@ -91,31 +142,53 @@ def validate_file_extension(value, type_doc=None):
     if ext not in valid_extensions.get(type_doc, []):
         raise ValidationError(f"Le fichier {value.name} ne correspond pas au type {dict(Document.TYPE_DOCUMENT_CHOICES).get(type_doc, type_doc)}.")
 
-### 🚀 Suppression automatique des anciens fichiers avant mise à jour
+### 🚀 Cycle de vie des fichiers : libération des fichiers remplacés ou supprimés après validation
 @receiver(pre_save, sender=Document)
-def supprimer_fichier_ancien(sender, instance, **kwargs):
+def preparer_fichiers(sender, instance, **kwargs):
     """
-    Supprime l'ancien fichier si un nouveau fichier est uploadé pour éviter l'accumulation de fichiers inutiles.
+    Repère un nouveau fichier (création ou remplacement) : la miniature de l'ancien fichier est abandonnée.
+    Les noms enregistrés sont connus depuis le chargement (`from_db`) ; ils ne sont relus
+    que pour une instance construite à la main avec une clé primaire existante.
     """
-    if instance.pk:
-        ancien_document = Document.objects.get(pk=instance.pk)
-        if ancien_document.fichier and ancien_document.fichier != instance.fichier:
-            ancien_fichier_path = os.path.join(settings.MEDIA_ROOT, ancien_document.fichier.name)
-            if os.path.exists(ancien_fichier_path):
-                os.remove(ancien_fichier_path)
+    if not hasattr(instance, '_fichiers_enregistres'):
+        instance._fichiers_enregistres = {}
+        if not instance._state.adding and instance.pk:
+            instance._fichiers_enregistres = (
+                Document.objects.filter(pk=instance.pk).values(*CHAMPS_FICHIERS).first() or {}
+            )
+
+    instance._nouveau_fichier = bool(instance.fichier) and not getattr(instance.fichier, '_committed', True)
+    if instance._nouveau_fichier and instance.miniature:
+        instance.miniature = None
+
+
+@receiver(post_save, sender=Document)
+def liberer_fichiers_remplaces(sender, instance, **kwargs):
+    """
+    Programme la libération des fichiers remplacés : elle n'a lieu qu'à la validation de la transaction
+    (rien n'est supprimé si elle est annulée) et seulement pour les fichiers qui ne sont plus référencés.
+    """
+    for champ, ancien_nom in instance._fichiers_enregistres.items():
+        fichier = getattr(instance, champ)
+        if ancien_nom and ancien_nom != fichier.name:
+            liberer_apres_validation(fichier.storage, ancien_nom, champ)
+    instance._fichiers_enregistres = {champ: getattr(instance, champ).name for champ in CHAMPS_FICHIERS}
+
+    # ✅ Miniature du nouveau fichier générée en tâche de fond, une fois la transaction validée
+    if instance._nouveau_fichier and miniatures.apercu_disponible(instance.fichier.name):
+        transaction.on_commit(
+            lambda: Tache.objects.mettre_en_file('generer_miniature', {'document': instance.pk})
+        )
 
 
-### 🚀 Suppression automatique du fichier après suppression d'un Document
 @receiver(post_delete, sender=Document)
 def supprimer_fichier_apres_suppression(sender, instance, **kwargs):
     """
-    Supprime le fichier du stockage lorsque l'objet `Document` est supprimé.
-    Évite les erreurs si le fichier a déjà été supprimé.
+    Programme la suppression des fichiers du document supprimé, après validation de la transaction,
+    s'ils ne sont plus référencés par aucun autre `Document`.
     """
-    if instance.fichier:
-        fichier_path = os.path.join(settings.MEDIA_ROOT, instance.fichier.name)
-        try:
-            if os.path.exists(fichier_path):
-                os.remove(fichier_path)
-        except Exception as e:
-            print(f"Erreur lors de la suppression du fichier {fichier_path}: {e}")
+    champs_differes = instance.get_deferred_fields()
+    for champ in CHAMPS_FICHIERS:
+        fichier = None if champ in champs_differes else getattr(instance, champ)
+        if fichier:
+            liberer_apres_validation(fichier.storage, fichier.name, champ)
@@ -1,10 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.db.models import F
 from .base import BaseModel
 from .formations import Formation
+from ..utils.recalculs_differes import differer
 
 class Evenement(BaseModel):
     """
@@ -36,6 +37,17 @@ class Evenement(BaseModel):
     event_date = models.DateField(null=True, blank=True, verbose_name="Date de l'événement")
     description_autre = models.CharField(max_length=255,  null=True,  blank=True,  verbose_name="Description pour 'Autre' événement")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Mémorise la formation enregistrée en base, pour détecter un changement de formation à la mise à jour.
+        Si `formation` est un champ différé, elle n'est lue qu'au besoin (voir `memoriser_formation_initiale`).
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'formation_id' in instance.__dict__:
+            instance._formation_id_initial = instance.formation_id
+        return instance
+
     def clean(self):
         """
         Validation personnalisée :
@@ -50,9 +62,12 @@ class Evenement(BaseModel):
         """
         Personnalisation de la sauvegarde :
         - Vérifie les règles de validation (`full_clean()`).
+        - Enregistre l'événement et met à jour les compteurs des formations (signal `post_save`)
+          dans une même transaction.
         """
         self.full_clean()  # Exécute la validation avant la sauvegarde.
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Événement"
@@ -74,21 +89,61 @@ class Evenement(BaseModel):
 
 
 # 🚀 Signaux pour mettre à jour `nombre_evenements` dans `Formation`
+def ajuster_nombre_evenements(formation_id, delta, formation=None):
+    """
+    Incrémente (ou décrémente) atomiquement `nombre_evenements` d'une formation avec `F()` :
+    ni recomptage, ni relecture, pas de perte de mise à jour entre requêtes concurrentes.
+    L'instance `formation` éventuellement chargée est ajustée en mémoire.
+    """
+    if formation_id is None:
+        return
+    formations = Formation.objects.filter(pk=formation_id)
+    if delta < 0:
+        formations = formations.filter(nombre_evenements__gte=-delta)
+    formations.update(nombre_evenements=F('nombre_evenements') + delta)
+    if formation is not None and formation.pk == formation_id:
+        formation.nombre_evenements = max(0, formation.nombre_evenements + delta)
+
+@receiver(pre_save, sender=Evenement)
+@receiver(pre_delete, sender=Evenement)
+def memoriser_formation_initiale(sender, instance, signal, **kwargs):
+    """
+    Formation enregistrée en base, si elle n'est pas connue depuis le chargement (`from_db`) :
+    instance créée, construite à la main avec une clé primaire existante ou chargée sans `formation`.
+    """
+    if hasattr(instance, '_formation_id_initial'):
+        return
+    if signal is pre_save and not instance._state.adding and 'formation_id' not in instance.__dict__:
+        return  # Formation différée et non modifiée : elle n'est pas réécrite
+    instance._formation_id_initial = None
+    if not instance._state.adding and instance.pk:
+        instance._formation_id_initial = (
+            Evenement.objects.filter(pk=instance.pk).values_list('formation_id', flat=True).first()
+        )
+
 @receiver(post_save, sender=Evenement)
-def update_nombre_evenements(sender, instance, **kwargs):
-    """Met à jour le nombre d'événements dans la formation associée."""
-    if instance.formation:
-        # Recalcule le nombre total d'événements à chaque modification
-        count = Evenement.objects.filter(formation=instance.formation).count()
-        Formation.objects.filter(id=instance.formation.id).update(nombre_evenements=count)
-        # Rafraîchir la formation
-        if hasattr(instance, 'formation'):
-            instance.formation.refresh_from_db()
+def update_nombre_evenements(sender, instance, created, **kwargs):
+    """
+    Met à jour le nombre d'événements de la formation associée (et de l'ancienne en cas de changement),
+    ou la note pour un recalcul unique dans un bloc `recalculs_differes()`.
+    """
+    if not created and 'formation_id' not in instance.__dict__:
+        return  # Formation différée : inchangée
+    if differer(instance.formation_id, instance._formation_id_initial):
+        instance._formation_id_initial = instance.formation_id
+        return
+    formation = instance.formation if Evenement.formation.is_cached(instance) else None
+    if created:
+        ajuster_nombre_evenements(instance.formation_id, 1, formation)
+    elif instance.formation_id != instance._formation_id_initial:
+        ajuster_nombre_evenements(instance._formation_id_initial, -1)
+        ajuster_nombre_evenements(instance.formation_id, 1, formation)
+    instance._formation_id_initial = instance.formation_id
 
 @receiver(post_delete, sender=Evenement)
 def update_nombre_evenements_after_delete(sender, instance, **kwargs):
-    """Met à jour le nombre d'événements après suppression."""
-    if hasattr(instance, 'formation') and instance.formation:
-        # Recalcule le nombre après suppression
-        count = Evenement.objects.filter(formation=instance.formation).count()
-        Formation.objects.filter(id=instance.formation.id).update(nombre_evenements=count)
\ No newline at end of file
+    """Met à jour le nombre d'événements après suppression (dans la transaction de la suppression)."""
+    if differer(instance._formation_id_initial):
+        return
+    formation = instance.formation if Evenement.formation.is_cached(instance) else None
+    ajuster_nombre_evenements(instance._formation_id_initial, -1, formation)
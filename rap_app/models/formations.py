@@ -1,7 +1,13 @@
 import datetime
 from pyexpat.errors import messages
 from xml.dom.minidom import Document
-from django.db import models
+from django.apps import apps
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.http import HttpResponseBadRequest
 from django.shortcuts import redirect
 from django.urls import reverse
@@ -10,6 +16,8 @@ from django.utils import timezone
 from jsonschema import ValidationError
 
 from .entreprises import Entreprise
+from ..utils import versions_cache
+from ..utils.recalculs_differes import recalculs_differes
 
 
 
@@ -21,6 +29,68 @@ from .statut import Statut
 User = get_user_model()  # Récupère le modèle User
 
 
+# Champs source et champs dérivés des indicateurs de remplissage
+CHAMPS_PLACES = ('prevus_crif', 'prevus_mp', 'inscrits_crif', 'inscrits_mp')
+CHAMPS_INDICATEURS = (
+    'total_places', 'total_inscrits', 'places_restantes_crif',
+    'places_restantes_mp', 'places_disponibles', 'taux_saturation',
+)
+
+
+# Cache des statistiques globales (cartes de la liste des formations et du tableau de bord)
+CLE_CACHE_STATISTIQUES = 'formations_statistiques'
+DUREE_CACHE_STATISTIQUES = 60 * 60
+
+
+def cle_cache_statistiques():
+    """Clé de cache du jour : les compteurs par période dépendent de la date courante."""
+    return f"{CLE_CACHE_STATISTIQUES}_{timezone.now().date().isoformat()}"
+
+
+def invalider_statistiques():
+    """Supprime les statistiques en cache (appelé à chaque écriture sur une formation)."""
+    cache.delete(cle_cache_statistiques())
+
+
+def expressions_indicateurs():
+    """
+    Retourne les expressions SQL des indicateurs de remplissage, calculées
+    uniquement à partir des colonnes `prevus_*` / `inscrits_*`.
+    Utilisé pour les recalculs en masse via `QuerySet.update()`.
+    """
+    total_places = models.F('prevus_crif') + models.F('prevus_mp')
+    total_inscrits = models.F('inscrits_crif') + models.F('inscrits_mp')
+
+    def restantes(prevus, inscrits):
+        return models.Case(
+            models.When(GreaterThan(models.F(prevus), models.F(inscrits)), then=models.F(prevus) - models.F(inscrits)),
+            default=models.Value(0),
+            output_field=models.PositiveIntegerField(),
+        )
+
+    return {
+        'total_places': total_places,
+        'total_inscrits': total_inscrits,
+        'places_restantes_crif': restantes('prevus_crif', 'inscrits_crif'),
+        'places_restantes_mp': restantes('prevus_mp', 'inscrits_mp'),
+        'places_disponibles': models.Case(
+            models.When(GreaterThan(total_places, total_inscrits), then=total_places - total_inscrits),
+            default=models.Value(0),
+            output_field=models.PositiveIntegerField(),
+        ),
+        'taux_saturation': models.Case(
+            models.When(
+                GreaterThan(total_places, models.Value(0)),
+                then=models.ExpressionWrapper(
+                    models.Value(100.0) * total_inscrits / total_places, output_field=models.FloatField()
+                ),
+            ),
+            default=models.Value(0.0),
+            output_field=models.FloatField(),
+        ),
+    }
+
+
 class FormationManager(models.Manager):
     """
     Manager personnalisé pour optimiser les requêtes sur les formations.
@@ -45,11 +115,63 @@ class FormationManager(models.Manager):
         return self.filter(end_date__lt=timezone.now().date())
 
     def formations_a_recruter(self):
-        """Retourne les formations qui ont encore des places disponibles."""
-        return self.annotate(
-            total_places=models.F('prevus_crif') + models.F('prevus_mp'),
-            total_inscrits=models.F('inscrits_crif') + models.F('inscrits_mp')
-        ).filter(total_places__gt=models.F('total_inscrits'))
+        """Retourne les formations qui ont encore des places disponibles (filtre indexé)."""
+        return self.filter(places_disponibles__gt=0)
+
+    def recalculer_indicateurs(self, queryset=None):
+        """
+        Recalcule en une seule requête `UPDATE` les indicateurs de remplissage stockés.
+        À appeler après un `update()` ou un `bulk_update()` touchant `prevus_*` / `inscrits_*`,
+        qui contournent `Formation.save()`.
+        """
+        queryset = self.get_queryset() if queryset is None else queryset
+        updated = queryset.update(**expressions_indicateurs(), updated_at=timezone.now())
+        transaction.on_commit(invalider_statistiques)
+        versions_cache.invalider('formation')  # `update()` ne déclenche pas les signaux
+        return updated
+
+    def recalculer_compteurs(self, formation_ids, taille_lot=500):
+        """
+        Recalcule `nombre_evenements`, `dernier_commentaire` et `saturation` des formations données
+        à partir de leurs événements et commentaires : une requête `UPDATE` (avec sous-requêtes) par lot.
+        Utilisé à la fin d'un bloc `recalculs_differes()` (voir `rap_app.utils.recalculs_differes`).
+        """
+        Commentaire = apps.get_model('rap_app', 'Commentaire')
+        Evenement = apps.get_model('rap_app', 'Evenement')
+        commentaires = Commentaire.objects.filter(formation=models.OuterRef('pk')).order_by('-created_at', '-pk')
+        evenements = Evenement.objects.filter(formation=models.OuterRef('pk')).order_by().values(
+            'formation'
+        ).annotate(nb=models.Count('pk')).values('nb')
+
+        formation_ids = list(formation_ids)
+        updated = 0
+        for debut in range(0, len(formation_ids), taille_lot):
+            updated += self.filter(pk__in=formation_ids[debut:debut + taille_lot]).update(
+                nombre_evenements=Coalesce(models.Subquery(evenements), 0),
+                dernier_commentaire=models.Subquery(commentaires.values('pk')[:1]),
+                saturation=models.Subquery(commentaires.filter(saturation__isnull=False).values('saturation')[:1]),
+            )
+        return updated
+
+    def statistiques(self):
+        """
+        Retourne en une seule requête d'agrégation conditionnelle le nombre de formations
+        totales, actives, à venir, terminées et à recruter.
+        Le résultat est mis en cache et invalidé à chaque enregistrement ou suppression d'une formation.
+        """
+        cle = cle_cache_statistiques()
+        stats = cache.get(cle)
+        if stats is None:
+            today = timezone.now().date()
+            stats = self.aggregate(
+                total=models.Count('id'),
+                actives=models.Count('id', filter=models.Q(start_date__lte=today, end_date__gte=today)),
+                a_venir=models.Count('id', filter=models.Q(start_date__gt=today)),
+                terminees=models.Count('id', filter=models.Q(end_date__lt=today)),
+                a_recruter=models.Count('id', filter=models.Q(places_disponibles__gt=0)),
+            )
+            cache.set(cle, stats, DUREE_CACHE_STATISTIQUES)
+        return stats
 
     def formations_toutes(self):
         """Retourne **toutes** les formations, sans filtre."""
@@ -91,6 +213,14 @@ class Formation(BaseModel):
     inscrits_crif = models.PositiveIntegerField(default=0, verbose_name="Inscrits CRIF")
     inscrits_mp = models.PositiveIntegerField(default=0, verbose_name="Inscrits MP")
 
+    # Indicateurs de remplissage (recalculés à chaque enregistrement, indexés pour le tri et le filtrage)
+    total_places = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total places")
+    total_inscrits = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total inscrits")
+    places_restantes_crif = models.PositiveIntegerField(default=0, editable=False, verbose_name="Places restantes CRIF")
+    places_restantes_mp = models.PositiveIntegerField(default=0, editable=False, verbose_name="Places restantes MP")
+    places_disponibles = models.PositiveIntegerField(default=0, editable=False, verbose_name="Places disponibles")
+    taux_saturation = models.FloatField(default=0, editable=False, verbose_name="Taux de saturation (%)")
+
     # Informations supplémentaires
     assistante = models.CharField(max_length=255, null=True, blank=True, verbose_name="Assistante")
     cap = models.PositiveIntegerField(null=True, blank=True, verbose_name="Capacité maximale")
@@ -104,8 +234,14 @@ class Formation(BaseModel):
     # Nombre d'événements liés
     nombre_evenements = models.PositiveIntegerField(default=0, verbose_name="Nombre d'événements")
 
-    # Commentaires et logs
-    dernier_commentaire = models.TextField(null=True, blank=True, verbose_name="Dernier commentaire")
+    # Commentaires et logs : pointeur vers le dernier commentaire (maintenu par les signaux de `Commentaire`)
+    dernier_commentaire = models.ForeignKey(
+        'Commentaire', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='+', verbose_name="Dernier commentaire"
+    )
+    saturation = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="Niveau de saturation (dernier commentaire, %)"
+    )
 
     # Relation avec les entreprises
     entreprises = models.ManyToManyField(Entreprise, related_name="formations", verbose_name="Partenaires", blank=True)
@@ -132,7 +268,7 @@ class Formation(BaseModel):
         return {key: convert_value(getattr(self, key)) for key in [
             "nom", "centre", "type_offre", "statut", "start_date", "end_date", "num_kairos", "num_offre", "num_produit",
             "prevus_crif", "prevus_mp", "inscrits_crif", "inscrits_mp", "assistante", "cap", "convocation_envoie",
-            "entresformation", "nombre_candidats", "nombre_entretiens", "nombre_evenements", "dernier_commentaire"
+            "entresformation", "nombre_candidats", "nombre_entretiens", "nombre_evenements", "saturation"
         ]}
 
     ### ✅ Méthodes calculées (remplaçant `@property`)
@@ -169,27 +305,61 @@ class Formation(BaseModel):
     def is_a_recruter(self):
         """Renvoie `True` si la formation a encore des places disponibles, sinon `False`."""
         return self.get_a_recruter() > 0
-    
+
+    def calculer_indicateurs(self):
+        """Met à jour les indicateurs de remplissage stockés à partir des places et inscrits."""
+        self.total_places = self.get_total_places()
+        self.total_inscrits = self.get_total_inscrits()
+        self.places_restantes_crif = self.get_places_restantes_crif()
+        self.places_restantes_mp = self.get_places_restantes_mp()
+        self.places_disponibles = self.get_places_disponibles()
+        self.taux_saturation = self.get_taux_saturation()
+
+    def save(self, *args, **kwargs):
+        """
+        Sauvegarde avec recalcul des indicateurs de remplissage stockés.
+        Si `update_fields` touche les places ou les inscrits, les indicateurs y sont ajoutés.
+        """
+        self.calculer_indicateurs()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(CHAMPS_PLACES):
+            kwargs['update_fields'] = set(update_fields) | set(CHAMPS_INDICATEURS)
+
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """
+        Suppression avec ses commentaires et événements (cascade) : les signaux de ces derniers
+        ne mettent pas à jour la formation ligne par ligne (voir `recalculs_differes`).
+        """
+        with recalculs_differes():
+            return super().delete(*args, **kwargs)
+
 
 ### ✅ Méthodes d'ajout d'éléments associés
 
 # ✅ Ajout d'un commentaire en utilisant la relation inverse
-    def add_commentaire(self, utilisateur, contenu):
+    def add_commentaire(self, utilisateur, contenu, saturation=None):
         """
         Ajoute un commentaire à la formation via la relation inverse.
+        Le pointeur `dernier_commentaire` est mis à jour en base par le signal `post_save` du commentaire.
         """
         commentaire = self.commentaires.create(
             utilisateur=utilisateur,
-            contenu=contenu
+            contenu=contenu,
+            saturation=saturation
         )
-        self.dernier_commentaire = contenu  # Mettre à jour le dernier commentaire affiché
-        self.save()
+        self.dernier_commentaire = commentaire  # ✅ Synchronise l'instance en mémoire, sans second enregistrement
+        if saturation is not None:
+            self.saturation = saturation
         return commentaire
 
     # ✅ Ajout d'un événement en utilisant la relation inverse
     def add_evenement(self, type_evenement, event_date, details=None, description_autre=None):
         """
         Ajoute un événement à la formation via la relation inverse.
+        `nombre_evenements` est incrémenté par le signal `post_save` de l'événement.
         """
         from .evenements import Evenement  # ✅ Import local pour éviter la relation circulaire
 
@@ -203,9 +373,6 @@ class Formation(BaseModel):
             details=details,
             description_autre=description_autre if type_evenement == Evenement.AUTRE else None
         )
-
-        self.nombre_evenements += 1  # ✅ Mise à jour du compteur d'événements
-        self.save()
         return evenement
 
 
@@ -245,4 +412,18 @@ class Formation(BaseModel):
             models.Index(fields=['start_date']),
             models.Index(fields=['end_date']),
             models.Index(fields=['nom']),
+            models.Index(fields=['total_places']),
+            models.Index(fields=['total_inscrits']),
+            models.Index(fields=['places_disponibles']),
+            models.Index(fields=['taux_saturation']),
         ]
+
+
+@receiver(post_save, sender=Formation)
+@receiver(post_delete, sender=Formation)
+def invalider_cache_statistiques(sender, **kwargs):
+    """
+    Invalide les statistiques en cache après l'ajout, la modification ou la suppression d'une formation,
+    à la validation de la transaction : une requête concurrente ne remet pas en cache l'état d'avant.
+    """
+    transaction.on_commit(invalider_statistiques)
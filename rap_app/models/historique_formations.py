@@ -1,13 +1,104 @@
 import datetime
-from django.db import models
+import threading
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncDate, TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.timezone import now
 from django.contrib.auth import get_user_model
+from ..utils import versions_cache
 from .base import BaseModel
+from .centres import Centre
 from .formations import Formation
+from .types_offre import TypeOffre
 
 User = get_user_model()
 
+
+# Un instantané complet de la formation est enregistré toutes les N lignes d'historique (points de contrôle)
+INTERVALLE_POINTS_DE_CONTROLE = 20
+
+# Champs de `Formation` absents des instantanés
+CHAMPS_HORS_ETAT = ('id', 'created_at', 'updated_at')
+
+
+def valeur_json(value):
+    """Convertit une valeur en valeur JSON (dates en chaînes, objets liés par leur clé primaire, sans requête)."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m-%d %H:%M:%S')  # ✅ Format JSON-compatible
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def etat_formation(formation):
+    """
+    État enregistrable d'une formation : `{champ: valeur JSON}` de ses champs concrets,
+    clés étrangères sous forme d'identifiants (aucune requête vers les tables liées).
+    """
+    return {
+        champ.name: valeur_json(champ.value_from_object(formation))
+        for champ in formation._meta.concrete_fields
+        if champ.name not in CHAMPS_HORS_ETAT
+    }
+
+
+class HistoriqueFormationManager(models.Manager):
+    """
+    Manager de l'historique : reconstitution de l'état d'une formation à une date donnée.
+    """
+
+    def _lignes_depuis_point_de_controle(self, formation_id, moment=None):
+        """
+        Dernier point de contrôle de la formation antérieur à `moment` (ou `None`),
+        et les changements enregistrés après lui, dans l'ordre (deux requêtes indexées).
+        """
+        lignes = self.filter(formation_id=formation_id).order_by()
+        if moment is not None:
+            lignes = lignes.filter(created_at__lte=moment)
+
+        point_de_controle = lignes.filter(instantane__isnull=False).order_by('-created_at', '-pk').values(
+            'pk', 'created_at', 'instantane'
+        ).first()
+        if point_de_controle is None:
+            return None, []
+
+        changements = lignes.filter(
+            Q(created_at__gt=point_de_controle['created_at'])
+            | Q(created_at=point_de_controle['created_at'], pk__gt=point_de_controle['pk'])
+        ).exclude(changements__isnull=True).order_by('created_at', 'pk').values_list('changements', flat=True)
+        return point_de_controle, list(changements)
+
+    def etat_a(self, formation, moment=None):
+        """
+        État de la formation (voir `etat_formation`) tel qu'enregistré à `moment` (par défaut : le plus récent),
+        rejoué depuis le point de contrôle le plus proche. `None` si aucun point de contrôle ne précède `moment`.
+        """
+        formation_id = getattr(formation, 'pk', formation)
+        point_de_controle, changements = self._lignes_depuis_point_de_controle(formation_id, moment)
+        if point_de_controle is None:
+            return None
+        etat = dict(point_de_controle['instantane'])
+        for changement in changements:
+            etat.update(changement)
+        return etat
+
+
 class HistoriqueFormation(BaseModel):
+    """
+    Historique des modifications d'une formation.
+
+    Chaque ligne enregistre les seuls champs modifiés depuis la ligne précédente (`changements`),
+    et un instantané complet de la formation (`instantane`) toutes les `INTERVALLE_POINTS_DE_CONTROLE` lignes :
+    `HistoriqueFormation.objects.etat_a(formation, moment)` rejoue les changements depuis le point de contrôle
+    le plus proche. `details` conserve le descriptif fourni par l'appelant (différences affichées, contexte).
+    """
+
     formation = models.ForeignKey(
         Formation, on_delete=models.CASCADE, null=True, blank=True, 
         related_name="historique_formations", verbose_name="Formation concernée"
@@ -19,10 +110,26 @@ class HistoriqueFormation(BaseModel):
 
     action = models.CharField(max_length=255, verbose_name="Action effectuée")
 
+    # Centre et type d'offre de la formation au moment de l'écriture (clés des agrégats)
+    centre = models.ForeignKey(
+        Centre, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name="+", verbose_name="Centre (au moment de l'écriture)"
+    )
+    type_offre = models.ForeignKey(
+        TypeOffre, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name="+", verbose_name="Type d'offre (au moment de l'écriture)"
+    )
+
     ancien_statut = models.CharField(max_length=100, null=True, blank=True, verbose_name="Statut avant modification")
     nouveau_statut = models.CharField(max_length=100, null=True, blank=True, verbose_name="Statut après modification")
 
     details = models.JSONField(null=True, blank=True, verbose_name="Détails des modifications")
+    changements = models.JSONField(
+        null=True, blank=True, editable=False, verbose_name="Champs modifiés (nouvelles valeurs)"
+    )
+    instantane = models.JSONField(
+        null=True, blank=True, editable=False, verbose_name="Instantané complet (point de contrôle)"
+    )
 
     inscrits_total = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total inscrits")
     inscrits_crif = models.PositiveIntegerField(null=True, blank=True, verbose_name="Inscrits CRIF")
@@ -35,44 +142,84 @@ class HistoriqueFormation(BaseModel):
     mois = models.PositiveIntegerField(null=True, blank=True, verbose_name="Mois")
     annee = models.PositiveIntegerField(null=True, blank=True, verbose_name="Année")
 
+    objects = HistoriqueFormationManager()
+
     def save(self, *args, **kwargs):
         """
         Personnalisation de la sauvegarde :
         - Récupère les valeurs dynamiques de la formation
-        - Convertit les données avant enregistrement pour éviter les erreurs JSON
+        - À la création, enregistre les champs modifiés depuis l'état précédent (et un point de contrôle si besoin)
+        - Convertit les détails fournis avant enregistrement pour éviter les erreurs JSON
         """
         if self.formation:
-            # 🔥 Calcul dynamique des valeurs issues de `Formation`
-            self.total_places = (self.formation.prevus_crif or 0) + (self.formation.prevus_mp or 0)
-            self.inscrits_total = (self.formation.inscrits_crif or 0) + (self.formation.inscrits_mp or 0)
-            self.inscrits_crif = self.formation.inscrits_crif
-            self.inscrits_mp = self.formation.inscrits_mp
-            self.saturation = (self.inscrits_total / self.total_places) * 100 if self.total_places > 0 else 0
-            self.taux_remplissage = (self.inscrits_total / self.total_places) * 100 if self.total_places > 0 else 0
-
-            # ✅ Stocke les valeurs temporelles si elles ne sont pas encore définies
-            if not self.semaine:
-                self.semaine = self.created_at.isocalendar()[1]
-            if not self.mois:
-                self.mois = self.created_at.month
-            if not self.annee:
-                self.annee = self.created_at.year
-
-            # ✅ Convertit toutes les données en format JSON-safe
-            self.details = self._serialize_details(self.formation.to_serializable_dict())
+            self.renseigner_depuis_formation()
+            if self._state.adding:
+                self._enregistrer_changements()
+
+        # ✅ Convertit les détails fournis en format JSON-safe (sans les remplacer)
+        if self.details:
+            self.details = self._serialize_details(self.details)
 
         super().save(*args, **kwargs)
 
-    def _serialize_details(self, details):
+    def renseigner_depuis_formation(self):
+        """
+        Recopie les valeurs de la formation (centre, type d'offre, inscrits, places, taux) et la période.
+        Utilisé par `save()` et par les écritures en masse (`bulk_create`), qui ne passent pas par `save()`.
+        """
+        self.centre_id = self.formation.centre_id
+        self.type_offre_id = self.formation.type_offre_id
+
+        # 🔥 Calcul dynamique des valeurs issues de `Formation`
+        self.total_places = (self.formation.prevus_crif or 0) + (self.formation.prevus_mp or 0)
+        self.inscrits_total = (self.formation.inscrits_crif or 0) + (self.formation.inscrits_mp or 0)
+        self.inscrits_crif = self.formation.inscrits_crif
+        self.inscrits_mp = self.formation.inscrits_mp
+        self.saturation = (self.inscrits_total / self.total_places) * 100 if self.total_places > 0 else 0
+        self.taux_remplissage = (self.inscrits_total / self.total_places) * 100 if self.total_places > 0 else 0
+
+        # ✅ Stocke les valeurs temporelles si elles ne sont pas encore définies
+        if not self.semaine:
+            self.semaine = self.created_at.isocalendar()[1]
+        if not self.mois:
+            self.mois = self.created_at.month
+        if not self.annee:
+            self.annee = self.created_at.year
+
+    def _enregistrer_changements(self):
         """
-        Convertit les objets non sérialisables (ex: dates) en chaînes de caractères JSON-compatibles.
+        Compare l'état courant de la formation à l'état rejoué depuis le dernier point de contrôle :
+        seuls les champs modifiés sont enregistrés, avec un instantané complet si aucun point de contrôle
+        n'existe encore ou si `INTERVALLE_POINTS_DE_CONTROLE` lignes ont été écrites depuis le dernier.
         """
-        def convert_value(value):
-            if isinstance(value, (datetime.date, datetime.datetime)):
-                return value.strftime('%Y-%m-%d %H:%M:%S')  # ✅ Format JSON-compatible
-            return value  # Garde les autres valeurs inchangées
+        etat = etat_formation(self.formation)
+        point_de_controle, changements = HistoriqueFormation.objects._lignes_depuis_point_de_controle(self.formation.pk)
 
-        return {key: convert_value(value) for key, value in details.items()}
+        precedent = {}
+        if point_de_controle is not None:
+            precedent = dict(point_de_controle['instantane'])
+            for changement in changements:
+                precedent.update(changement)
+
+        self.changements = {champ: valeur for champ, valeur in etat.items() if precedent.get(champ) != valeur}
+        if point_de_controle is None or len(changements) + 1 >= INTERVALLE_POINTS_DE_CONTROLE:
+            self.instantane = etat
+
+        # Sans descriptif fourni, les détails affichent les différences (anciennes et nouvelles valeurs)
+        if self.details is None and point_de_controle is not None:
+            self.details = {
+                champ: {'ancien': precedent.get(champ), 'nouveau': valeur} for champ, valeur in self.changements.items()
+            }
+
+    def _serialize_details(self, details):
+        """
+        Convertit les objets non sérialisables (dates, objets liés) en valeurs JSON-compatibles.
+        """
+        if isinstance(details, dict):
+            return {key: self._serialize_details(value) for key, value in details.items()}
+        if isinstance(details, (list, tuple)):
+            return [self._serialize_details(value) for value in details]
+        return valeur_json(details)
 
     class Meta:
         verbose_name = "Historique de formation"
@@ -82,7 +229,251 @@ class HistoriqueFormation(BaseModel):
             models.Index(fields=['created_at']),
             models.Index(fields=['action']),
             models.Index(fields=['formation']),
+            models.Index(fields=['formation', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.formation.nom if self.formation else 'Formation inconnue'} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+### 🚀 Agrégats de l'historique par période (jour, semaine, mois), centre et type d'offre
+def debut_periode(granularite, jour):
+    """Premier jour de la période (jour, semaine ISO commençant le lundi, mois) contenant `jour`."""
+    if granularite == AgregatHistoriqueFormation.JOUR:
+        return jour
+    if granularite == AgregatHistoriqueFormation.SEMAINE:
+        return jour - datetime.timedelta(days=jour.weekday())
+    return jour.replace(day=1)
+
+
+def fin_periode(granularite, debut):
+    """Premier jour de la période suivante."""
+    if granularite == AgregatHistoriqueFormation.JOUR:
+        return debut + datetime.timedelta(days=1)
+    if granularite == AgregatHistoriqueFormation.SEMAINE:
+        return debut + datetime.timedelta(days=7)
+    return (debut + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _debut_journee(jour):
+    """Minuit (heure locale) du jour donné, comparable à `created_at`."""
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time.min))
+
+
+class AgregatHistoriqueFormationManager(models.Manager):
+    """
+    Manager des agrégats : mise à jour incrémentale à chaque écriture d'historique
+    et reconstruction complète depuis l'historique brut.
+    """
+
+    def cles(self, jour, centre_id, type_offre_id):
+        """Clés `(granularité, début de période, centre, type d'offre)` des trois agrégats d'un jour."""
+        return {
+            (granularite, debut_periode(granularite, jour), centre_id, type_offre_id)
+            for granularite, _ in self.model.GRANULARITE_CHOICES
+        }
+
+    def recalculer(self, cles):
+        """
+        Recalcule depuis l'historique brut les agrégats des `cles` données (supprimés s'ils sont devenus vides).
+        Utilisé pour les suppressions : un décrément ne peut pas savoir si la formation reste comptée.
+        """
+        for granularite, debut, centre_id, type_offre_id in cles:
+            cle = {'granularite': granularite, 'debut_periode': debut, 'centre_id': centre_id, 'type_offre_id': type_offre_id}
+            totaux = HistoriqueFormation.objects.filter(
+                centre_id=centre_id, type_offre_id=type_offre_id,
+                created_at__gte=_debut_journee(debut),
+                created_at__lt=_debut_journee(fin_periode(granularite, debut)),
+            ).aggregate(total=Count('id'), inscrits=Sum('inscrits_total'), formations=Count('formation', distinct=True))
+            if not totaux['total']:
+                self.filter(**cle).delete()
+                continue
+            self.update_or_create(**cle, defaults={
+                'nb_historiques': totaux['total'],
+                'nb_inscrits': totaux['inscrits'] or 0,
+                'nb_formations': totaux['formations'],
+            })
+
+    def ajuster(self, historique, sens):
+        """
+        Ajoute (`sens=1`) ou retire (`sens=-1`) une ligne d'historique des agrégats de ses trois périodes.
+        Une formation n'est comptée qu'une fois par agrégat : seulement si aucune autre ligne
+        de la même formation (même centre, même type d'offre) n'existe déjà dans la période.
+        Les suppressions passent par `recalculer()` (voir `desagreger_historique`).
+        """
+        jour = timezone.localdate(historique.created_at)
+        periodes = {granularite: debut_periode(granularite, jour) for granularite, _ in self.model.GRANULARITE_CHOICES}
+        cle_commune = {'centre_id': historique.centre_id, 'type_offre_id': historique.type_offre_id}
+
+        deja_comptee = dict.fromkeys(periodes, 1)
+        if historique.formation_id:
+            # ✅ Une seule requête pour les trois périodes
+            deja_comptee = HistoriqueFormation.objects.filter(
+                formation_id=historique.formation_id, **cle_commune
+            ).exclude(pk=historique.pk).aggregate(**{
+                granularite: Count('pk', filter=Q(
+                    created_at__gte=_debut_journee(debut),
+                    created_at__lt=_debut_journee(fin_periode(granularite, debut)),
+                ))
+                for granularite, debut in periodes.items()
+            })
+
+        inscrits = historique.inscrits_total or 0
+        for granularite, debut in periodes.items():
+            formations = 0 if deja_comptee[granularite] else 1
+            cle = {'granularite': granularite, 'debut_periode': debut, **cle_commune}
+            valeurs = {
+                champ: Greatest(F(champ) + sens * delta, Value(0))
+                for champ, delta in (('nb_historiques', 1), ('nb_inscrits', inscrits), ('nb_formations', formations))
+            }
+            if self.filter(**cle).update(**valeurs) or sens < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(**cle, nb_historiques=1, nb_inscrits=inscrits, nb_formations=formations)
+            except IntegrityError:  # Créé entre-temps par une écriture concurrente
+                self.filter(**cle).update(**valeurs)
+
+    def reconstruire(self, depuis=None):
+        """
+        Recalcule les agrégats depuis l'historique brut (toutes les périodes, ou celles commençant
+        à partir de `depuis`) et retourne le nombre d'agrégats écrits.
+        """
+        troncatures = {
+            self.model.JOUR: TruncDate('created_at'),
+            self.model.SEMAINE: TruncWeek('created_at'),
+            self.model.MOIS: TruncMonth('created_at'),
+        }
+        agregats = []
+        with transaction.atomic():
+            for granularite, troncature in troncatures.items():
+                historiques = HistoriqueFormation.objects.all()
+                existants = self.filter(granularite=granularite)
+                if depuis:
+                    debut = debut_periode(granularite, depuis)
+                    historiques = historiques.filter(created_at__gte=_debut_journee(debut))
+                    existants = existants.filter(debut_periode__gte=debut)
+                existants.delete()
+
+                lignes = historiques.annotate(periode=troncature).values(
+                    'periode', 'centre_id', 'type_offre_id'
+                ).annotate(
+                    total=Count('id'),
+                    inscrits=Sum('inscrits_total'),
+                    formations=Count('formation', distinct=True),
+                ).order_by()
+                agregats.extend(
+                    self.model(
+                        granularite=granularite,
+                        debut_periode=ligne['periode'].date() if isinstance(ligne['periode'], datetime.datetime) else ligne['periode'],
+                        centre_id=ligne['centre_id'],
+                        type_offre_id=ligne['type_offre_id'],
+                        nb_historiques=ligne['total'],
+                        nb_inscrits=ligne['inscrits'] or 0,
+                        nb_formations=ligne['formations'],
+                    )
+                    for ligne in lignes
+                )
+            self.bulk_create(agregats, batch_size=500)
+        versions_cache.invalider('historique')  # Écritures en masse : les signaux n'ont pas renouvelé la version
+        return len(agregats)
+
+
+class AgregatHistoriqueFormation(models.Model):
+    """
+    Agrégat de l'historique des formations par période, centre et type d'offre.
+
+    Tenu à jour à chaque création ou suppression d'une ligne d'historique (voir les signaux ci-dessous) ;
+    les courbes d'évolution lisent ces quelques centaines de lignes au lieu de parcourir l'historique brut.
+    Les écritures en masse (`bulk_create`, `update`) ne passent pas par les signaux :
+    `python manage.py reconstruire_agregats_historique` recalcule les agrégats depuis l'historique.
+    """
+
+    JOUR = 'jour'
+    SEMAINE = 'semaine'
+    MOIS = 'mois'
+
+    GRANULARITE_CHOICES = [
+        (JOUR, 'Jour'),
+        (SEMAINE, 'Semaine'),
+        (MOIS, 'Mois'),
+    ]
+
+    granularite = models.CharField(max_length=10, choices=GRANULARITE_CHOICES, verbose_name="Granularité")
+    debut_periode = models.DateField(verbose_name="Début de la période")
+    centre = models.ForeignKey(Centre, on_delete=models.CASCADE, null=True, blank=True, related_name="+", verbose_name="Centre")
+    type_offre = models.ForeignKey(TypeOffre, on_delete=models.CASCADE, null=True, blank=True, related_name="+", verbose_name="Type d'offre")
+
+    nb_historiques = models.PositiveIntegerField(default=0, verbose_name="Nombre de lignes d'historique")
+    nb_inscrits = models.PositiveIntegerField(default=0, verbose_name="Somme des inscrits")
+    nb_formations = models.PositiveIntegerField(default=0, verbose_name="Nombre de formations distinctes")
+
+    objects = AgregatHistoriqueFormationManager()
+
+    class Meta:
+        verbose_name = "Agrégat de l'historique des formations"
+        verbose_name_plural = "Agrégats de l'historique des formations"
+        ordering = ['granularite', 'debut_periode']
+        constraints = [
+            # NULL n'est égal à rien dans un index unique : centre et type d'offre absents sont ramenés à 0
+            models.UniqueConstraint(
+                F('granularite'), F('debut_periode'), Coalesce('centre', Value(0)), Coalesce('type_offre', Value(0)),
+                name='agregat_historique_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularite', 'debut_periode']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_granularite_display()} du {self.debut_periode:%Y-%m-%d}"
+
+
+@receiver(post_save, sender=HistoriqueFormation)
+def agreger_historique(sender, instance, created, **kwargs):
+    """Ajoute une nouvelle ligne d'historique à ses agrégats (dans la même transaction)."""
+    if created:
+        AgregatHistoriqueFormation.objects.ajuster(instance, 1)
+
+
+# Formations en cours de suppression dans ce thread : leur historique est retiré des agrégats en une fois
+_suppressions = threading.local()
+
+
+def _formations_supprimees():
+    if not hasattr(_suppressions, 'formations'):
+        _suppressions.formations = {}
+    return _suppressions.formations
+
+
+@receiver(post_delete, sender=HistoriqueFormation)
+def desagreger_historique(sender, instance, **kwargs):
+    """Recalcule les agrégats d'une ligne d'historique supprimée (sauf suppression en cascade d'une formation)."""
+    if instance.formation_id in _formations_supprimees():
+        return
+    AgregatHistoriqueFormation.objects.recalculer(AgregatHistoriqueFormation.objects.cles(
+        timezone.localdate(instance.created_at), instance.centre_id, instance.type_offre_id
+    ))
+
+
+@receiver(pre_delete, sender=Formation)
+def preparer_desagregation_formation(sender, instance, **kwargs):
+    """
+    Relève les agrégats touchés par l'historique d'une formation avant sa suppression : la cascade supprime
+    toutes ses lignes avant le premier `post_delete`, les agrégats sont recalculés une fois à la fin.
+    """
+    jours = HistoriqueFormation.objects.filter(formation=instance).annotate(
+        jour=TruncDate('created_at')
+    ).values_list('jour', 'centre_id', 'type_offre_id').distinct().order_by()
+    cles = set()
+    for jour, centre_id, type_offre_id in jours:
+        cles |= AgregatHistoriqueFormation.objects.cles(jour, centre_id, type_offre_id)
+    _formations_supprimees()[instance.pk] = cles
+
+
+@receiver(post_delete, sender=Formation)
+def desagreger_formation(sender, instance, **kwargs):
+    """Recalcule les agrégats touchés par l'historique de la formation supprimée."""
+    cles = _formations_supprimees().pop(instance.pk, None)
+    if cles:
+        AgregatHistoriqueFormation.objects.recalculer(cles)
@@ -1,6 +1,39 @@
 # models/parametres.py
+from django.core.cache import cache
 from django.db import models
 from .base import BaseModel
+from ..utils import versions_cache
+
+
+# Seuils d'alerte de taux de remplissage : paramètres `ALERTE_TAUX_REMPLISSAGE_*` (en %)
+PREFIXE_ALERTE_TAUX_REMPLISSAGE = 'ALERTE_TAUX_REMPLISSAGE_'
+SEUILS_TAUX_REMPLISSAGE_DEFAUT = (50.0, 75.0, 90.0)
+DUREE_CACHE_SEUILS = 24 * 60 * 60
+
+
+class ParametreManager(models.Manager):
+    """
+    Manager personnalisé pour le modèle Parametre.
+    """
+
+    def seuils_taux_remplissage(self):
+        """
+        Seuils d'alerte de taux de remplissage (valeurs des paramètres `ALERTE_TAUX_REMPLISSAGE_*`), triés.
+        Mis en cache jusqu'à la prochaine modification d'un paramètre ; valeurs par défaut si aucun n'est valide.
+        """
+        versions = versions_cache.versions('parametre')
+        cle = versions_cache.cle_versionnee('seuils_taux_remplissage', ('parametre',), versions)
+        seuils = cache.get(cle)
+        if seuils is None:
+            valeurs = set()
+            for valeur in self.filter(cle__startswith=PREFIXE_ALERTE_TAUX_REMPLISSAGE).values_list('valeur', flat=True):
+                try:
+                    valeurs.add(float(valeur.replace(',', '.')))
+                except ValueError:
+                    continue
+            seuils = tuple(sorted(valeurs)) or SEUILS_TAUX_REMPLISSAGE_DEFAUT
+            cache.set(cle, seuils, DUREE_CACHE_SEUILS)
+        return seuils
 
 
 class Parametre(BaseModel):
@@ -50,6 +83,8 @@ class Parametre(BaseModel):
     Permet de documenter les clés stockées et de faciliter leur gestion.
     """
 
+    objects = ParametreManager()
+
     def __str__(self):
         """Retourne la clé du paramètre pour une meilleure lisibilité en back-office."""
         return self.cle
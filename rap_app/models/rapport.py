@@ -1,10 +1,87 @@
 # models/rapport.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count
 from django.core.exceptions import ValidationError
 from .base import BaseModel
 from .formations import Formation
 
 
+class RapportManager(models.Manager):
+    """
+    Manager personnalisé pour le modèle Rapport.
+    """
+
+    def generer(self, periode, date_debut, date_fin, formations=None, taille_lot=1000):
+        """
+        Génère en masse les rapports d'une période pour un ensemble de formations
+        (par défaut : les formations actives). Les formations ayant déjà un rapport
+        identique (même période et mêmes dates) sont ignorées, y compris ceux insérés par une génération
+        concurrente entre la lecture des existants et l'insertion (contrainte `rapport_formation_periode_unique`).
+
+        Nombre de requêtes constant, quel que soit le nombre de formations :
+        - une requête pour les indicateurs des formations ;
+        - une requête pour les rapports déjà existants ;
+        - une requête groupée pour le nombre d'événements par formation ;
+        - les insertions `bulk_create` (par lots de `taille_lot`), encadrées de deux comptages, dans une seule transaction.
+
+        Retourne le nombre de rapports créés.
+        """
+        from .evenements import Evenement
+
+        if periode not in dict(self.model.PERIODE_CHOICES):
+            raise ValidationError({'periode': f"Période de rapport inconnue : {periode}."})
+        if not date_debut or not date_fin:
+            raise ValidationError("Les dates de début et de fin sont obligatoires.")
+        # Même validation que Rapport.clean(), faite une seule fois pour tout le lot
+        self.model(date_debut=date_debut, date_fin=date_fin).clean()
+
+        if formations is None:
+            formations = Formation.objects.formations_actives()
+        formations = formations.order_by()
+
+        indicateurs = list(formations.values_list(
+            'id', 'total_inscrits', 'inscrits_crif', 'inscrits_mp', 'total_places',
+            'nombre_candidats', 'nombre_entretiens'
+        ))
+        if not indicateurs:
+            return 0
+        # Sous-requête plutôt que liste d'ids : pas de limite de paramètres SQL (999 sous les anciens SQLite)
+        ids = formations.values('id')
+
+        rapports_periode = self.filter(formation_id__in=ids, periode=periode, date_debut=date_debut, date_fin=date_fin)
+        existants = set(rapports_periode.values_list('formation_id', flat=True))
+
+        evenements = dict(Evenement.objects.filter(
+            formation_id__in=ids, event_date__gte=date_debut, event_date__lte=date_fin
+        ).order_by().values('formation_id').annotate(nombre=Count('id')).values_list('formation_id', 'nombre'))
+
+        rapports = [
+            self.model(
+                formation_id=formation_id,
+                periode=periode,
+                date_debut=date_debut,
+                date_fin=date_fin,
+                total_inscrits=total_inscrits,
+                inscrits_crif=inscrits_crif,
+                inscrits_mp=inscrits_mp,
+                total_places=total_places,
+                nombre_evenements=evenements.get(formation_id, 0),
+                nombre_candidats=nombre_candidats or 0,
+                nombre_entretiens=nombre_entretiens or 0,
+            )
+            for (formation_id, total_inscrits, inscrits_crif, inscrits_mp, total_places,
+                 nombre_candidats, nombre_entretiens) in indicateurs
+            if formation_id not in existants
+        ]
+
+        if not rapports:
+            return 0
+        with transaction.atomic():
+            avant = rapports_periode.count()
+            self.bulk_create(rapports, batch_size=taille_lot, ignore_conflicts=True)
+            return rapports_periode.count() - avant
+
+
 class Rapport(BaseModel):
     """
     Modèle représentant un rapport périodique sur les formations.
@@ -128,6 +205,8 @@ class Rapport(BaseModel):
             return (self.total_inscrits / self.nombre_candidats) * 100
         return 0
 
+    objects = RapportManager()
+
     def clean(self):
         """
         Validation personnalisée pour les dates.
@@ -155,6 +234,14 @@ class Rapport(BaseModel):
             models.Index(fields=['date_fin']),
             models.Index(fields=['periode']),
         ]
+        constraints = [
+            # Un seul rapport par formation et par période (les rapports globaux, sans formation, ne sont pas concernés)
+            models.UniqueConstraint(
+                fields=['formation', 'periode', 'date_debut', 'date_fin'],
+                condition=models.Q(formation__isnull=False),
+                name='rapport_formation_periode_unique',
+            ),
+        ]
     """
     - Trie les rapports par date de fin (les plus récents en premier).
     - Ajoute des index pour optimiser les requêtes sur les dates et les périodes.
@@ -1,6 +1,13 @@
 # models/recherches.py
-from django.db import models
+import datetime
 
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Lower, Trim, TruncDate
+from django.utils import timezone
+
+from ..utils import versions_cache
 from .types_offre import TypeOffre
 from .base import BaseModel
 from .centres import Centre
@@ -109,8 +116,7 @@ class Recherche(BaseModel):
         Représentation textuelle de la recherche pour l'affichage dans l'admin.
         """
         terme = self.terme_recherche or "Sans terme"
-        utilisateur = self.utilisateur or "Anonyme"
-        return f"Recherche '{terme}' par {utilisateur} ({self.nombre_resultats} résultats)"
+        return f"Recherche '{terme}' ({self.nombre_resultats} résultats)"
 
     class Meta:
         verbose_name = "Recherche"
@@ -125,3 +131,153 @@ class Recherche(BaseModel):
     - Trie les recherches par date de création (les plus récentes en premier).
     - Ajoute des index pour optimiser les recherches sur `terme_recherche`, `created_at` et `nombre_resultats`.
     """
+
+
+def _debut_journee(jour):
+    """Minuit (heure locale) du jour donné, comparable à `created_at`."""
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time.min))
+
+
+def centile(valeurs_triees, rang):
+    """Centile `rang` (0-100) d'une liste triée, par la méthode du rang le plus proche ; `None` si la liste est vide."""
+    if not valeurs_triees:
+        return None
+    indice = max(0, -(-rang * len(valeurs_triees) // 100) - 1)
+    return valeurs_triees[min(indice, len(valeurs_triees) - 1)]
+
+
+class AgregatRechercheManager(models.Manager):
+    """
+    Manager des agrégats quotidiens : calcul depuis les recherches brutes et purge des recherches agrégées.
+    """
+
+    # Filtre de `Recherche` -> clé dans `AgregatRecherche.filtres`
+    FILTRES = {'filtre_centre': 'centre', 'filtre_type_offre': 'type_offre', 'filtre_statut': 'statut'}
+
+    def calculer(self, jour):
+        """Agrégat (non enregistré) des recherches brutes du jour donné."""
+        recherches = Recherche.objects.filter(
+            created_at__gte=_debut_journee(jour),
+            created_at__lt=_debut_journee(jour + datetime.timedelta(days=1)),
+        )
+        totaux = recherches.aggregate(
+            total=Count('id'),
+            sans_resultat=Count('id', filter=Q(nombre_resultats=0)),
+        )
+
+        # Percentiles calculés en Python : une seule colonne de flottants pour la journée
+        temps = list(recherches.filter(temps_execution__isnull=False).order_by(
+            'temps_execution'
+        ).values_list('temps_execution', flat=True))
+
+        termes = recherches.exclude(terme_recherche__isnull=True).annotate(
+            terme=Lower(Trim('terme_recherche'))
+        ).exclude(terme='').values('terme').annotate(
+            nombre=Count('id'),
+            sans_resultat=Count('id', filter=Q(nombre_resultats=0)),
+        ).order_by('-nombre', 'terme')[:settings.RAP_APP_RECHERCHES_TERMES_PAR_JOUR]
+
+        filtres = {
+            cle: [
+                [ligne[champ], ligne['nombre']]
+                for ligne in recherches.filter(**{f"{champ}__isnull": False}).values(champ).annotate(
+                    nombre=Count('id')
+                ).order_by('-nombre', champ)
+            ]
+            for champ, cle in self.FILTRES.items()
+        }
+
+        return self.model(
+            jour=jour,
+            nb_recherches=totaux['total'],
+            nb_sans_resultat=totaux['sans_resultat'],
+            temps_p50=centile(temps, 50),
+            temps_p95=centile(temps, 95),
+            temps_p99=centile(temps, 99),
+            termes=[[ligne['terme'], ligne['nombre'], ligne['sans_resultat']] for ligne in termes],
+            filtres=filtres,
+        )
+
+    def jours_a_agreger(self, avant):
+        """Jours (antérieurs à `avant`) qui ont des recherches brutes mais pas encore d'agrégat."""
+        jours = set(Recherche.objects.filter(created_at__lt=_debut_journee(avant)).annotate(
+            jour=TruncDate('created_at')
+        ).values_list('jour', flat=True).distinct().order_by())
+        return sorted(jours - set(self.filter(jour__in=jours).values_list('jour', flat=True)))
+
+    def agreger(self, avant=None):
+        """
+        Agrège les journées terminées (antérieures à `avant`, aujourd'hui par défaut) qui ne le sont pas encore
+        et retourne le nombre d'agrégats écrits. Une journée agrégée ne l'est plus : les recherches
+        qui lui arriveraient ensuite (tampon vidé après minuit) sont supprimées sans être comptées par la purge.
+        """
+        avant = avant or timezone.localdate()
+        agregats = [self.calculer(jour) for jour in self.jours_a_agreger(avant)]
+        with transaction.atomic():
+            self.bulk_create(agregats, ignore_conflicts=True)
+        if agregats:
+            versions_cache.invalider('agregat_recherche')  # `bulk_create` ne déclenche pas les signaux
+        return len(agregats)
+
+    def purger(self, retention_jours=None):
+        """
+        Supprime les recherches brutes de plus de `retention_jours` jours (`RAP_APP_RECHERCHES_RETENTION_JOURS`
+        par défaut) dont la journée est agrégée ; retourne le nombre de recherches supprimées.
+        """
+        if retention_jours is None:
+            retention_jours = settings.RAP_APP_RECHERCHES_RETENTION_JOURS
+        limite = timezone.localdate() - datetime.timedelta(days=retention_jours)
+        recherches = Recherche.objects.filter(created_at__lt=_debut_journee(limite))
+
+        # Les journées pas encore agrégées sont conservées
+        for jour in self.jours_a_agreger(limite):
+            recherches = recherches.exclude(
+                created_at__gte=_debut_journee(jour),
+                created_at__lt=_debut_journee(jour + datetime.timedelta(days=1)),
+            )
+        supprimees, _ = recherches.delete()
+        return supprimees
+
+
+class AgregatRecherche(models.Model):
+    """
+    Agrégat quotidien des recherches : volume, taux de recherches sans résultat, percentiles du temps
+    d'exécution, termes les plus fréquents et filtres les plus utilisés.
+
+    Calculé par `python manage.py agreger_recherches` (à planifier chaque nuit), qui purge ensuite
+    les recherches brutes agrégées au-delà de la durée de rétention : les statistiques ne lisent que ces agrégats.
+    """
+
+    jour = models.DateField(unique=True, verbose_name="Jour")
+    nb_recherches = models.PositiveIntegerField(default=0, verbose_name="Nombre de recherches")
+    nb_sans_resultat = models.PositiveIntegerField(default=0, verbose_name="Recherches sans résultat")
+
+    temps_p50 = models.FloatField(null=True, blank=True, verbose_name="Temps d'exécution p50 (ms)")
+    temps_p95 = models.FloatField(null=True, blank=True, verbose_name="Temps d'exécution p95 (ms)")
+    temps_p99 = models.FloatField(null=True, blank=True, verbose_name="Temps d'exécution p99 (ms)")
+
+    termes = models.JSONField(default=list, blank=True, verbose_name="Termes les plus fréquents")
+    """
+    `[[terme, nombre, sans résultat], ...]` par fréquence décroissante, termes normalisés (minuscules, sans espaces
+    autour), limités aux `RAP_APP_RECHERCHES_TERMES_PAR_JOUR` plus fréquents.
+    """
+
+    filtres = models.JSONField(default=dict, blank=True, verbose_name="Filtres utilisés")
+    """
+    `{'centre': [[id, nombre], ...], 'type_offre': [...], 'statut': [...]}` par fréquence décroissante (complet).
+    """
+
+    objects = AgregatRechercheManager()
+
+    @property
+    def taux_sans_resultat(self):
+        """Part des recherches sans résultat (en %)."""
+        return 100 * self.nb_sans_resultat / self.nb_recherches if self.nb_recherches else 0
+
+    def __str__(self):
+        return f"Recherches du {self.jour:%Y-%m-%d} ({self.nb_recherches})"
+
+    class Meta:
+        verbose_name = "Agrégat des recherches"
+        verbose_name_plural = "Agrégats des recherches"
+        ordering = ['-jour']
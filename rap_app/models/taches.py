@@ -0,0 +1,151 @@
+# models/taches.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .base import BaseModel
+
+
+class TacheManager(models.Manager):
+    """
+    Manager personnalisé pour le modèle Tache : file d'attente des tâches de fond.
+    """
+
+    def mettre_en_file(self, type_tache, parametres=None, utilisateur=None, max_tentatives=None):
+        """Ajoute une tâche à la file d'attente et la retourne."""
+        tache = self.model(
+            type_tache=type_tache,
+            parametres=parametres or {},
+            utilisateur=utilisateur if getattr(utilisateur, 'is_authenticated', False) else None,
+        )
+        if max_tentatives is not None:
+            tache.max_tentatives = max_tentatives
+        tache.save()
+        return tache
+
+    def reserver(self, executeur):
+        """
+        Réserve la prochaine tâche exécutable pour `executeur` et la retourne (ou `None`).
+
+        Le passage à l'état « en cours » est une mise à jour conditionnelle (`statut = en_attente`) :
+        deux workers ne peuvent pas réserver la même tâche, même sur un moteur sans `SELECT ... FOR UPDATE`.
+        Sur les moteurs qui le permettent, les lignes déjà verrouillées par un autre worker sont sautées.
+        """
+        maintenant = timezone.now()
+        candidates = self.filter(statut=Tache.EN_ATTENTE, executer_apres__lte=maintenant).order_by('executer_apres', 'id')
+
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            for pk in candidates.values_list('pk', flat=True)[:10]:
+                reservee = self.filter(pk=pk, statut=Tache.EN_ATTENTE).update(
+                    statut=Tache.EN_COURS,
+                    executeur=executeur,
+                    debut_execution=maintenant,
+                    fin_execution=None,
+                    progression=0,
+                    tentatives=models.F('tentatives') + 1,
+                )
+                if reservee:
+                    return self.get(pk=pk)
+        return None
+
+    def liberer_bloquees(self, delai=None):
+        """
+        Remet en file les tâches « en cours » depuis plus de `delai` (worker arrêté brutalement).
+        Celles qui ont épuisé leurs tentatives passent en échec : une tâche qui fait tomber son worker
+        ne doit pas être reprise indéfiniment.
+        Retourne le nombre de tâches remises en file.
+        """
+        delai = delai or timedelta(seconds=getattr(settings, 'RAP_APP_TACHES_DELAI_BLOCAGE', 3600))
+        maintenant = timezone.now()
+        bloquees = self.filter(statut=Tache.EN_COURS, debut_execution__lt=maintenant - delai)
+        with transaction.atomic():
+            bloquees.filter(tentatives__gte=models.F('max_tentatives')).update(
+                statut=Tache.ECHEC, executeur='', fin_execution=maintenant,
+                erreur="Exécution interrompue (worker arrêté ou bloqué) après la dernière tentative.",
+            )
+            return bloquees.update(statut=Tache.EN_ATTENTE, executeur='', executer_apres=maintenant)
+
+
+class Tache(BaseModel):
+    """
+    Modèle représentant une tâche de fond (génération de rapports, export CSV, action d'administration...).
+
+    Les tâches sont exécutées hors des requêtes HTTP par la commande `manage.py executer_taches`,
+    sans broker externe : la table sert de file d'attente.
+
+    Hérite de `BaseModel`, qui ajoute automatiquement :
+    - `created_at` : Date et heure de mise en file.
+    - `updated_at` : Date et heure de la dernière modification.
+    """
+
+    EN_ATTENTE = 'en_attente'
+    EN_COURS = 'en_cours'
+    TERMINEE = 'terminee'
+    ECHEC = 'echec'
+
+    STATUT_CHOICES = [
+        (EN_ATTENTE, 'En attente'),
+        (EN_COURS, 'En cours'),
+        (TERMINEE, 'Terminée'),
+        (ECHEC, 'Échec'),
+    ]
+
+    type_tache = models.CharField(max_length=100, db_index=True, verbose_name="Type de tâche")
+    """
+    Nom du traitement à exécuter, tel qu'enregistré dans `rap_app.taches`.
+    """
+
+    parametres = models.JSONField(default=dict, blank=True, verbose_name="Paramètres")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=EN_ATTENTE, verbose_name="Statut")
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="taches", verbose_name="Demandée par"
+    )
+
+    # Exécution et reprises
+    executer_apres = models.DateTimeField(default=timezone.now, verbose_name="Exécutable à partir de")
+    tentatives = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    max_tentatives = models.PositiveIntegerField(default=3, verbose_name="Nombre maximal de tentatives")
+    executeur = models.CharField(max_length=255, blank=True, default='', verbose_name="Worker")
+    debut_execution = models.DateTimeField(null=True, blank=True, verbose_name="Début d'exécution")
+    fin_execution = models.DateTimeField(null=True, blank=True, verbose_name="Fin d'exécution")
+
+    # Suivi et résultat
+    progression = models.PositiveSmallIntegerField(default=0, verbose_name="Progression (%)")
+    message = models.CharField(max_length=255, blank=True, default='', verbose_name="Message")
+    resultat = models.JSONField(null=True, blank=True, verbose_name="Résultat")
+    fichier = models.FileField(upload_to='taches/', null=True, blank=True, verbose_name="Fichier produit")
+    erreur = models.TextField(blank=True, default='', verbose_name="Dernière erreur")
+
+    objects = TacheManager()
+
+    def avancer(self, progression, message=None):
+        """
+        Enregistre l'avancement de la tâche (0 à 100), visible immédiatement par l'endpoint de statut.
+        """
+        self.progression = max(0, min(int(progression), 100))
+        champs = {'progression': self.progression, 'updated_at': timezone.now()}
+        if message is not None:
+            self.message = message[:255]
+            champs['message'] = self.message
+        Tache.objects.filter(pk=self.pk).update(**champs)
+
+    @property
+    def est_terminee(self):
+        return self.statut in (self.TERMINEE, self.ECHEC)
+
+    def __str__(self):
+        return f"{self.type_tache} #{self.pk} ({self.get_statut_display()})"
+
+    class Meta:
+        verbose_name = "Tâche de fond"
+        verbose_name_plural = "Tâches de fond"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['statut', 'executer_apres']),
+            models.Index(fields=['created_at']),
+        ]
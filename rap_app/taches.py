@@ -0,0 +1,123 @@
+"""
+Traitements exécutables en tâche de fond (voir `rap_app.utils.taches` et `manage.py executer_taches`).
+"""
+import secrets
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.utils.dateparse import parse_date
+from django.utils.module_loading import import_string
+
+from .models import Document, Formation, Rapport, Tache
+from .utils import export_csv, miniatures
+from .utils.taches import tache
+
+
+# Nombre de formations traitées entre deux mises à jour de la progression
+TAILLE_LOT_FORMATIONS = 500
+
+
+def _par_lots(ids, taille_lot):
+    for debut in range(0, len(ids), taille_lot):
+        yield debut + min(taille_lot, len(ids) - debut), ids[debut:debut + taille_lot]
+
+
+@tache('generer_rapports')
+def generer_rapports(tache_en_cours, periode, date_debut, date_fin, formations=None):
+    """Génère les rapports d'une période (toutes les formations actives, ou la liste d'ids `formations`)."""
+    if formations is None:
+        formations = list(Formation.objects.formations_actives().order_by('id').values_list('id', flat=True))
+
+    rapports_crees = 0
+    for traitees, lot in _par_lots(formations, TAILLE_LOT_FORMATIONS):
+        rapports_crees += Rapport.objects.generer(
+            periode, parse_date(date_debut), parse_date(date_fin), formations=Formation.objects.filter(pk__in=lot)
+        )
+        tache_en_cours.avancer(100 * traitees / len(formations), f"{rapports_crees} rapport(s) généré(s)")
+    return {'rapports_crees': rapports_crees}
+
+
+@tache('recalculer_indicateurs')
+def recalculer_indicateurs(tache_en_cours, formations):
+    """Recalcule les indicateurs de remplissage stockés des formations données."""
+    for traitees, lot in _par_lots(formations, TAILLE_LOT_FORMATIONS):
+        Formation.objects.recalculer_indicateurs(Formation.objects.filter(pk__in=lot))
+        tache_en_cours.avancer(100 * traitees / len(formations), f"{traitees} formation(s) recalculée(s)")
+    return {'formations': len(formations)}
+
+
+@tache('export_csv')
+def exporter_csv(tache_en_cours, vue, parametres=''):
+    """
+    Produit l'export CSV d'une vue d'export (`ExportCSVMixin`) avec les paramètres de requête donnés,
+    et l'attache à la tâche. Le fichier est écrit au fil de l'eau : la mémoire reste constante.
+    Il est servi par la vue `tache-fichier` (demandeur ou staff) ; son nom stocké est imprévisible,
+    au cas où le dossier des médias serait exposé directement.
+    """
+    from .views.base_views import ExportCSVMixin
+
+    classe = import_string(vue)
+    if not (isinstance(classe, type) and issubclass(classe, ExportCSVMixin)):
+        raise ValueError(f"{vue} n'est pas une vue d'export.")
+
+    requete = HttpRequest()
+    requete.method = 'GET'
+    requete.GET = QueryDict(parametres)
+    requete.user = tache_en_cours.utilisateur or AnonymousUser()
+    export = classe()
+    export.setup(requete)
+
+    total = export.get_queryset().count() or 1
+    lignes = 0
+    with tempfile.TemporaryFile() as fichier:
+        for numero, ligne in enumerate(export_csv.lignes_csv(export.entete, export.get_lignes())):
+            fichier.write(ligne.encode('utf-8'))
+            lignes = numero
+            if numero and numero % export_csv.TAILLE_LOT == 0:
+                tache_en_cours.avancer(100 * numero / total, f"{numero} ligne(s) exportée(s)")
+        fichier.seek(0)
+        nom_stocke = f"{tache_en_cours.pk}_{secrets.token_hex(16)}_{export.nom_fichier}"
+        tache_en_cours.fichier.save(nom_stocke, File(fichier), save=False)
+
+    Tache.objects.filter(pk=tache_en_cours.pk).update(fichier=tache_en_cours.fichier.name)
+    return {'lignes': lignes, 'nom_fichier': export.nom_fichier}
+
+
+@tache('generer_miniature')
+def generer_miniature(tache_en_cours, document):
+    """
+    Génère la miniature d'un document. Un fichier déjà miniaturisé pour un autre document
+    (même contenu, donc même fichier stocké) réutilise sa miniature sans nouveau rendu.
+    """
+    document = Document.objects.filter(pk=document).only('fichier', 'miniature').first()
+    if document is None or not document.fichier:
+        return {'miniature': None}
+
+    nom_miniature = (
+        Document.objects.filter(fichier=document.fichier.name).exclude(miniature__isnull=True)
+        .exclude(miniature='').values_list('miniature', flat=True).first()
+    )
+    contenu = None
+    if nom_miniature is None:
+        contenu = miniatures.generer(document.fichier)
+        if contenu is None:
+            return {'miniature': None}
+
+    # ✅ Miniature verrouillée (voir `StockageDedoublonne.verrouiller`) jusqu'à ce que le document la désigne
+    storage = document.miniature.field.storage
+    with transaction.atomic():
+        if contenu is None:
+            storage.verrouiller(nom_miniature)
+            if not storage.exists(nom_miniature):
+                raise RuntimeError(f"Miniature {nom_miniature} libérée pendant la tâche : nouvelle tentative.")
+        else:
+            nom_miniature = storage.save(
+                document.miniature.field.generate_filename(document, 'miniature.jpg'), ContentFile(contenu)
+            )
+        # ✅ Le fichier a pu être remplacé pendant le rendu : la miniature n'est attachée qu'au même fichier
+        Document.objects.filter(pk=document.pk, fichier=document.fichier.name).update(miniature=nom_miniature)
+    return {'miniature': nom_miniature}
@@ -1,9 +1,15 @@
-
 from django import template
 
+from ..utils.referentiel import ListeReferentiel
+
 register = template.Library()
 
 @register.filter
 def get_value(queryset, key):
-    """Retourne l'objet correspondant à la clé donnée."""
+    """
+    Retourne l'objet correspondant à la clé donnée.
+    Les listes du référentiel (`rap_app.utils.referentiel`) sont indexées par id : aucune requête n'est émise.
+    """
+    if isinstance(queryset, ListeReferentiel):
+        return queryset.get(key)
     return queryset.filter(id=key).first()
@@ -0,0 +1,95 @@
+"""
+Outils de test : budget de requêtes SQL par URL.
+
+Le nombre de requêtes est lu dans l'en-tête ajouté par `InstrumentationSQLMiddleware` :
+il couvre toute la requête HTTP (session, authentification, vue, gabarit).
+"""
+from datetime import date, timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import URLPattern, URLResolver
+
+from ..middleware import ENTETE_NOMBRE
+from ..models.centres import Centre
+from ..models.commentaires import Commentaire
+from ..models.documents import Document
+from ..models.entreprises import Entreprise
+from ..models.evenements import Evenement
+from ..models.formations import Formation
+from ..models.statut import Statut
+from ..models.taches import Tache
+from ..models.types_offre import TypeOffre
+
+
+def routes_nommees(urlpatterns, prefixe=''):
+    """Retourne les noms de toutes les routes (y compris incluses) d'une liste de motifs d'URL."""
+    noms = []
+    for motif in urlpatterns:
+        if isinstance(motif, URLResolver):
+            espace = f"{motif.namespace}:" if motif.namespace else ''
+            noms += routes_nommees(motif.url_patterns, prefixe + espace)
+        elif isinstance(motif, URLPattern) and motif.name:
+            noms.append(prefixe + motif.name)
+    return noms
+
+
+def creer_jeu_de_donnees(utilisateur, nombre_formations=15):
+    """
+    Crée un jeu de données où chaque liste contient plusieurs lignes et chaque formation
+    des objets liés : un accès par ligne (N+1) y devient visible dans le nombre de requêtes.
+    Retourne les objets à utiliser comme paramètres des routes de détail.
+    """
+    centre = Centre.objects.create(nom="Centre Budget", code_postal="75001")
+    statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+    type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+    entreprise = Entreprise.objects.create(nom="Entreprise Budget")
+
+    for i in range(nombre_formations):
+        formation = Formation.objects.create(
+            nom=f"Formation budget {i}", centre=centre, statut=statut, type_offre=type_offre,
+            start_date=date.today() - timedelta(days=i), end_date=date.today() + timedelta(days=30),
+            prevus_crif=10, inscrits_crif=i % 10, num_offre=f"BUD{i}",
+        )
+        formation.entreprises.add(entreprise)
+        for j in range(2):
+            Commentaire.objects.create(formation=formation, utilisateur=utilisateur, contenu=f"Commentaire {i}-{j}")
+            Evenement.objects.create(
+                formation=formation, type_evenement=Evenement.INFO_PRESENTIEL,
+                event_date=date.today() + timedelta(days=j), details=f"Événement {i}-{j}",
+            )
+        Document.objects.create(
+            formation=formation, utilisateur=utilisateur, nom_fichier=f"Document {i}",
+            fichier=SimpleUploadedFile(f"document_{i}.pdf", b"%PDF-1.4 budget"), type_document=Document.PDF,
+        )
+
+    return {
+        'centre': centre,
+        'statut': statut,
+        'type-offre': type_offre,
+        'entreprise': entreprise,
+        'formation': formation,
+        'commentaire': Commentaire.objects.first(),
+        'evenement': Evenement.objects.first(),
+        'document': Document.objects.first(),
+        'tache': Tache.objects.mettre_en_file('recalculer_indicateurs', {'formations': [formation.pk]}, utilisateur=utilisateur),
+    }
+
+
+class BudgetRequetesMixin:
+    """Assertions sur le nombre de requêtes SQL d'une requête HTTP (à combiner avec `TestCase`)."""
+
+    def nombre_requetes(self, response):
+        """Nombre de requêtes SQL mesuré par le middleware pour cette réponse."""
+        self.assertIn(ENTETE_NOMBRE, response, "InstrumentationSQLMiddleware n'est pas activé.")
+        return int(response[ENTETE_NOMBRE])
+
+    def assertBudgetRequetes(self, url, budget, **kwargs):
+        """Effectue un GET sur `url` et vérifie qu'il reste dans le budget de requêtes SQL."""
+        response = self.client.get(url, **kwargs)
+        self.assertLess(response.status_code, 500, f"{url} : erreur {response.status_code}")
+        nombre = self.nombre_requetes(response)
+        self.assertLessEqual(
+            nombre, budget,
+            f"{url} : {nombre} requêtes SQL pour un budget de {budget} (régression N+1 ?)"
+        )
+        return response
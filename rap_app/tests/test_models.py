@@ -1,27 +1,61 @@
 import os
 import tempfile
-from datetime import date, timedelta
-
-from django.test import TestCase
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+from datetime import date, datetime, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase as DjangoTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.core.cache import cache
 
+from ..management.commands.reconcilier_fichiers import Command as ReconcilierFichiers
 from ..models.base import BaseModel
 from ..models.centres import Centre
 from ..models.commentaires import Commentaire
-from ..models.documents import Document, validate_file_extension
+from ..models.documents import Document, FichierStocke, validate_file_extension
 from ..models.entreprises import Entreprise
 from ..models.evenements import Evenement
 from ..models.formations import Formation
-from ..models.historique_formations import HistoriqueFormation
+from ..models.historique_formations import AgregatHistoriqueFormation, HistoriqueFormation
+from ..models.parametres import Parametre
+from ..models.rapport import Rapport
+from ..models.recherches import AgregatRecherche, Recherche
+from ..models.taches import Tache
 from ..models.statut import Statut, get_default_color
 from ..models.types_offre import TypeOffre
+from ..templatetags.custom_filters import get_value
+from ..utils import autocompletion, index_recherche, miniatures, referentiel, taches, telechargement, versions_cache
+from ..utils.pagination import PaginationCurseur
+from ..utils.recalculs_differes import recalculs_differes
+from ..utils.journal_recherches import journal
 
 User = get_user_model()
 
 
+class TestCase(DjangoTestCase):
+    """
+    Chaque test s'exécute dans une transaction annulée à la fin : les invalidations différées
+    par `transaction.on_commit` n'y ont jamais lieu. Chaque test repart donc d'un cache et d'un référentiel vides.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        cache.clear()
+        for table in referentiel.REFERENTIELS:
+            table.vider()
+
+
 class CentreTestCase(TestCase):
     """Tests pour le modèle Centre"""
 
@@ -243,6 +277,42 @@ class FormationTestCase(TestCase):
         self.formation.save()
         self.assertFalse(self.formation.is_a_recruter)  # 0 places à pourvoir
 
+    def test_indicateurs_stockes(self):
+        """Test des indicateurs de remplissage stockés et de leur recalcul"""
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.places_disponibles, 10)
+        self.assertEqual(self.formation.places_restantes_crif, 7)
+        self.assertAlmostEqual(self.formation.taux_saturation, 33.33, places=2)
+        self.assertIn(self.formation, Formation.objects.formations_a_recruter())
+
+        # Un `update()` contourne `save()` : le recalcul en masse doit réaligner les colonnes
+        Formation.objects.filter(pk=self.formation.pk).update(inscrits_crif=10, inscrits_mp=5)
+        Formation.objects.recalculer_indicateurs()
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.places_disponibles, 0)
+        self.assertEqual(self.formation.taux_saturation, 100)
+        self.assertNotIn(self.formation, Formation.objects.formations_a_recruter())
+
+    def test_statistiques(self):
+        """Test des statistiques globales (une requête, mises en cache, invalidées à l'enregistrement)"""
+        Formation.objects.create(
+            nom="Formation future", centre=self.centre, statut=self.statut, type_offre=self.type_offre,
+            start_date=date.today() + timedelta(days=10), prevus_crif=5, inscrits_crif=5
+        )
+        with self.assertNumQueries(1):
+            stats = Formation.objects.statistiques()
+        self.assertEqual(stats, {'total': 2, 'actives': 1, 'a_venir': 1, 'terminees': 0, 'a_recruter': 1})
+
+        with self.assertNumQueries(0):
+            Formation.objects.statistiques()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.formation.end_date = date.today() - timedelta(days=1)
+            self.formation.save()
+        stats = Formation.objects.statistiques()
+        self.assertEqual(stats['actives'], 0)
+        self.assertEqual(stats['terminees'], 1)
+
     def test_str_method(self):
         """Test de la méthode __str__"""
         self.assertEqual(str(self.formation), "Formation Python (Centre Test)")
@@ -333,7 +403,13 @@ class CommentaireTestCase(TestCase):
         # Vérifier que la formation a été mise à jour
         self.formation.refresh_from_db()
         self.assertEqual(self.formation.saturation, 75)  # La valeur de saturation du commentaire
-        self.assertEqual(self.formation.dernier_commentaire, "Test de saturation")
+        self.assertEqual(self.formation.dernier_commentaire, commentaire)
+
+        # Un commentaire sans saturation conserve la valeur actuelle
+        Commentaire.objects.create(formation=self.formation, utilisateur=self.user, contenu="Sans saturation")
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.saturation, 75)
+        self.assertEqual(self.formation.dernier_commentaire.contenu, "Sans saturation")
 
     def test_signal_update_dernier_commentaire(self):
         """Test du signal qui met à jour le dernier commentaire"""
@@ -352,12 +428,58 @@ class CommentaireTestCase(TestCase):
         
         # Vérifier que le dernier commentaire est bien le dernier créé
         self.formation.refresh_from_db()
-        self.assertEqual(self.formation.dernier_commentaire, "Deuxième commentaire")
+        self.assertEqual(self.formation.dernier_commentaire, commentaire2)
+
+        # Enregistrer à nouveau l'ancien commentaire ne déplace pas le pointeur
+        commentaire1.contenu = "Premier commentaire modifié"
+        commentaire1.save()
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.dernier_commentaire, commentaire2)
         
         # Supprimer le dernier commentaire et vérifier la mise à jour
         commentaire2.delete()
         self.formation.refresh_from_db()
-        self.assertEqual(self.formation.dernier_commentaire, "Premier commentaire")
+        self.assertEqual(self.formation.dernier_commentaire, commentaire1)
+
+        commentaire1.delete()
+        self.formation.refresh_from_db()
+        self.assertIsNone(self.formation.dernier_commentaire)
+
+    def test_ajout_commentaire_une_seule_mise_a_jour(self):
+        """L'ajout d'un commentaire ne réenregistre pas la formation : INSERT, UPDATE conditionnel, index de recherche"""
+        with self.assertNumQueries(3):
+            commentaire = self.formation.add_commentaire(self.user, "Commentaire rapide", saturation=40)
+        self.assertEqual(self.formation.dernier_commentaire, commentaire)
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.dernier_commentaire_id, commentaire.pk)
+        self.assertEqual(self.formation.saturation, 40)
+
+    def test_commentaire_deplace_vers_une_autre_formation(self):
+        """Un commentaire déplacé met à jour l'ancienne formation et la nouvelle"""
+        autre = Formation.objects.create(
+            nom="Autre formation", centre=self.centre, statut=self.statut, type_offre=self.type_offre
+        )
+        ancien = Commentaire.objects.create(formation=self.formation, contenu="Ancien", saturation=30)
+        deplace = Commentaire.objects.create(formation=self.formation, contenu="À déplacer", saturation=70)
+
+        deplace = Commentaire.objects.get(pk=deplace.pk)
+        deplace.formation = autre
+        deplace.save()
+
+        self.formation.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual((self.formation.dernier_commentaire, self.formation.saturation), (ancien, 30))
+        self.assertEqual((autre.dernier_commentaire, autre.saturation), (deplace, 70))
+
+    def test_saturation_effacee_sur_le_dernier_commentaire(self):
+        """Effacer la saturation du dernier commentaire reporte la dernière saturation encore renseignée"""
+        Commentaire.objects.create(formation=self.formation, contenu="Premier", saturation=30)
+        dernier = Commentaire.objects.create(formation=self.formation, contenu="Second", saturation=80)
+
+        dernier.saturation = None
+        dernier.save()
+        self.formation.refresh_from_db()
+        self.assertEqual((self.formation.dernier_commentaire, self.formation.saturation), (dernier, 30))
 
 
 class EvenementTestCase(TestCase):
@@ -455,6 +577,53 @@ class EvenementTestCase(TestCase):
         self.formation.refresh_from_db()
         self.assertEqual(self.formation.nombre_evenements, 1)
 
+    def test_compteur_changement_de_formation(self):
+        """Le déplacement d'un événement décrémente l'ancienne formation et incrémente la nouvelle"""
+        autre = Formation.objects.create(
+            nom="Autre formation", centre=self.centre, statut=self.statut, type_offre=self.type_offre
+        )
+        evenement = Evenement.objects.create(formation=self.formation, type_evenement=Evenement.FORUM)
+
+        evenement = Evenement.objects.get(pk=evenement.pk)
+        evenement.formation = autre
+        evenement.save()
+        evenement.details = "Modifié"
+        evenement.save()  # ✅ Un second enregistrement ne recompte pas
+
+        self.formation.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual((self.formation.nombre_evenements, autre.nombre_evenements), (0, 1))
+
+        evenement.delete()
+        autre.refresh_from_db()
+        self.assertEqual(autre.nombre_evenements, 0)
+
+    def test_chargement_sans_formation(self):
+        """Un événement chargé sans `formation` ne relit pas sa formation au chargement ; le compteur reste juste"""
+        evenement = Evenement.objects.create(formation=self.formation, type_evenement=Evenement.FORUM)
+        with self.assertNumQueries(1):
+            evenements = list(Evenement.objects.only('details').filter(pk=evenement.pk))
+        evenements[0].details = "Modifié"
+        evenements[0].save()
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.nombre_evenements, 1)
+
+        Evenement.objects.only('details').get(pk=evenement.pk).delete()  # Formation lue avant la suppression
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.nombre_evenements, 0)
+
+    def test_add_evenement_compte_une_seule_fois(self):
+        """`add_evenement` n'incrémente le compteur qu'une fois, sans recomptage ni relecture"""
+        with CaptureQueriesContext(connection) as requetes:
+            self.formation.add_evenement(Evenement.JPO, date.today())
+        ecritures_formation = [q['sql'] for q in requetes if q['sql'].startswith('UPDATE "rap_app_formation"')]
+        self.assertEqual(len(ecritures_formation), 1)
+        self.assertIn('"nombre_evenements" + 1', ecritures_formation[0])
+        self.assertFalse(any('COUNT(' in q['sql'] for q in requetes))
+        self.assertEqual(self.formation.nombre_evenements, 1)
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.nombre_evenements, 1)
+
 
 class DocumentTestCase(TestCase):
     """Tests pour le modèle Document"""
@@ -619,4 +788,1160 @@ class HistoriqueFormationTestCase(TestCase):
         )
         
         expected_str = f"Formation Test - {historique.created_at.strftime('%Y-%m-%d')}"
-        self.assertEqual(str(historique), expected_str)
\ No newline at end of file
+        self.assertEqual(str(historique), expected_str)
+
+class IndexRechercheTestCase(TestCase):
+    """Tests de l'index de recherche plein texte"""
+
+    def setUp(self):
+        self.centre = Centre.objects.create(nom="Centre Test")
+        self.statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        self.type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.python = Formation.objects.create(
+            nom="Développeur Python", num_offre="OF-2025-01",
+            centre=self.centre, statut=self.statut, type_offre=self.type_offre
+        )
+        self.web = Formation.objects.create(
+            nom="Développeur web full stack", num_kairos="KA123",
+            centre=self.centre, statut=self.statut, type_offre=self.type_offre
+        )
+
+    def test_recherche_et_mise_a_jour(self):
+        """L'index suit les créations, modifications et suppressions"""
+        resultats = index_recherche.filtrer(Formation.objects.all(), "developpeur")
+        self.assertEqual(set(resultats), {self.python, self.web})
+        self.assertEqual(list(index_recherche.filtrer(Formation.objects.all(), "ka12")), [self.web])
+
+        self.python.nom = "Data analyste"
+        self.python.save()
+        self.assertEqual(list(index_recherche.filtrer(Formation.objects.all(), "developpeur")), [self.web])
+
+        self.web.delete()
+        self.assertFalse(index_recherche.filtrer(Formation.objects.all(), "developpeur").exists())
+
+    def test_classement_par_pertinence(self):
+        """Les objets les plus pertinents sont renvoyés en premier"""
+        Commentaire.objects.create(formation=self.python, contenu="Relance des candidats pour la session")
+        pertinent = Commentaire.objects.create(formation=self.python, contenu="Relance relance : candidats relancés")
+        resultats = list(index_recherche.filtrer(Commentaire.objects.all(), "relance"))
+        self.assertEqual(len(resultats), 2)
+        self.assertEqual(resultats[0], pertinent)
+
+    def test_liste_des_commentaires_par_pertinence(self):
+        """Une recherche dans la liste des commentaires garde le classement par pertinence (et non par date)"""
+        pertinent = Commentaire.objects.create(formation=self.python, contenu="Relance relance : candidats relancés")
+        recent = Commentaire.objects.create(formation=self.python, contenu="Relance des candidats pour la session")
+        self.client.force_login(User.objects.create_user(username="lecteur", password="password"))
+
+        response = self.client.get(reverse('commentaire-list'), {'q': 'relance'})
+        self.assertEqual(list(response.context['commentaires']), [pertinent, recent])
+        response = self.client.get(reverse('commentaire-list'))
+        self.assertEqual(list(response.context['commentaires'])[:2], [recent, pertinent])
+
+
+class PaginationCurseurTestCase(TestCase):
+    """Tests de la pagination par curseur (keyset)"""
+
+    def setUp(self):
+        centre = Centre.objects.create(nom="Centre Test")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        for i in range(23):
+            Formation.objects.create(
+                nom=f"Formation {i % 5}", centre=centre, statut=statut, type_offre=type_offre,
+                start_date=None if i % 7 == 0 else date.today() - timedelta(days=i % 4)
+            )
+        self.factory = RequestFactory()
+
+    def _parcourir(self, ordre):
+        paginateur = PaginationCurseur(Formation, ordre, 5)
+        pages = [paginateur.paginer(Formation.objects.all(), self.factory.get('/'))]
+        while pages[-1].has_next():
+            pages.append(paginateur.paginer(Formation.objects.all(), self.factory.get(pages[-1].lien_suivant)))
+        return paginateur, pages
+
+    def test_parcours_complet(self):
+        """Toutes les formations sont parcourues une seule fois, dans l'ordre attendu (NULL en dernier)"""
+        paginateur, pages = self._parcourir(['-start_date', 'nom'])
+        ids = [formation.id for page in pages for formation in page]
+        attendu = list(Formation.objects.order_by(
+            F('start_date').desc(nulls_last=True), 'nom', 'id'
+        ).values_list('id', flat=True))
+        self.assertEqual(ids, attendu)
+        self.assertEqual(len(pages), 5)
+        self.assertFalse(pages[0].has_previous())
+
+        # Retour arrière depuis la dernière page
+        precedente = paginateur.paginer(Formation.objects.all(), self.factory.get(pages[-1].lien_precedent))
+        self.assertEqual(list(precedente), list(pages[-2]))
+
+    def test_curseur_invalide(self):
+        """Un curseur altéré ramène à la première page"""
+        paginateur, pages = self._parcourir(['nom'])
+        page = paginateur.paginer(Formation.objects.all(), self.factory.get('/', {'curseur': 'altere'}))
+        self.assertEqual(list(page), list(pages[0]))
+
+
+class ReferentielTestCase(TestCase):
+    """Tests du référentiel en mémoire (centres, statuts, types d'offre)"""
+
+    def setUp(self):
+        self.centre = Centre.objects.create(nom="Centre Test")
+        self.statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+
+    def test_chargement_unique(self):
+        """Le référentiel est chargé une fois puis servi sans requête"""
+        referentiel.centres.tous()
+        referentiel.statuts.tous()
+        with self.assertNumQueries(0):
+            self.assertEqual(referentiel.centres.get(str(self.centre.pk)), self.centre)
+            self.assertEqual(referentiel.statuts.libelle(self.statut.pk), self.statut.get_nom_display())
+            self.assertEqual(referentiel.couleur_statut(self.statut.pk), self.statut.couleur)
+            self.assertEqual(get_value(referentiel.centres.tous(), self.centre.pk), self.centre)
+            self.assertIsNone(referentiel.centres.get('inconnu'))
+
+    def test_invalidation(self):
+        """Une écriture sur un centre recharge le référentiel, une fois la transaction validée"""
+        referentiel.centres.tous()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.centre.nom = "Centre Renommé"
+            self.centre.save()
+            autre = Centre.objects.create(nom="Autre Centre")
+            self.assertEqual(referentiel.centres.libelle(self.centre.pk), "Centre Test")
+        self.assertEqual(referentiel.centres.libelle(self.centre.pk), "Centre Renommé")
+        self.assertIn((autre.pk, "Autre Centre"), referentiel.centres.choix())
+        with self.captureOnCommitCallbacks(execute=True):
+            autre.delete()
+        self.assertIsNone(referentiel.centres.get(autre.pk))
+
+
+class ExportCSVTestCase(TestCase):
+    """Tests de l'export CSV en streaming des formations"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user(username="export", password="password")
+        self.client.force_login(self.utilisateur)
+        centre = Centre.objects.create(nom="Centre Export")
+        autre_centre = Centre.objects.create(nom="Autre Centre")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        for i in range(5):
+            Formation.objects.create(
+                nom=f"Export {i}", centre=centre if i < 3 else autre_centre,
+                statut=statut, type_offre=type_offre, prevus_crif=10, inscrits_crif=i
+            )
+        self.centre = centre
+
+    def test_export_streaming_filtre(self):
+        """L'export est diffusé en streaming et applique les filtres de la liste"""
+        response = self.client.get(reverse('formation-export'), {'centre': self.centre.pk, 'tri': 'nom'})
+        self.assertTrue(response.streaming)
+        lignes = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lignes[0].split(',')[:3], ['ID', 'Nom', 'Centre'])
+        self.assertEqual([ligne.split(',')[1] for ligne in lignes[1:]], ["Export 0", "Export 1", "Export 2"])
+        self.assertEqual(lignes[1].split(',')[2], "Centre Export")
+
+
+class RapportGenerationTestCase(TestCase):
+    """Tests de la génération en masse des rapports"""
+
+    def setUp(self):
+        centre = Centre.objects.create(nom="Centre Rapport")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.formations = [
+            Formation.objects.create(
+                nom=f"Rapport {i}", centre=centre, statut=statut, type_offre=type_offre,
+                start_date=date.today() - timedelta(days=5), end_date=date.today() + timedelta(days=5),
+                prevus_crif=10, inscrits_crif=i, nombre_candidats=i * 2
+            )
+            for i in range(1, 6)
+        ]
+        for _ in range(3):
+            Evenement.objects.create(formation=self.formations[0], type_evenement=Evenement.JOB_DATING, event_date=date.today())
+        self.debut, self.fin = date.today() - timedelta(days=7), date.today()
+
+    def test_generation_en_masse(self):
+        """Les rapports sont créés en un nombre constant de requêtes, sans doublon"""
+        with self.assertNumQueries(8):
+            self.assertEqual(Rapport.objects.generer(Rapport.HEBDOMADAIRE, self.debut, self.fin), 5)
+        rapport = Rapport.objects.get(formation=self.formations[0])
+        self.assertEqual((rapport.nombre_evenements, rapport.total_inscrits, rapport.nombre_candidats), (3, 1, 2))
+        self.assertEqual(Rapport.objects.get(formation=self.formations[1]).nombre_evenements, 0)
+
+        # Seconde génération : tous les rapports existent déjà
+        self.assertEqual(Rapport.objects.generer(Rapport.HEBDOMADAIRE, self.debut, self.fin), 0)
+        self.assertEqual(Rapport.objects.count(), 5)
+
+    def test_generation_concurrente_sans_doublon(self):
+        """Un rapport inséré par une autre génération après la lecture des existants n'est pas dupliqué"""
+        concurrent = self.formations[0]
+        lecture_evenements = Evenement.objects.filter
+
+        def insertion_concurrente(*args, **kwargs):
+            # Lecture des événements : les rapports existants ont déjà été lus
+            Rapport.objects.create(
+                formation=concurrent, periode=Rapport.HEBDOMADAIRE, date_debut=self.debut, date_fin=self.fin
+            )
+            return lecture_evenements(*args, **kwargs)
+
+        with mock.patch.object(Evenement.objects, 'filter', side_effect=insertion_concurrente):
+            crees = Rapport.objects.generer(Rapport.HEBDOMADAIRE, self.debut, self.fin)
+        self.assertEqual(crees, 4)
+        self.assertEqual(Rapport.objects.filter(formation=concurrent).count(), 1)
+
+        with self.assertRaises(ValidationError):
+            Rapport.objects.create(formation=concurrent, periode=Rapport.HEBDOMADAIRE, date_debut=self.debut, date_fin=self.fin)
+
+    def test_generation_invalide(self):
+        """Période inconnue ou dates inversées : aucune création"""
+        with self.assertRaises(ValidationError):
+            Rapport.objects.generer('Trimestriel', self.debut, self.fin)
+        with self.assertRaises(ValidationError):
+            Rapport.objects.generer(Rapport.MENSUEL, self.fin, self.debut)
+        self.assertFalse(Rapport.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class TacheTestCase(TestCase):
+    """Tests de la file de tâches de fond"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user(username="worker", password="password")
+        centre = Centre.objects.create(nom="Centre Tâche")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        for i in range(3):
+            Formation.objects.create(
+                nom=f"Tâche {i}", centre=centre, statut=statut, type_offre=type_offre,
+                start_date=date.today() - timedelta(days=1), end_date=date.today() + timedelta(days=1)
+            )
+
+    def test_reservation_et_execution(self):
+        """Une tâche est réservée une seule fois, exécutée et son résultat enregistré"""
+        tache = Tache.objects.mettre_en_file('generer_rapports', {
+            'periode': Rapport.MENSUEL, 'date_debut': date.today().replace(day=1).isoformat(),
+            'date_fin': date.today().isoformat(),
+        }, utilisateur=self.utilisateur)
+
+        reservee = Tache.objects.reserver('worker-1')
+        self.assertEqual(reservee.pk, tache.pk)
+        self.assertIsNone(Tache.objects.reserver('worker-2'))
+
+        self.assertTrue(taches.executer(reservee))
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.progression, tache.resultat), (Tache.TERMINEE, 100, {'rapports_crees': 3}))
+        self.assertEqual(Rapport.objects.count(), 3)
+
+    def test_reprise_puis_echec(self):
+        """Une tâche en erreur est reprogrammée, puis passe en échec après la dernière tentative"""
+        tache = Tache.objects.mettre_en_file('generer_rapports', {
+            'periode': 'Inconnue', 'date_debut': '2024-01-01', 'date_fin': '2024-01-31'
+        }, max_tentatives=2)
+
+        taches.traiter_suivante('worker')
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), (Tache.EN_ATTENTE, 1))
+        self.assertGreater(tache.executer_apres, timezone.now())
+
+        Tache.objects.filter(pk=tache.pk).update(executer_apres=timezone.now())
+        taches.traiter_suivante('worker')
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), (Tache.ECHEC, 2))
+        self.assertIn('ValidationError', tache.erreur)
+
+    def test_export_en_arriere_plan(self):
+        """L'export demandé en arrière-plan produit le fichier CSV filtré et son statut est consultable"""
+        self.client.force_login(self.utilisateur)
+        response = self.client.get(reverse('formation-export'), {'q': 'Tâche 1', 'arriere_plan': 1})
+        self.assertEqual(response.status_code, 202)
+        tache = Tache.objects.get(pk=response.json()['id'])
+
+        taches.traiter_suivante('worker')
+        statut = self.client.get(response.json()['url_statut']).json()
+        self.assertEqual((statut['statut'], statut['resultat']['lignes']), (Tache.TERMINEE, 1))
+        self.assertEqual(statut['fichier'], reverse('tache-fichier', args=[tache.pk]))
+        tache.refresh_from_db()
+        self.addCleanup(tache.fichier.delete, save=False)
+        self.assertNotEqual(tache.fichier.name, f"taches/{tache.pk}_formations.csv")  # Nom imprévisible
+
+        fichier_produit = self.client.get(statut['fichier'])
+        self.assertIn("Tâche 1", b''.join(fichier_produit.streaming_content).decode())
+        self.assertIn('filename="formations.csv"', fichier_produit['Content-Disposition'])
+
+        # Ni un autre utilisateur, ni un visiteur anonyme
+        self.client.force_login(User.objects.create_user(username="curieux", password="password"))
+        self.assertEqual(self.client.get(statut['fichier']).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(statut['fichier']).status_code, 302)
+
+    def test_liberation_des_taches_bloquees(self):
+        """Une tâche bloquée est remise en file, sauf si elle a épuisé ses tentatives"""
+        il_y_a_deux_heures = timezone.now() - timedelta(hours=2)
+        reprise = Tache.objects.mettre_en_file('recalculer_indicateurs', {'formations': []})
+        epuisee = Tache.objects.mettre_en_file('recalculer_indicateurs', {'formations': []}, max_tentatives=2)
+        Tache.objects.filter(pk=reprise.pk).update(statut=Tache.EN_COURS, tentatives=1, debut_execution=il_y_a_deux_heures)
+        Tache.objects.filter(pk=epuisee.pk).update(statut=Tache.EN_COURS, tentatives=2, debut_execution=il_y_a_deux_heures)
+
+        self.assertEqual(Tache.objects.liberer_bloquees(timedelta(hours=1)), 1)
+        reprise.refresh_from_db()
+        epuisee.refresh_from_db()
+        self.assertEqual(reprise.statut, Tache.EN_ATTENTE)
+        self.assertEqual((epuisee.statut, epuisee.tentatives), (Tache.ECHEC, 2))
+        self.assertIsNotNone(epuisee.fin_execution)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class TelechargementDocumentTestCase(TestCase):
+    """Tests du téléchargement des documents (plages, requêtes conditionnelles, envoi délégué)"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user(username="lecteur", password="password")
+        formation = Formation.objects.create(
+            nom="Formation Documents",
+            centre=Centre.objects.create(nom="Centre Documents"),
+            statut=Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS),
+            type_offre=TypeOffre.objects.create(nom=TypeOffre.CRIF),
+        )
+        self.contenu = bytes(range(256)) * 40
+        self.document = Document.objects.create(
+            formation=formation, utilisateur=self.utilisateur, nom_fichier="Convention",
+            fichier=SimpleUploadedFile("convention.pdf", self.contenu), type_document=Document.PDF,
+        )
+        self.url = reverse('document-download', args=[self.document.pk])
+        self.client.force_login(self.utilisateur)
+
+    def test_telechargement_complet_en_streaming(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), self.contenu)
+        self.assertEqual(response['Content-Length'], str(len(self.contenu)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('filename="Convention.pdf"', response['Content-Disposition'])
+
+    def test_plages(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.contenu)}')
+        self.assertEqual(b"".join(response.streaming_content), self.contenu[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b"".join(response.streaming_content), self.contenu[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.contenu)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # `If-Range` périmé : le fichier complet est renvoyé
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"perime"')
+        self.assertEqual(response.status_code, 200)
+
+        # Fichier vide : aucune plage n'est satisfiable
+        requete = RequestFactory().get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertIs(telechargement.plage_demandee(requete, 0, '"vide"', None), False)
+
+    def test_nom_de_fichier_echappe(self):
+        Document.objects.filter(pk=self.document.pk).update(nom_fichier='Convention "signée"')
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['Content-Disposition'], "attachment; filename*=utf-8''Convention%20%22sign%C3%A9e%22.pdf"
+        )
+
+    def test_requetes_conditionnelles(self):
+        response = self.client.get(self.url)
+        response.close()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    @override_settings(RAP_APP_TELECHARGEMENT_DELEGUE='x-accel-redirect', RAP_APP_TELECHARGEMENT_PREFIXE_INTERNE='/protege/')
+    def test_envoi_delegue_au_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protege/{self.document.fichier.name}')
+        self.assertEqual(response.content, b"")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class StockageDedoublonneTestCase(TestCase):
+    """Tests du stockage des documents par empreinte de contenu"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user(username="depot", password="password")
+        self.formation = Formation.objects.create(
+            nom="Formation Stockage",
+            centre=Centre.objects.create(nom="Centre Stockage"),
+            statut=Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS),
+            type_offre=TypeOffre.objects.create(nom=TypeOffre.CRIF),
+        )
+
+    def creer_document(self, contenu, nom="convention.pdf"):
+        return Document.objects.create(
+            formation=self.formation, utilisateur=self.utilisateur, nom_fichier=nom, type_document=Document.PDF,
+            fichier=SimpleUploadedFile(nom, contenu),
+        )
+
+    def test_contenu_identique_stocke_une_fois(self):
+        premier = self.creer_document(b"%PDF convention type")
+        second = self.creer_document(b"%PDF convention type", nom="Convention (copie).PDF")
+        storage = premier.fichier.storage
+
+        self.assertEqual(premier.fichier.name, second.fichier.name)
+        self.assertRegex(premier.fichier.name, r'^formations/documents/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$')
+        self.assertEqual(storage.nombre_references(premier.fichier.name), 2)
+
+        # Le fichier partagé survit à la suppression d'une référence, pas de la dernière
+        with self.captureOnCommitCallbacks(execute=True):
+            premier.delete()
+        self.assertTrue(storage.exists(second.fichier.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(second.fichier.name))
+
+    def test_remplacement_libere_l_ancien_fichier(self):
+        document = self.creer_document(b"%PDF version 1")
+        partage = self.creer_document(b"%PDF version 1")
+        ancien = document.fichier.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.fichier = SimpleUploadedFile("convention.pdf", b"%PDF version 2")
+            document.save()
+        self.assertNotEqual(document.fichier.name, ancien)
+        self.assertTrue(document.fichier.storage.exists(ancien))  # Encore référencé par `partage`
+
+        with self.captureOnCommitCallbacks(execute=True):
+            partage.fichier = SimpleUploadedFile("convention.pdf", b"%PDF version 2")
+            partage.save()
+        self.assertFalse(document.fichier.storage.exists(ancien))
+
+    def test_remplacement_sans_relecture_ni_suppression_avant_validation(self):
+        document = Document.objects.get(pk=self.creer_document(b"%PDF version 1").pk)
+        ancien = document.fichier.name
+
+        with CaptureQueriesContext(connection) as requetes, self.captureOnCommitCallbacks() as callbacks:
+            document.fichier = SimpleUploadedFile("convention.pdf", b"%PDF version 2")
+            document.save()
+        self.assertFalse(any(q['sql'].startswith('SELECT') and 'rap_app_document' in q['sql'] for q in requetes))
+        self.assertTrue(document.fichier.storage.exists(ancien))  # Transaction non validée : rien n'est supprimé
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(document.fichier.storage.exists(ancien))
+
+    def test_annulation_conserve_le_fichier(self):
+        document = self.creer_document(b"%PDF conserve")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    document.delete()
+                    raise RuntimeError("annulation")
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertTrue(document.fichier.storage.exists(document.fichier.name))
+
+    def test_fichier_stocke_verrouillable_jusqu_a_sa_liberation(self):
+        """Chaque fichier stocké a sa ligne de verrou, supprimée avec le fichier ; une longue extension est tronquée"""
+        nom = "export.extensiontreslongue-de-plus-de-seize"
+        document = Document.objects.create(
+            formation=self.formation, utilisateur=self.utilisateur, nom_fichier=nom, type_document=Document.AUTRE,
+            fichier=SimpleUploadedFile(nom, b"contenu"),
+        )
+        self.assertTrue(FichierStocke.objects.filter(nom=document.fichier.name).exists())
+        self.assertLessEqual(len(document.fichier.name), Document._meta.get_field('fichier').max_length)
+        self.assertTrue(document.fichier.name.endswith('.extensiontreslo'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertFalse(document.fichier.storage.exists(document.fichier.name))
+        self.assertFalse(FichierStocke.objects.filter(nom=document.fichier.name).exists())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_reconciliation_des_fichiers(self):
+        """La commande supprime les orphelins anciens et signale les fichiers manquants"""
+        conserve = self.creer_document(b"%PDF conserve")
+        perdu = self.creer_document(b"%PDF perdu")
+        storage = conserve.fichier.storage
+        os.remove(storage.path(perdu.fichier.name))
+
+        orphelin = storage.save('formations/documents/orphelin.pdf', SimpleUploadedFile('orphelin.pdf', b"%PDF orphelin"))
+        recent = storage.save('formations/documents/recent.pdf', SimpleUploadedFile('recent.pdf', b"%PDF recent"))
+        ancien = time.time() - 2 * 3600
+        os.utime(storage.path(orphelin), (ancien, ancien))
+
+        sortie = StringIO()
+        call_command('reconcilier_fichiers', '--supprimer-orphelins', '--travailleurs', '2', stdout=sortie)
+        self.assertFalse(storage.exists(orphelin))
+        self.assertTrue(storage.exists(recent))
+        self.assertTrue(storage.exists(conserve.fichier.name))
+        self.assertIn(f"Manquant : {perdu.fichier.name} (document(s) #{perdu.pk})", sortie.getvalue())
+        self.assertIn("2 fichier(s) orphelin(s), 1 supprimé(s).", sortie.getvalue())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_reconciliation_ne_supprime_pas_un_fichier_reutilise(self):
+        """Un fichier ancien vu orphelin par le parcours, puis réutilisé par un document, est conservé"""
+        storage = self.creer_document(b"%PDF gabarit").fichier.storage
+        Document.objects.all().delete()  # Orphelin au moment du parcours (suppression non encore libérée)
+        reutilise = self.creer_document(b"%PDF gabarit")  # Contenu déjà stocké : fichier non réécrit
+        ancien = time.time() - 2 * 3600
+        os.utime(storage.path(reutilise.fichier.name), (ancien, ancien))
+
+        self.assertFalse(ReconcilierFichiers().supprimer(reutilise.fichier.name, storage.path(reutilise.fichier.name)))
+        self.assertTrue(storage.exists(reutilise.fichier.name))
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MiniatureTestCase(TestCase):
+    """Tests de la génération des miniatures en tâche de fond"""
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user(username="illustrateur", password="password")
+        self.formation = Formation.objects.create(
+            nom="Formation Miniatures",
+            centre=Centre.objects.create(nom="Centre Miniatures"),
+            statut=Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS),
+            type_offre=TypeOffre.objects.create(nom=TypeOffre.CRIF),
+        )
+
+    def creer_document(self, contenu=b"contenu image", nom="affiche.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Document.objects.create(
+                formation=self.formation, utilisateur=self.utilisateur, nom_fichier=nom,
+                type_document=Document.IMAGE, fichier=SimpleUploadedFile(nom, contenu),
+            )
+
+    @mock.patch('rap_app.models.documents.miniatures.apercu_disponible', return_value=True)
+    def test_upload_planifie_la_miniature(self, _apercu):
+        document = self.creer_document()
+        tache = Tache.objects.get(type_tache='generer_miniature')
+        self.assertEqual(tache.parametres, {'document': document.pk})
+
+        # Un enregistrement sans nouveau fichier ne replanifie rien
+        with self.captureOnCommitCallbacks(execute=True):
+            document.source = "Affiche officielle"
+            document.save()
+        self.assertEqual(Tache.objects.filter(type_tache='generer_miniature').count(), 1)
+
+    @mock.patch('rap_app.taches.miniatures.generer', return_value=b"miniature jpeg")
+    def test_miniature_partagee_entre_documents_identiques(self, generer):
+        premier = self.creer_document()
+        second = self.creer_document()
+        for document in (premier, second):
+            Tache.objects.mettre_en_file('generer_miniature', {'document': document.pk})
+            taches.traiter_suivante('worker')
+
+        premier.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(generer.call_count, 1)
+        self.assertEqual(premier.miniature.name, second.miniature.name)
+        self.assertTrue(premier.miniature.name.startswith('formations/miniatures/'))
+
+        # La miniature partagée n'est supprimée qu'avec son dernier document
+        storage = premier.miniature.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            premier.delete()
+        self.assertTrue(storage.exists(second.miniature.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(second.miniature.name))
+
+    @skipUnless(miniatures.Image, "Pillow n'est pas installé")
+    def test_generation_image(self):
+        from io import BytesIO
+        image = BytesIO()
+        miniatures.Image.new('RGB', (1600, 1200), 'red').save(image, format='PNG')
+        document = self.creer_document(image.getvalue())
+        contenu = miniatures.generer(document.fichier)
+        with miniatures.Image.open(BytesIO(contenu)) as resultat:
+            self.assertLessEqual(max(resultat.size), max(miniatures.TAILLE_MINIATURE))
+
+
+class TableauDeBordCacheTestCase(TestCase):
+    """Tests du cache des widgets du tableau de bord"""
+
+    def setUp(self):
+        cache.clear()
+        self.utilisateur = User.objects.create_user(username="pilote", password="password", is_staff=True)
+        self.formation = Formation.objects.create(
+            nom="Formation Tableau",
+            centre=Centre.objects.create(nom="Centre Tableau"),
+            statut=Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS),
+            type_offre=TypeOffre.objects.create(nom=TypeOffre.CRIF),
+            start_date=date.today() - timedelta(days=1), end_date=date.today() + timedelta(days=30),
+        )
+        self.client.force_login(self.utilisateur)
+        self.url = reverse('dashboard')
+
+    def test_widgets_lus_dans_le_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):  # Session et utilisateur seulement
+            response = self.client.get(self.url)
+        self.assertEqual([f.pk for f in response.context['formations_recentes']], [self.formation.pk])
+
+    def test_seuls_les_widgets_concernes_sont_recalcules(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Evenement.objects.create(formation=self.formation, type_evenement=Evenement.FORUM, event_date=date.today())
+
+        with self.assertNumQueries(3):  # Session, utilisateur et widget des événements à venir
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['evenements_a_venir']), 1)
+
+    def test_recherches_reservees_au_staff(self):
+        self.utilisateur.is_staff = False
+        self.utilisateur.save()
+        response = self.client.get(self.url)
+        self.assertNotIn('recherches_recentes', response.context)
+
+
+class TauxRemplissageAPITestCase(TestCase):
+    """Tests de l'histogramme des taux de remplissage (StatsAPIView)"""
+
+    def setUp(self):
+        cache.clear()
+        self.utilisateur = User.objects.create_user(username="analyste", password="password")
+        centre = Centre.objects.create(nom="Centre Taux")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        for nom, inscrits in (("Vide", 0), ("Moitié", 5), ("Presque", 8), ("Pleine", 10), ("Surbookée", 12)):
+            Formation.objects.create(
+                nom=nom, centre=centre, statut=statut, type_offre=type_offre, prevus_crif=10, inscrits_crif=inscrits,
+                start_date=date.today() - timedelta(days=1), end_date=date.today() + timedelta(days=1),
+            )
+        self.client.force_login(self.utilisateur)
+        self.url = reverse('statistiques')
+
+    def test_tranches_calculees_en_une_requete(self):
+        self.client.get(self.url, {'action': 'taux_remplissage'})  # Seuils mis en cache
+        with self.assertNumQueries(3):  # Session, utilisateur, histogramme
+            response = self.client.get(self.url, {'action': 'taux_remplissage'})
+        donnees = response.json()
+        self.assertEqual(donnees['tranches'], {'0-50%': 2, '50-75%': 0, '75-90%': 1, '90-100%': 1, '>100%': 1})
+        self.assertNotIn('formations', donnees)
+
+    def test_seuils_parametrables(self):
+        Parametre.objects.create(cle='ALERTE_TAUX_REMPLISSAGE_FAIBLE', valeur='25')
+        Parametre.objects.create(cle='ALERTE_TAUX_REMPLISSAGE_ELEVE', valeur='100')
+        donnees = self.client.get(self.url, {'action': 'taux_remplissage'}).json()
+        self.assertEqual(donnees['tranches'], {'0-25%': 1, '25-100%': 3, '>100%': 1})
+
+    def test_liste_des_formations_paginee(self):
+        donnees = self.client.get(
+            self.url, {'action': 'taux_remplissage', 'formations': 1, 'par_page': 2, 'page': 2}
+        ).json()
+        self.assertEqual([f['nom'] for f in donnees['formations']], ["Presque", "Moitié"])
+        self.assertEqual(donnees['pagination'], {'page': 2, 'pages': 3, 'total': 5})
+
+        donnees = self.client.get(self.url, {'action': 'taux_remplissage', 'formations': 1, 'tranche': 4}).json()
+        self.assertEqual([f['nom'] for f in donnees['formations']], ["Surbookée"])
+
+
+class AgregatHistoriqueFormationTestCase(TestCase):
+    """Tests des agrégats de l'historique (mise à jour incrémentale, reconstruction, courbes d'évolution)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="historien", password="password")
+        self.centre = Centre.objects.create(nom="Centre Agrégats")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        self.type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.formation = Formation.objects.create(
+            nom="Formation Agrégée", centre=self.centre, statut=statut, type_offre=self.type_offre,
+            prevus_crif=10, inscrits_crif=5, utilisateur=self.user
+        )
+        self.maintenant = timezone.now()
+
+    def historique(self, **kwargs):
+        return HistoriqueFormation.objects.create(formation=self.formation, action="modification", **kwargs)
+
+    def agregats(self):
+        return list(AgregatHistoriqueFormation.objects.order_by('granularite', 'debut_periode').values_list(
+            'granularite', 'debut_periode', 'centre_id', 'type_offre_id', 'nb_historiques', 'nb_inscrits', 'nb_formations'
+        ))
+
+    def test_mise_a_jour_incrementale(self):
+        self.historique()
+        self.historique()
+        self.historique(created_at=self.maintenant - timedelta(days=40))
+
+        jour = timezone.localdate(self.maintenant)
+        agregat = AgregatHistoriqueFormation.objects.get(granularite=AgregatHistoriqueFormation.JOUR, debut_periode=jour)
+        self.assertEqual((agregat.centre, agregat.type_offre), (self.centre, self.type_offre))
+        self.assertEqual((agregat.nb_historiques, agregat.nb_inscrits, agregat.nb_formations), (2, 10, 1))
+        self.assertEqual(AgregatHistoriqueFormation.objects.filter(granularite=AgregatHistoriqueFormation.MOIS).count(), 2)
+
+    def test_suppression_et_reconstruction_coherentes(self):
+        premier = self.historique()
+        self.historique()
+        self.historique(created_at=self.maintenant - timedelta(days=3))
+        premier.delete()
+        incrementaux = self.agregats()
+
+        call_command('reconstruire_agregats_historique', stdout=StringIO())
+        self.assertEqual(self.agregats(), incrementaux)
+
+    def test_suppression_en_cascade_d_une_formation(self):
+        autre = Formation.objects.create(
+            nom="Autre Formation", centre=self.centre, statut=self.formation.statut, type_offre=self.type_offre
+        )
+        for _ in range(3):
+            self.historique()
+        HistoriqueFormation.objects.create(formation=autre, action="modification")
+        mois = AgregatHistoriqueFormation.objects.filter(granularite=AgregatHistoriqueFormation.MOIS)
+        self.assertEqual(list(mois.values_list('nb_historiques', 'nb_formations')), [(4, 2)])
+
+        self.formation.delete()
+        self.assertEqual(list(mois.values_list('nb_historiques', 'nb_formations')), [(1, 1)])
+        incrementaux = self.agregats()
+        call_command('reconstruire_agregats_historique', stdout=StringIO())
+        self.assertEqual(self.agregats(), incrementaux)
+
+    def test_agregats_uniques_sans_centre(self):
+        cle = {'granularite': AgregatHistoriqueFormation.JOUR, 'debut_periode': date.today(), 'centre': None, 'type_offre': None}
+        AgregatHistoriqueFormation.objects.create(**cle)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AgregatHistoriqueFormation.objects.create(**cle)
+
+    def test_evolution_lit_les_agregats(self):
+        self.historique()
+        self.historique(created_at=self.maintenant - timedelta(days=1))
+        self.client.force_login(self.user)
+
+        with self.assertNumQueries(3):  # Session, utilisateur, agrégats
+            response = self.client.get(reverse('statistiques'), {'action': 'evolution_formations', 'granularite': 'jour'})
+        evolution = response.json()['evolution']
+        self.assertEqual(len(evolution), 2)
+        self.assertEqual(evolution[-1], {
+            'periode': timezone.localdate(self.maintenant).strftime('%Y-%m-%d'), 'nb_inscrits': 5, 'nb_formations': 1
+        })
+
+        response = self.client.get(reverse('statistiques'), {'action': 'evolution_formations', 'granularite': 'an'})
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoriqueChangementsTestCase(TestCase):
+    """Tests de l'historique en changements compacts avec points de contrôle"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="archiviste", password="password")
+        centre = Centre.objects.create(nom="Centre Historique")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.formation = Formation.objects.create(
+            nom="Formation Versionnée", centre=centre, statut=statut, type_offre=type_offre,
+            prevus_crif=10, inscrits_crif=5, utilisateur=self.user
+        )
+        self.formation = Formation.objects.get(pk=self.formation.pk)
+
+    def modifier(self, **valeurs):
+        for champ, valeur in valeurs.items():
+            setattr(self.formation, champ, valeur)
+        self.formation.save()
+        return HistoriqueFormation.objects.create(formation=self.formation, action="modification")
+
+    def test_premiere_ligne_point_de_controle_sans_requete_liee(self):
+        with CaptureQueriesContext(connection) as requetes:
+            historique = HistoriqueFormation.objects.create(
+                formation=self.formation, action="création", details={'nom': self.formation.nom}
+            )
+        self.assertFalse([q for q in requetes.captured_queries if 'FROM "rap_app_centre"' in q['sql']])
+        self.assertEqual(historique.instantane['centre'], self.formation.centre_id)
+        self.assertEqual(historique.instantane['inscrits_crif'], 5)
+        self.assertEqual(historique.details, {'nom': "Formation Versionnée"})  # Descriptif fourni conservé
+
+    def test_changements_compacts_et_etat_rejoue(self):
+        premiere = HistoriqueFormation.objects.create(formation=self.formation, action="création")
+        seconde = self.modifier(inscrits_crif=7)
+
+        seconde.refresh_from_db()
+        self.assertIsNone(seconde.instantane)
+        self.assertEqual(seconde.changements['inscrits_crif'], 7)
+        self.assertNotIn('nom', seconde.changements)
+        self.assertEqual(seconde.details['inscrits_crif'], {'ancien': 5, 'nouveau': 7})
+
+        self.modifier(nom="Formation Renommée")
+        self.assertEqual(HistoriqueFormation.objects.etat_a(self.formation, premiere.created_at)['inscrits_crif'], 5)
+        etat = HistoriqueFormation.objects.etat_a(self.formation)
+        self.assertEqual((etat['nom'], etat['inscrits_crif']), ("Formation Renommée", 7))
+        self.assertIsNone(HistoriqueFormation.objects.etat_a(self.formation, premiere.created_at - timedelta(days=1)))
+
+    def test_points_de_controle_periodiques(self):
+        with mock.patch('rap_app.models.historique_formations.INTERVALLE_POINTS_DE_CONTROLE', 3):
+            lignes = [HistoriqueFormation.objects.create(formation=self.formation, action="création")]
+            lignes += [self.modifier(inscrits_crif=inscrits) for inscrits in range(6, 11)]
+
+        points_de_controle = [ligne.instantane is not None for ligne in lignes]
+        self.assertEqual(points_de_controle, [True, False, False, True, False, False])
+        self.assertEqual(HistoriqueFormation.objects.etat_a(self.formation)['inscrits_crif'], 10)
+
+
+class ImportFormationsTestCase(TestCase):
+    """Tests de l'import en masse des formations (commande et administration)"""
+
+    ENTETE = "Intitulé;Centre;Type d'offre;Statut;N° Kairos;Date de début;Prévus CRIF;Inscrits CRIF\n"
+
+    def setUp(self):
+        self.centre = Centre.objects.create(nom="Centre Import")
+        self.statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        self.type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.existante = Formation.objects.create(
+            nom="Formation Existante", centre=self.centre, statut=self.statut, type_offre=self.type_offre,
+            num_kairos="K-1", prevus_crif=10, inscrits_crif=2
+        )
+
+    def fichier(self, lignes):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8-sig', delete=False) as fichier:
+            fichier.write(self.ENTETE + ''.join(f"{ligne}\n" for ligne in lignes))
+        self.addCleanup(os.remove, fichier.name)
+        return fichier.name
+
+    def test_commande_cree_met_a_jour_et_signale_les_erreurs(self):
+        chemin = self.fichier([
+            "Nouvelle formation;centre import;CRIF;Recrutement en cours;K-2;01/09/2025;12;3",
+            "Formation Existante;Centre Import;crif;recrutement_en_cours;K-1;;10;9",
+            "Centre inconnu;Ailleurs;CRIF;Recrutement en cours;K-3;;;",
+            "Date invalide;Centre Import;CRIF;Recrutement en cours;K-4;31/02/2025;;",
+        ])
+        sortie = StringIO()
+        versions = versions_cache.versions('formation', 'historique')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            call_command('import_formations', chemin, stdout=sortie)
+            self.assertEqual(versions_cache.versions('formation', 'historique'), versions)  # Pas avant la validation
+        self.assertTrue(callbacks)
+        nouvelles = versions_cache.versions('formation', 'historique')
+        self.assertNotEqual(nouvelles['formation'], versions['formation'])
+        self.assertNotEqual(nouvelles['historique'], versions['historique'])
+
+        self.assertIn("1 formation(s) créée(s), 1 mise(s) à jour, 2 erreur(s)", sortie.getvalue())
+        self.assertIn("Ligne 4 : centre inconnu", sortie.getvalue())
+        self.assertIn("Ligne 5 : start_date", sortie.getvalue())
+
+        nouvelle = Formation.objects.get(num_kairos="K-2")
+        self.assertEqual((nouvelle.start_date, nouvelle.taux_saturation), (date(2025, 9, 1), 25.0))
+        self.existante.refresh_from_db()
+        self.assertEqual((self.existante.inscrits_crif, self.existante.places_disponibles), (9, 1))
+
+        historique = HistoriqueFormation.objects.get(formation=self.existante)
+        self.assertEqual(historique.details['inscrits_crif'], {'ancien': 2, 'nouveau': 9})
+        self.assertEqual(HistoriqueFormation.objects.etat_a(self.existante)['inscrits_crif'], 9)
+        self.assertEqual(AgregatHistoriqueFormation.objects.get(
+            granularite=AgregatHistoriqueFormation.JOUR, debut_periode=timezone.localdate()
+        ).nb_formations, 2)
+
+    def test_requetes_par_lot(self):
+        chemin = self.fichier(
+            f"Formation {i};Centre Import;CRIF;Recrutement en cours;K-{i};;10;{i % 10}" for i in range(100, 300)
+        )
+        with CaptureQueriesContext(connection) as requetes:
+            call_command('import_formations', chemin, '--taille-lot', '100', stdout=StringIO())
+        self.assertEqual(Formation.objects.filter(num_kairos__startswith="K-").count(), 201)
+        self.assertLess(len(requetes.captured_queries), 40)  # Indépendant du nombre de lignes
+
+    def test_import_depuis_l_administration(self):
+        admin = User.objects.create_superuser(username="admin_import", password="password")
+        self.client.force_login(admin)
+        url = reverse('admin:rap_app_formation_importer')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        contenu = (self.ENTETE + "Formation Admin;Centre Import;CRIF;Recrutement en cours;K-9;;8;4\n").encode('utf-8')
+        response = self.client.post(url, {'fichier': SimpleUploadedFile('offres.csv', contenu, content_type='text/csv')})
+        self.assertRedirects(response, reverse('admin:rap_app_formation_changelist'), fetch_redirect_response=False)
+        self.assertEqual(Formation.objects.get(num_kairos="K-9").utilisateur, admin)
+
+        response = self.client.post(url, {'fichier': SimpleUploadedFile('offres.txt', b"nom\n")})
+        self.assertContains(response, "Format non pris en charge")
+
+
+class RecalculsDifferesTestCase(TestCase):
+    """Tests du recalcul différé des compteurs des formations"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="moderateur", password="password")
+        centre = Centre.objects.create(nom="Centre Différé")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.formation = Formation.objects.create(
+            nom="Formation Différée", centre=centre, statut=statut, type_offre=type_offre, prevus_crif=10
+        )
+        maintenant = timezone.now()
+        self.commentaires = [
+            Commentaire.objects.create(
+                formation=self.formation, utilisateur=self.user, contenu=f"Commentaire {i}",
+                saturation=10 * i, created_at=maintenant - timedelta(hours=5 - i)
+            )
+            for i in range(5)
+        ]
+        for i in range(5):
+            Evenement.objects.create(formation=self.formation, type_evenement=Evenement.FORUM, event_date=date.today())
+
+    def updates_formation(self, requetes):
+        return [q for q in requetes.captured_queries if q['sql'].startswith('UPDATE "rap_app_formation"')]
+
+    def test_un_seul_recalcul_par_formation(self):
+        with CaptureQueriesContext(connection) as requetes:
+            with recalculs_differes():
+                Commentaire.objects.filter(pk__in=[c.pk for c in self.commentaires[2:]]).delete()
+                for evenement in Evenement.objects.filter(formation=self.formation)[:3]:
+                    evenement.delete()
+
+        # Une seule mise à jour de la formation, hors `SET NULL` du pointeur par la cascade
+        updates = [q for q in self.updates_formation(requetes) if '"nombre_evenements"' in q['sql']]
+        self.assertEqual(len(updates), 1)
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.nombre_evenements, 2)
+        self.assertEqual(self.formation.dernier_commentaire, self.commentaires[1])
+        self.assertEqual(self.formation.saturation, 10)
+
+    def test_signaux_ligne_par_ligne_hors_bloc(self):
+        with CaptureQueriesContext(connection) as requetes:
+            for evenement in Evenement.objects.filter(formation=self.formation)[:2]:
+                evenement.delete()
+        self.assertEqual(len(self.updates_formation(requetes)), 2)
+
+    def test_annulation_de_la_transaction(self):
+        with self.assertRaises(ValueError):
+            with recalculs_differes():
+                Evenement.objects.filter(formation=self.formation).delete()
+                raise ValueError
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.nombre_evenements, 5)
+        self.assertEqual(Evenement.objects.filter(formation=self.formation).count(), 5)
+
+        # Hors bloc, les signaux reprennent leur mise à jour ligne par ligne
+        Evenement.objects.filter(formation=self.formation).first().delete()
+        self.formation.refresh_from_db()
+        self.assertEqual(self.formation.nombre_evenements, 4)
+
+    def test_suppression_de_la_formation_sans_mise_a_jour_par_ligne(self):
+        with CaptureQueriesContext(connection) as requetes:
+            self.formation.delete()
+        self.assertLessEqual(len([q for q in self.updates_formation(requetes) if '"nombre_evenements"' in q['sql']]), 1)
+        self.assertFalse(Commentaire.objects.exists())
+
+
+@override_settings(RAP_APP_RECHERCHES_VIDAGE_ARRIERE_PLAN=False)
+class JournalRecherchesTestCase(TestCase):
+    """Tests du journal des recherches (tampon en mémoire écrit par lots)"""
+
+    def setUp(self):
+        journal._tampon = []
+        self.user = User.objects.create_user(username="chercheur", password="password")
+        self.client.login(username="chercheur", password="password")
+        self.centre = Centre.objects.create(nom="Centre Journal")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        for i in range(3):
+            Formation.objects.create(nom=f"Python {i}", centre=self.centre, statut=statut, type_offre=type_offre)
+
+    def inserts_recherche(self, requetes):
+        return [q for q in requetes.captured_queries if q['sql'].startswith('INSERT INTO "rap_app_recherche"')]
+
+    def test_aucune_ecriture_pendant_la_requete(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('formation-list'), {'centre': self.centre.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.inserts_recherche(requetes), [])
+        self.assertEqual(journal.en_attente(), 1)
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(journal.vider(), 1)
+        self.assertEqual(len(self.inserts_recherche(requetes)), 1)
+        recherche = Recherche.objects.get()
+        self.assertEqual(recherche.filtre_centre, self.centre)
+        self.assertEqual(recherche.nombre_resultats, 3)
+        self.assertIsNotNone(recherche.temps_execution)
+
+    def test_recherches_journalisees(self):
+        self.client.get(reverse('formation-list'))  # Sans terme ni filtre
+        self.client.get(reverse('formation-list'), {'q': 'python', 'curseur': 'x'})  # Page suivante
+        self.client.get(reverse('formation-list'), {'q': 'introuvable', 'statut': '999999'})
+        self.assertEqual(journal.en_attente(), 1)
+
+        journal.vider()
+        recherche = Recherche.objects.get()
+        self.assertEqual(recherche.terme_recherche, 'introuvable')
+        self.assertIsNone(recherche.filtre_statut)  # Id inconnu non journalisé
+        self.assertFalse(recherche.a_trouve_resultats)
+
+    @override_settings(RAP_APP_RECHERCHES_CAPACITE=2, RAP_APP_RECHERCHES_TAILLE_LOT=2)
+    def test_capacite_du_tampon(self):
+        ignorees = journal.ignorees
+        for i in range(3):
+            journal.enregistrer(terme_recherche=f"terme {i}", nombre_resultats=i)
+        self.assertEqual(journal.en_attente(), 2)
+        self.assertEqual(journal.ignorees, ignorees + 1)
+        self.assertEqual(journal.vider(), 2)
+        self.assertEqual(journal.vider(), 0)
+        self.assertEqual(Recherche.objects.count(), 2)
+
+
+class AgregatRechercheTestCase(TestCase):
+    """Tests des agrégats quotidiens des recherches et de la purge des recherches brutes"""
+
+    def setUp(self):
+        self.centre = Centre.objects.create(nom="Centre Agrégat")
+        self.hier = timezone.localdate() - timedelta(days=1)
+        midi = timezone.make_aware(datetime.combine(self.hier, datetime.min.time())) + timedelta(hours=12)
+        for i in range(1, 101):
+            Recherche.objects.create(
+                terme_recherche="Python " if i % 2 else "java", nombre_resultats=0 if i % 10 == 0 else 3,
+                temps_execution=float(i), filtre_centre=self.centre if i <= 30 else None, created_at=midi,
+            )
+        Recherche.objects.create(terme_recherche="aujourd'hui", nombre_resultats=1)
+
+    def test_agregation_quotidienne(self):
+        self.assertEqual(AgregatRecherche.objects.agreger(), 1)
+        self.assertEqual(AgregatRecherche.objects.agreger(), 0)  # Journée déjà agrégée
+
+        agregat = AgregatRecherche.objects.get()
+        self.assertEqual(agregat.jour, self.hier)
+        self.assertEqual(agregat.nb_recherches, 100)
+        self.assertEqual(agregat.taux_sans_resultat, 10)
+        self.assertEqual((agregat.temps_p50, agregat.temps_p95, agregat.temps_p99), (50.0, 95.0, 99.0))
+        self.assertEqual(agregat.termes, [['java', 50, 10], ['python', 50, 0]])
+        self.assertEqual(agregat.filtres['centre'], [[self.centre.pk, 30]])
+        self.assertEqual(agregat.filtres['statut'], [])
+
+    def test_purge_des_journees_agregees(self):
+        self.assertEqual(AgregatRecherche.objects.purger(0), 0)  # Rien n'est agrégé : tout est conservé
+        call_command('agreger_recherches', '--retention', '0', stdout=StringIO())
+        self.assertEqual(list(Recherche.objects.values_list('terme_recherche', flat=True)), ["aujourd'hui"])
+        self.assertEqual(AgregatRecherche.objects.get().nb_recherches, 100)
+
+    def test_synthese_du_tableau_de_bord(self):
+        AgregatRecherche.objects.agreger()
+        User.objects.create_user(username="admin_recherches", password="password", is_staff=True)
+        self.client.login(username="admin_recherches", password="password")
+        response = self.client.get(reverse('dashboard'))
+        synthese = response.context['synthese_recherches']
+        self.assertEqual(synthese['nb_recherches'], 100)
+        self.assertEqual(synthese['termes_sans_resultat'], [('java', 10)])
+        self.assertEqual(synthese['filtres'], [("Centre", "Centre Agrégat", 30)])
+        self.assertContains(response, "Termes sans résultat")
+
+
+class AutocompletionTestCase(TestCase):
+    """Tests de l'autocomplétion par préfixe (index en mémoire)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="autocompletion", password="password")
+        self.client.login(username="autocompletion", password="password")
+        self.centre = Centre.objects.create(nom="Créteil")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.formations = [
+            Formation.objects.create(
+                nom=nom, num_offre=num_offre, centre=self.centre, statut=statut, type_offre=type_offre
+            )
+            for nom, num_offre in (("Développeur Python", "OF-123"), ("Comptabilité", "OF-456"), ("Python avancé", None))
+        ]
+        Entreprise.objects.create(nom="Éditions Dupont")
+
+    def test_recherche_par_prefixe(self):
+        index = autocompletion.SOURCES['formations']
+        self.assertEqual([r['id'] for r in index.rechercher("pyth")], [self.formations[0].pk, self.formations[2].pk])
+        self.assertEqual([r['id'] for r in index.rechercher("DEVEL")], [self.formations[0].pk])  # Sans accents
+        self.assertEqual([r['id'] for r in index.rechercher("of 45")], [self.formations[1].pk])
+        self.assertEqual(index.rechercher("pyth", limite=1)[0]['libelle'], "Développeur Python - OF-123 - Créteil")
+        self.assertEqual(autocompletion.SOURCES['entreprises'].rechercher("edi")[0]['libelle'], "Éditions Dupont")
+        with self.assertNumQueries(0):
+            index.rechercher("compta")
+
+    def test_index_rafraichi_apres_modification(self):
+        index = autocompletion.SOURCES['centres']
+        self.assertEqual(index.rechercher("nan"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            centre = Centre.objects.create(nom="Nanterre")
+            self.assertEqual(index.rechercher("nan"), [])  # Version renouvelée à la validation seulement
+        self.assertEqual(index.rechercher("nan"), [{'id': centre.pk, 'libelle': "Nanterre"}])
+        with self.captureOnCommitCallbacks(execute=True):
+            centre.delete()
+        self.assertEqual(index.rechercher("nan"), [])
+
+    def test_vue_json(self):
+        response = self.client.get(reverse('autocompletion', args=['formations']), {'q': 'compta'})
+        self.assertEqual(response.json()['resultats'][0]['id'], self.formations[1].pk)
+        self.assertEqual(self.client.get(reverse('autocompletion', args=['inconnue'])).status_code, 404)
+
+    def test_formulaire_sans_liste_complete(self):
+        response = self.client.get(reverse('commentaire-create'), {'formation': self.formations[1].pk})
+        self.assertContains(response, 'data-autocompletion="%s"' % reverse('autocompletion', args=['formations']))
+        self.assertContains(response, "Comptabilité - OF-456")
+        self.assertNotContains(response, "Développeur Python")
+
+        response = self.client.post(reverse('commentaire-create'), {
+            'formation': self.formations[0].pk, 'contenu': "Commentaire", 'saturation': 10,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Commentaire.objects.filter(formation=self.formations[0]).exists())
+
+
+class GetConditionnelTestCase(TestCase):
+    """Tests du GET conditionnel (ETag / Last-Modified) des vues de détail et de l'API statistiques"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="conditionnel", password="password")
+        self.client.login(username="conditionnel", password="password")
+        self.centre = Centre.objects.create(nom="Centre Conditionnel")
+        statut = Statut.objects.create(nom=Statut.RECRUTEMENT_EN_COURS)
+        type_offre = TypeOffre.objects.create(nom=TypeOffre.CRIF)
+        self.formation = Formation.objects.create(
+            nom="Formation Conditionnelle", centre=self.centre, statut=statut, type_offre=type_offre
+        )
+        self.entreprise = Entreprise.objects.create(nom="Entreprise Conditionnelle")
+
+    def revalider(self, url, reponse):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=reponse['ETag'])
+
+    def test_detail_formation(self):
+        url = reverse('formation-detail', args=[self.formation.pk])
+        reponse = self.client.get(url)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotIn('Last-Modified', reponse)  # Les dates ne reflètent ni les suppressions ni les versions
+        self.assertIn('no-cache', reponse['Cache-Control'])
+
+        # Session, utilisateur et validateur : ni requête principale ni rendu
+        with self.assertNumQueries(3):
+            self.assertEqual(self.revalider(url, reponse).status_code, 304)
+
+        commentaire = Commentaire.objects.create(formation=self.formation, utilisateur=self.user, contenu="Nouveau")
+        reponse = self.client.get(url, HTTP_IF_NONE_MATCH=reponse['ETag'])
+        self.assertEqual(reponse.status_code, 200)
+
+        commentaire.delete()  # Aucune date ne change, le nombre de commentaires si
+        self.assertEqual(self.revalider(url, reponse).status_code, 200)
+        # Un client qui ne revalide que par date n'obtient jamais de 304 périmé
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600)).status_code, 200)
+
+    def test_detail_centre_et_entreprise(self):
+        modifications = (
+            (reverse('centre-detail', args=[self.centre.pk]), self.formation.save),
+            (reverse('entreprise-detail', args=[self.entreprise.pk]), lambda: self.formation.entreprises.add(self.entreprise)),
+        )
+        for url, modifier in modifications:
+            reponse = self.client.get(url)
+            self.assertEqual(self.revalider(url, reponse).status_code, 304)
+            modifier()
+            self.assertEqual(self.revalider(url, reponse).status_code, 200)
+
+    def test_etag_propre_a_l_utilisateur(self):
+        url = reverse('formation-detail', args=[self.formation.pk])
+        reponse = self.client.get(url)
+        User.objects.create_user(username="autre", password="password")
+        self.client.login(username="autre", password="password")
+        self.assertEqual(self.revalider(url, reponse).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.revalider(url, reponse).status_code, 302)
+
+    def test_api_statistiques(self):
+        url = reverse('statistiques') + '?action=formations_par_type'
+        reponse = self.client.get(url)
+        self.assertEqual(reponse.status_code, 200)
+        with self.assertNumQueries(2):  # Session et utilisateur seulement
+            self.assertEqual(self.revalider(url, reponse).status_code, 304)
+
+        # Une autre action a son propre validateur ; une écriture sur une formation renouvelle l'ETag
+        self.assertEqual(self.client.get(reverse('statistiques') + '?action=taux_remplissage',
+                                         HTTP_IF_NONE_MATCH=reponse['ETag']).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.formation.save()
+        self.assertEqual(self.revalider(url, reponse).status_code, 200)
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..middleware import ENTETE_DUREE, ENTETE_NOMBRE
+from ..urls import urlpatterns
+from ..utils import referentiel
+from .budget_requetes import BudgetRequetesMixin, creer_jeu_de_donnees, routes_nommees
+
+
+User = get_user_model()
+
+MEDIA_ROOT_TEST = tempfile.mkdtemp()
+
+# Nombre maximal de requêtes SQL par route (GET, utilisateur connecté, jeu de données de `creer_jeu_de_donnees`).
+# Un budget ne doit être relevé qu'en connaissance de cause : un dépassement signale le plus souvent un N+1.
+BUDGETS_REQUETES = {
+    'home': 0,
+    'dashboard': 9,  # Cache vide : statistiques et chaque widget recalculés (cache chaud : 2)
+    'statistiques': 2,  # Sans `action` : erreur 400 sans requête métier
+    'autocompletion': 3,  # Cache vide : construction de l'index (cache chaud : session et utilisateur seuls)
+    'centre-list': 6,
+    'centre-detail': 7,  # Dont le validateur du GET conditionnel (revalidation : 3)
+    'centre-create': 2,
+    'centre-update': 3,
+    'centre-delete': 3,
+    'statut-list': 4,
+    'statut-detail': 4,
+    'statut-create': 2,
+    'statut-update': 3,
+    'statut-delete': 3,
+    'type-offre-list': 4,
+    'type-offre-detail': 4,
+    'type-offre-create': 2,
+    'type-offre-update': 3,
+    'type-offre-delete': 3,
+    'commentaire-list': 4,
+    'commentaire-detail': 5,
+    'commentaire-create': 3,
+    'commentaire-update': 3,
+    'document-list': 5,
+    'document-detail': 4,
+    'document-create': 3,
+    'document-create-formation': 3,
+    'document-update': 3,
+    'document-delete': 4,
+    'document-download': 3,
+    'entreprise-list': 7,
+    'entreprise-detail': 5,  # Dont le validateur du GET conditionnel (revalidation : 3)
+    'entreprise-create': 2,
+    'entreprise-update': 3,
+    'entreprise-delete': 3,
+    'entreprise-add-formation': 3,
+    'evenement-list': 5,
+    'evenement-detail': 7,
+    'evenement-create': 3,
+    'evenement-update': 4,
+    'evenement-delete': 4,
+    'formation-list': 4,
+    'formation-export': 2,  # Hors lignes exportées, lues pendant le streaming de la réponse
+    'formation-detail': 8,  # Dont le validateur du GET conditionnel (revalidation : 3)
+    'formation-create': 2,
+    'formation-update': 3,
+    'formation-delete': 6,
+    'tache-statut': 3,
+    'tache-fichier': 3,  # Tâche du jeu de données sans fichier : 404 après sa lecture
+}
+
+# Routes non mesurées en GET, avec la raison
+ROUTES_HORS_BUDGET = {
+    'commentaire-delete': "Gabarit de confirmation absent (commentaires/commentaire_confirm_delete.html).",
+    'formation-add-comment': "Vue prévue pour un POST ; le GET échoue sur un reverse sans identifiant.",
+}
+
+# Paramètres des routes qui ne prennent pas de `pk`
+PARAMETRES_FORMATION = ('document-create-formation', 'entreprise-add-formation')
+PARAMETRES_SOURCE = ('autocompletion',)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT_TEST)
+class BudgetRequetesTestCase(BudgetRequetesMixin, TestCase):
+    """Budget de requêtes SQL de chaque route de rap_app/urls.py"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_superuser(username="admin_budget", password="password", email="admin@budget.fr")
+        cls.objets = creer_jeu_de_donnees(cls.utilisateur)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT_TEST, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.utilisateur)
+
+    def url(self, nom):
+        """URL de la route, avec l'objet du jeu de données correspondant à son préfixe."""
+        if nom in PARAMETRES_FORMATION:
+            return reverse(nom, kwargs={'formation_id': self.objets['formation'].pk})
+        if nom in PARAMETRES_SOURCE:
+            return reverse(nom, kwargs={'source': 'formations'}) + '?q=a'
+        prefixe, _, action = nom.rpartition('-')
+        if action in ('list', 'create', 'export') or not prefixe:
+            return reverse(nom)
+        return reverse(nom, kwargs={'pk': self.objets[prefixe].pk})
+
+    def test_toutes_les_routes_ont_un_budget(self):
+        """Toute nouvelle route doit recevoir un budget (ou une exclusion justifiée)"""
+        sans_budget = set(routes_nommees(urlpatterns)) - set(BUDGETS_REQUETES) - set(ROUTES_HORS_BUDGET)
+        self.assertFalse(sans_budget, f"Routes sans budget de requêtes SQL : {sorted(sans_budget)}")
+
+    def test_budgets(self):
+        """Chaque route reste dans son budget (cache vide, référentiel chargé)"""
+        for nom, budget in BUDGETS_REQUETES.items():
+            with self.subTest(route=nom):
+                cache.clear()
+                for table in referentiel.REFERENTIELS:
+                    table.tous()
+                self.assertBudgetRequetes(self.url(nom), budget)
+
+    def test_entetes_instrumentation(self):
+        """Le middleware expose le nombre de requêtes et leur durée"""
+        response = self.client.get(self.url('formation-list'))
+        self.assertGreater(int(response[ENTETE_NOMBRE]), 0)
+        self.assertGreaterEqual(float(response[ENTETE_DUREE]), 0)
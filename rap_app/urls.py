@@ -2,13 +2,19 @@ from django.urls import path
 
 from .views import (
     home_views, centres_views, statuts_views, types_offre_views,
-    commentaires_views, documents_views, entreprises_views, evenements_views, formations_views
+    commentaires_views, dashboard_views, documents_views, entreprises_views, evenements_views, formations_views,
+    recherches_views, taches_views
 )  # Import des vues
 
 urlpatterns = [
     # Page d'accueil
     path('', home_views.home, name='home'),
 
+    # Tableau de bord
+    path('tableau-de-bord/', dashboard_views.DashboardView.as_view(), name='dashboard'),
+    path('api/statistiques/', dashboard_views.StatsAPIView.as_view(), name='statistiques'),
+    path('api/autocompletion/<str:source>/', recherches_views.AutocompletionView.as_view(), name='autocompletion'),
+
     # Centres de formation
     path('centres/', centres_views.CentreListView.as_view(), name='centre-list'),
     path('centres/<int:pk>/', centres_views.CentreDetailView.as_view(), name='centre-detail'),
@@ -43,6 +49,7 @@ urlpatterns = [
     path('documents/ajouter/', documents_views.DocumentCreateView.as_view(), name='document-create'),
     path('documents/ajouter/<int:formation_id>/', documents_views.DocumentCreateView.as_view(), name='document-create-formation'),
 
+    path('documents/<int:pk>/telecharger/', documents_views.DocumentDownloadView.as_view(), name='document-download'),
     path('documents/<int:pk>/modifier/', documents_views.DocumentUpdateView.as_view(), name='document-update'),
     path('documents/<int:pk>/supprimer/', documents_views.DocumentDeleteView.as_view(), name='document-delete'),
     
@@ -63,9 +70,14 @@ urlpatterns = [
     
     # Formations
     path('formations/', formations_views.FormationListView.as_view(), name='formation-list'),
+    path('formations/export/', formations_views.FormationExportView.as_view(), name='formation-export'),
     path('formations/<int:pk>/', formations_views.FormationDetailView.as_view(), name='formation-detail'),
     path('formations/ajouter/', formations_views.FormationCreateView.as_view(), name='formation-create'),
     path('formations/<int:pk>/modifier/', formations_views.FormationUpdateView.as_view(), name='formation-update'),
     path('formations/<int:pk>/supprimer/', formations_views.FormationDeleteView.as_view(), name='formation-delete'),
     path('formations/<int:pk>/commentaire/', formations_views.FormationAddCommentView.as_view(), name='formation-add-comment'),
-]
\ No newline at end of file
+
+    # Tâches de fond
+    path('taches/<int:pk>/', taches_views.TacheStatutView.as_view(), name='tache-statut'),
+    path('taches/<int:pk>/fichier/', taches_views.TacheFichierView.as_view(), name='tache-fichier'),
+]
@@ -0,0 +1,3 @@
+"""
+Utilitaires transverses de l'application RAP (index de recherche, caches...).
+"""
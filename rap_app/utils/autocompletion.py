@@ -0,0 +1,152 @@
+"""
+Autocomplétion par préfixe (formations, centres, entreprises), servie depuis un index en mémoire.
+
+Chaque source est indexée dans un tableau trié de clés normalisées (minuscules, sans accents) :
+une recherche est une dichotomie (`bisect`) suivie de la lecture des premières clés qui commencent
+par le préfixe, sans requête SQL ni parcours du catalogue.
+Chaque mot du libellé est un point d'entrée : « pyth » trouve « Formation Python ».
+
+Invalidation : l'index est reconstruit au premier accès qui suit un changement de version
+d'une des tables dont il dépend (voir `rap_app.utils.versions_cache`), dans ce processus comme dans les autres.
+"""
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from django import forms
+from django.apps import apps
+from django.urls import reverse
+
+from . import versions_cache
+
+
+# Nombre maximal de résultats retournés
+LIMITE_MAXIMALE = 50
+
+
+def normaliser(texte):
+    """Clé de recherche : minuscules, sans accents, espaces et ponctuation réduits à une espace."""
+    texte = unicodedata.normalize('NFKD', str(texte or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.split(r'[\W_]+', texte.lower())).strip()
+
+
+def debuts_de_mots(cle):
+    """Suffixes de la clé commençant à chaque mot (« formation python » -> la clé entière, puis « python »)."""
+    mots = cle.split(' ')
+    return [' '.join(mots[i:]) for i in range(len(mots))]
+
+
+class IndexPrefixes:
+    """
+    Index d'une source d'autocomplétion.
+
+    `tables` : versions de cache dont dépend l'index ; `lignes()` : itérable de `(id, libellé, textes indexés)`.
+    """
+
+    def __init__(self, tables, lignes):
+        self.tables = tables
+        self.lignes = lignes
+        self._verrou = threading.Lock()
+        self._index = None
+        self._versions = None
+
+    def _donnees(self):
+        """Retourne `(clés triées, entrées alignées, libellés par id)`, en reconstruisant si nécessaire."""
+        versions = versions_cache.versions(*self.tables)
+        index = self._index
+        if index is None or versions != self._versions:
+            with self._verrou:
+                if self._index is None or versions != self._versions:
+                    self._index = self._construire()
+                    self._versions = versions
+                index = self._index
+        return index
+
+    def _construire(self):
+        entrees, libelles = [], {}
+        for pk, libelle, textes in self.lignes():
+            libelles[pk] = libelle
+            cles = set()
+            for texte in textes:
+                cles.update(debuts_de_mots(normaliser(texte)))
+            entrees.extend((cle, pk) for cle in cles if cle)
+        entrees.sort()
+        return [cle for cle, _ in entrees], [pk for _, pk in entrees], libelles
+
+    def rechercher(self, prefixe, limite=10):
+        """Les `limite` premiers `{'id', 'libelle'}` (ordre alphabétique des clés) dont un mot commence par `prefixe`."""
+        prefixe = normaliser(prefixe)
+        if not prefixe:
+            return []
+        cles, ids, libelles = self._donnees()
+        resultats, vus = [], set()
+        for position in range(bisect_left(cles, prefixe), len(cles)):
+            if not cles[position].startswith(prefixe) or len(resultats) >= limite:
+                break
+            pk = ids[position]
+            if pk not in vus:
+                vus.add(pk)
+                resultats.append({'id': pk, 'libelle': libelles[pk]})
+        return resultats
+
+    def libelle(self, pk, defaut=''):
+        """Libellé d'un objet indexé, sans requête."""
+        try:
+            return self._donnees()[2].get(int(pk), defaut)
+        except (TypeError, ValueError):
+            return defaut
+
+
+def _lignes_formations():
+    Formation = apps.get_model('rap_app', 'Formation')
+    for pk, nom, num_offre, centre in Formation.objects.values_list('pk', 'nom', 'num_offre', 'centre__nom').iterator():
+        libelle = ' - '.join(filter(None, [nom, num_offre, centre]))
+        yield pk, libelle, (nom, num_offre)
+
+
+def _lignes_centres():
+    Centre = apps.get_model('rap_app', 'Centre')
+    for pk, nom in Centre.objects.values_list('pk', 'nom').iterator():
+        yield pk, nom, (nom,)
+
+
+def _lignes_entreprises():
+    Entreprise = apps.get_model('rap_app', 'Entreprise')
+    for pk, nom in Entreprise.objects.values_list('pk', 'nom').iterator():
+        yield pk, nom, (nom,)
+
+
+# Source -> index (le libellé d'une formation contient le nom de son centre)
+SOURCES = {
+    'formations': IndexPrefixes(('formation', 'centre'), _lignes_formations),
+    'centres': IndexPrefixes(('centre',), _lignes_centres),
+    'entreprises': IndexPrefixes(('entreprise',), _lignes_entreprises),
+}
+
+
+class SelectAutocompletion(forms.Select):
+    """
+    Liste déroulante alimentée par l'autocomplétion : seules l'option vide et l'option sélectionnée
+    sont rendues (libellé lu dans l'index, sans requête) ; le script de `base.html` interroge
+    la vue `autocompletion` à la saisie. La validation reste celle du champ (`queryset` du formulaire).
+    """
+
+    def __init__(self, source, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+
+    def optgroups(self, name, value, attrs=None):
+        index = SOURCES[self.source]
+        champ = getattr(self.choices, 'field', None)  # `ModelChoiceIterator` : ne pas parcourir le queryset
+        if champ is not None:
+            vide = [('', champ.empty_label)] if champ.empty_label is not None else []
+        else:
+            vide = [choix for choix in self.choices if choix[0] == ''][:1]
+        self.choices = vide + [(valeur, index.libelle(valeur, valeur)) for valeur in value if valeur]
+        return super().optgroups(name, value, attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocompletion'] = reverse('autocompletion', args=[self.source])
+        return context
@@ -0,0 +1,41 @@
+"""
+Exports CSV en streaming.
+
+Les lignes sont lues par lots (`values_list(...).iterator()`) et écrites au fil de l'eau dans une
+`StreamingHttpResponse` : la mémoire utilisée ne dépend pas du nombre de lignes exportées
+et le téléchargement commence dès le premier lot.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+# Nombre de lignes lues en base par lot
+TAILLE_LOT = 2000
+
+
+class _Tampon:
+    """Pseudo-fichier dont `write()` renvoie la ligne formatée au lieu de la stocker."""
+
+    def write(self, valeur):
+        return valeur
+
+
+def lignes_csv(entete, lignes):
+    """Générateur des lignes CSV (en-tête compris)."""
+    writer = csv.writer(_Tampon())
+    yield writer.writerow(entete)
+    for ligne in lignes:
+        yield writer.writerow(ligne)
+
+
+def lire_par_lots(queryset, champs, taille_lot=TAILLE_LOT):
+    """Itère sur les tuples `values_list(*champs)` du queryset, lus par lots côté base de données."""
+    return queryset.values_list(*champs).iterator(chunk_size=taille_lot)
+
+
+def reponse_csv(nom_fichier, entete, lignes):
+    """Réponse CSV en streaming ; `lignes` est un itérable (idéalement paresseux) de listes de valeurs."""
+    response = StreamingHttpResponse(lignes_csv(entete, lignes), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    return response
@@ -0,0 +1,374 @@
+"""
+Import en masse des formations depuis un export Kairos / un tableau des offres (CSV ou XLSX).
+
+- Le fichier est lu ligne à ligne (CSV en flux, XLSX en mode `read_only`) : la mémoire ne dépend pas de sa taille.
+- Centres, types d'offre et statuts sont résolus par leur nom depuis le référentiel en mémoire (aucune requête).
+- Les lignes sont traitées par lots : une requête pour retrouver les formations existantes (par `num_kairos`,
+  sinon `num_offre`), puis insertions groupées (`bulk_create`) et mises à jour groupées (`executemany`),
+  l'historique et l'index de recherche en masse ; les formations inchangées ne sont pas réécrites.
+- Une ligne invalide est signalée (numéro de ligne et message) sans interrompre l'import.
+
+Dépendance optionnelle : `openpyxl` pour les fichiers XLSX.
+"""
+import csv
+import datetime
+import io
+import os
+import re
+import unicodedata
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import index_recherche, referentiel, versions_cache
+from ..models import AgregatHistoriqueFormation, Formation, HistoriqueFormation
+from ..models.formations import CHAMPS_INDICATEURS, invalider_statistiques
+from ..models.historique_formations import etat_formation
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    openpyxl = None
+
+
+# Nombre de lignes traitées par lot (une transaction par lot)
+TAILLE_LOT = 500
+
+# Colonnes reconnues : champ de `Formation` -> en-têtes acceptés (normalisés, voir `_normaliser`)
+ALIAS_COLONNES = {
+    'nom': ('nom', 'intitule', 'formation', 'libelle'),
+    'centre': ('centre', 'centre_de_formation'),
+    'type_offre': ('type_offre', 'type_d_offre', 'type'),
+    'statut': ('statut',),
+    'start_date': ('start_date', 'date_debut', 'date_de_debut', 'debut'),
+    'end_date': ('end_date', 'date_fin', 'date_de_fin', 'fin'),
+    'num_kairos': ('num_kairos', 'numero_kairos', 'n_kairos', 'kairos'),
+    'num_offre': ('num_offre', 'numero_offre', 'n_offre', 'offre'),
+    'num_produit': ('num_produit', 'numero_produit', 'n_produit', 'produit'),
+    'prevus_crif': ('prevus_crif', 'places_crif'),
+    'prevus_mp': ('prevus_mp', 'places_mp'),
+    'inscrits_crif': ('inscrits_crif',),
+    'inscrits_mp': ('inscrits_mp',),
+    'cap': ('cap', 'capacite', 'capacite_maximale'),
+    'entresformation': ('entresformation', 'entrees_en_formation', 'entrees'),
+    'nombre_candidats': ('nombre_candidats', 'candidats'),
+    'nombre_entretiens': ('nombre_entretiens', 'entretiens'),
+    'assistante': ('assistante',),
+    'convocation_envoie': ('convocation_envoie', 'convocation_envoyee', 'convocation'),
+}
+
+CHAMPS_REFERENTIELS = {
+    'centre': referentiel.centres,
+    'type_offre': referentiel.types_offre,
+    'statut': referentiel.statuts,
+}
+CHAMPS_ENTIERS = (
+    'prevus_crif', 'prevus_mp', 'inscrits_crif', 'inscrits_mp', 'cap',
+    'entresformation', 'nombre_candidats', 'nombre_entretiens',
+)
+CHAMPS_DATES = ('start_date', 'end_date')
+CHAMPS_BOOLEENS = ('convocation_envoie',)
+CHAMPS_OBLIGATOIRES = ('nom', 'centre', 'type_offre', 'statut')
+
+FORMATS_DATE = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y', '%d.%m.%Y')
+VALEURS_VRAIES = ('1', 'oui', 'o', 'vrai', 'true', 'x', 'yes')
+VALEURS_FAUSSES = ('0', 'non', 'n', 'faux', 'false', 'no')
+
+
+class ErreurImport(Exception):
+    """Fichier inexploitable dans son ensemble (format inconnu, colonnes obligatoires absentes...)."""
+
+
+def _normaliser(texte):
+    """Forme comparable d'un en-tête ou d'un libellé : sans accents, en minuscules, `_` entre les mots."""
+    texte = unicodedata.normalize('NFKD', str(texte)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', texte.lower()).strip('_')
+
+
+### 🚀 Lecture en flux des fichiers
+
+def _lignes_csv(fichier):
+    """Lignes (listes de cellules) d'un CSV binaire, encodage UTF-8 (avec ou sans BOM), séparateur détecté."""
+    echantillon = fichier.read(4096)
+    fichier.seek(0)
+    try:
+        dialecte = csv.Sniffer().sniff(echantillon.decode('utf-8-sig', errors='ignore'), delimiters=',;\t')
+    except csv.Error:
+        dialecte = csv.excel
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        yield from csv.reader(texte, dialecte)
+    finally:
+        texte.detach()  # Le fichier reste ouvert pour l'appelant
+
+
+def _lignes_xlsx(fichier):
+    """Lignes (listes de cellules) de la première feuille d'un classeur XLSX, lu en mode `read_only`."""
+    if openpyxl is None:
+        raise ErreurImport("La lecture des fichiers XLSX nécessite le paquet openpyxl.")
+    classeur = openpyxl.load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        for ligne in classeur.worksheets[0].iter_rows(values_only=True):
+            yield list(ligne)
+    finally:
+        classeur.close()
+
+
+def lire_lignes(fichier, nom_fichier):
+    """
+    Itère sur `(numéro de ligne, {champ: valeur brute})` d'un fichier CSV ou XLSX ouvert en binaire.
+    La première ligne est l'en-tête ; les colonnes non reconnues sont ignorées.
+    """
+    extension = os.path.splitext(nom_fichier)[1].lower()
+    if extension == '.csv':
+        lignes = _lignes_csv(fichier)
+    elif extension in ('.xlsx', '.xlsm'):
+        lignes = _lignes_xlsx(fichier)
+    else:
+        raise ErreurImport(f"Format non pris en charge : {extension or nom_fichier} (CSV ou XLSX attendu).")
+
+    entete = next(lignes, None)
+    if entete is None:
+        raise ErreurImport("Le fichier est vide.")
+
+    champ_par_entete = {alias: champ for champ, alias_champ in ALIAS_COLONNES.items() for alias in alias_champ}
+    colonnes = {}
+    for indice, titre in enumerate(entete):
+        champ = champ_par_entete.get(_normaliser(titre or ''))
+        if champ and champ not in colonnes.values():
+            colonnes[indice] = champ
+
+    if not {'nom', 'num_kairos', 'num_offre'} & set(colonnes.values()):
+        raise ErreurImport("Colonne obligatoire absente : nom, num_kairos ou num_offre.")
+
+    for numero, ligne in enumerate(lignes, start=2):
+        valeurs = {champ: ligne[indice] for indice, champ in colonnes.items() if indice < len(ligne)}
+        if any(valeur not in (None, '') for valeur in valeurs.values()):
+            yield numero, valeurs
+
+
+### 🚀 Conversion des valeurs
+
+def _index_referentiels():
+    """Objets de référence par libellé normalisé (code, libellé affiché, nom personnalisé)."""
+    index = {}
+    for champ, table in CHAMPS_REFERENTIELS.items():
+        par_libelle = {}
+        for objet in table.tous():
+            for libelle in (objet.nom, table.libelle_objet(objet), getattr(objet, 'autre', '')):
+                if libelle:
+                    par_libelle.setdefault(_normaliser(libelle), objet.pk)
+        index[champ] = par_libelle
+    return index
+
+
+def _convertir(champ, valeur, referentiels):
+    """Valeur Python du champ à partir d'une cellule ; lève `ValueError` avec un message lisible."""
+    if isinstance(valeur, str):
+        valeur = valeur.strip()
+
+    if champ in CHAMPS_REFERENTIELS:
+        pk = referentiels[champ].get(_normaliser(valeur))
+        if pk is None:
+            raise ValueError(f"{champ} inconnu : « {valeur} »")
+        return pk
+
+    if champ in CHAMPS_ENTIERS:
+        try:
+            nombre = int(float(str(valeur).replace(',', '.')))
+        except ValueError:
+            raise ValueError(f"{champ} : nombre attendu, « {valeur} » reçu")
+        if nombre < 0:
+            raise ValueError(f"{champ} : nombre positif attendu, « {valeur} » reçu")
+        return nombre
+
+    if champ in CHAMPS_DATES:
+        if isinstance(valeur, datetime.datetime):
+            return valeur.date()
+        if isinstance(valeur, datetime.date):
+            return valeur
+        for format_date in FORMATS_DATE:
+            try:
+                return datetime.datetime.strptime(valeur, format_date).date()
+            except ValueError:
+                continue
+        raise ValueError(f"{champ} : date attendue (AAAA-MM-JJ ou JJ/MM/AAAA), « {valeur} » reçu")
+
+    if champ in CHAMPS_BOOLEENS:
+        if isinstance(valeur, bool):
+            return valeur
+        texte = _normaliser(valeur)
+        if texte in VALEURS_VRAIES:
+            return True
+        if texte in VALEURS_FAUSSES:
+            return False
+        raise ValueError(f"{champ} : oui / non attendu, « {valeur} » reçu")
+
+    texte = str(valeur)
+    if isinstance(valeur, float) and valeur.is_integer():
+        texte = str(int(valeur))  # Numéros lus comme nombres dans un classeur
+    return texte
+
+
+def convertir_ligne(valeurs, referentiels, longueurs):
+    """`{champ: valeur Python}` des cellules non vides d'une ligne ; lève `ValueError` à la première erreur."""
+    converties = {}
+    for champ, valeur in valeurs.items():
+        if valeur is None or (isinstance(valeur, str) and not valeur.strip()):
+            continue
+        converties[champ] = _convertir(champ, valeur, referentiels)
+        longueur = longueurs.get(champ)
+        if longueur and len(converties[champ]) > longueur:
+            raise ValueError(f"{champ} : {longueur} caractères au maximum")
+    return converties
+
+
+### 🚀 Écriture par lots
+
+class ImportFormations:
+    """
+    Import d'un fichier de formations. Les cellules vides ne modifient pas une formation existante.
+
+    Exemple : `ImportFormations(utilisateur).importer(fichier, 'offres.xlsx')` retourne le rapport
+    `{'lignes', 'crees', 'mis_a_jour', 'erreurs': [(numéro de ligne, message), ...]}`.
+    """
+
+    def __init__(self, utilisateur=None, taille_lot=TAILLE_LOT):
+        self.utilisateur = utilisateur
+        self.taille_lot = taille_lot
+        self.longueurs = {
+            champ.name: champ.max_length for champ in Formation._meta.concrete_fields if champ.max_length
+        }
+        self.rapport = {'lignes': 0, 'crees': 0, 'mis_a_jour': 0, 'erreurs': []}
+
+    def importer(self, fichier, nom_fichier):
+        referentiels = _index_referentiels()
+        debut = timezone.localdate()
+        lot = []
+        for numero, valeurs in lire_lignes(fichier, nom_fichier):
+            self.rapport['lignes'] += 1
+            try:
+                lot.append((numero, convertir_ligne(valeurs, referentiels, self.longueurs)))
+            except ValueError as erreur:
+                self.rapport['erreurs'].append((numero, str(erreur)))
+            if len(lot) >= self.taille_lot:
+                self._ecrire_lot(lot)
+                lot = []
+        if lot:
+            self._ecrire_lot(lot)
+
+        # ✅ Les écritures en masse contournent les signaux : agrégats et caches mis à jour une fois pour tout l'import,
+        # les caches à la validation de la transaction (une requête concurrente ne recache pas l'état d'avant)
+        if self.rapport['crees'] or self.rapport['mis_a_jour']:
+            AgregatHistoriqueFormation.objects.reconstruire(depuis=debut)
+            transaction.on_commit(invalider_statistiques)
+            versions_cache.invalider('formation')
+            versions_cache.invalider('historique')  # Historiques créés par `bulk_create`
+        return self.rapport
+
+    def _ecrire_lot(self, lot):
+        """Crée ou met à jour les formations d'un lot dans une transaction ; un lot rejeté par la base est signalé."""
+        try:
+            with transaction.atomic():
+                crees, mis_a_jour = self._upsert(lot)
+        except DatabaseError as erreur:
+            self.rapport['erreurs'].extend((numero, f"lot rejeté par la base de données : {erreur}") for numero, _ in lot)
+            return
+        self.rapport['crees'] += crees
+        self.rapport['mis_a_jour'] += mis_a_jour
+
+    def _upsert(self, lot):
+        cles_kairos = {valeurs['num_kairos'] for _, valeurs in lot if valeurs.get('num_kairos')}
+        cles_offre = {valeurs['num_offre'] for _, valeurs in lot if valeurs.get('num_offre')}
+        par_kairos, par_offre = {}, {}
+        if cles_kairos or cles_offre:
+            for formation in Formation.objects.filter(Q(num_kairos__in=cles_kairos) | Q(num_offre__in=cles_offre)):
+                if formation.num_kairos:
+                    par_kairos.setdefault(formation.num_kairos, formation)
+                if formation.num_offre:
+                    par_offre.setdefault(formation.num_offre, formation)
+
+        nouvelles, modifiees, etats_precedents, champs_modifies = [], {}, {}, set()
+        for numero, valeurs in lot:
+            formation = par_kairos.get(valeurs.get('num_kairos')) or par_offre.get(valeurs.get('num_offre'))
+            if formation is None:
+                manquants = [champ for champ in CHAMPS_OBLIGATOIRES if champ not in valeurs]
+                if manquants:
+                    self.rapport['erreurs'].append((numero, f"nouvelle formation : {', '.join(manquants)} obligatoire(s)"))
+                    continue
+                formation = Formation(utilisateur=self.utilisateur)
+                nouvelles.append(formation)
+            elif formation.pk and formation.pk not in etats_precedents:
+                etats_precedents[formation.pk] = etat_formation(formation)
+                modifiees[formation.pk] = formation
+
+            for champ, valeur in valeurs.items():
+                setattr(formation, f"{champ}_id" if champ in CHAMPS_REFERENTIELS else champ, valeur)
+            champs_modifies.update(valeurs)
+            formation.calculer_indicateurs()
+
+            # Lignes suivantes du même fichier portant la même clé : même formation
+            if formation.num_kairos:
+                par_kairos[formation.num_kairos] = formation
+            if formation.num_offre:
+                par_offre[formation.num_offre] = formation
+
+        # ✅ Les formations identiques au fichier ne sont ni réécrites ni historisées
+        changements = {}
+        for pk, formation in list(modifiees.items()):
+            etat = etat_formation(formation)
+            changements[pk] = {champ: valeur for champ, valeur in etat.items() if etats_precedents[pk].get(champ) != valeur}
+            if not changements[pk]:
+                del modifiees[pk]
+
+        Formation.objects.bulk_create(nouvelles, batch_size=self.taille_lot)
+        if modifiees:
+            champs = [
+                Formation._meta.get_field(champ) for champ in champs_modifies
+            ] + [Formation._meta.get_field(champ) for champ in CHAMPS_INDICATEURS + ('updated_at',)]
+            maintenant = timezone.now()
+            for formation in modifiees.values():
+                formation.updated_at = maintenant
+            self._mettre_a_jour(modifiees.values(), champs)
+
+        # 📌 Historique en masse : chaque ligne est un point de contrôle (instantané complet)
+        historiques = []
+        for formation in nouvelles + list(modifiees.values()):
+            etat = etat_formation(formation)
+            precedent = etats_precedents.get(formation.pk)
+            historique = HistoriqueFormation(
+                formation=formation,
+                utilisateur=self.utilisateur,
+                action='mise à jour (import)' if precedent else 'import',
+                changements=changements[formation.pk] if precedent else etat,
+                instantane=etat,
+                details={
+                    champ: {'ancien': precedent.get(champ), 'nouveau': valeur}
+                    for champ, valeur in changements[formation.pk].items()
+                } if precedent else None,
+            )
+            historique.renseigner_depuis_formation()
+            historiques.append(historique)
+        HistoriqueFormation.objects.bulk_create(historiques, batch_size=self.taille_lot)
+
+        index_recherche.indexer_lot(Formation, nouvelles + list(modifiees.values()))
+        return len(nouvelles), len(modifiees)
+
+    def _mettre_a_jour(self, formations, champs):
+        """
+        Écrit les champs donnés des formations en une requête `UPDATE ... WHERE id = %s` exécutée pour toutes
+        les lignes (`executemany`) : contrairement à `bulk_update()`, le coût ne croît pas avec la taille du lot
+        (pas d'expression `CASE WHEN` par ligne et par champ).
+        """
+        assignations = ', '.join(f"{connection.ops.quote_name(champ.column)} = %s" for champ in champs)
+        sql = (
+            f"UPDATE {connection.ops.quote_name(Formation._meta.db_table)} SET {assignations} "
+            f"WHERE {connection.ops.quote_name(Formation._meta.pk.column)} = %s"
+        )
+        lignes = [
+            [champ.get_db_prep_save(getattr(formation, champ.attname), connection) for champ in champs] + [formation.pk]
+            for formation in formations
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, lignes)
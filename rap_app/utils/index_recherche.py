@@ -0,0 +1,265 @@
+"""
+Index de recherche plein texte pour les formations, commentaires, événements et documents.
+
+Une table d'index par modèle, dont la clé est la clé primaire de l'objet indexé :
+- SQLite : table virtuelle FTS5, classement par `bm25()`.
+- PostgreSQL : table `tsvector` avec index GIN, classement par `ts_rank()`.
+- Autres moteurs : repli sur des `icontains` (non indexés).
+
+L'index est tenu à jour par les signaux `post_save` / `post_delete` connectés dans `RapAppConfig.ready()`,
+dans la même transaction que l'écriture de l'objet.
+"""
+import re
+
+from django.apps import apps as registre_global
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+
+
+# Champs indexés par modèle (le premier champ a le poids le plus fort sous PostgreSQL)
+CHAMPS_INDEXES = {
+    'rap_app.Formation': ('nom', 'num_offre', 'num_kairos'),
+    'rap_app.Commentaire': ('contenu',),
+    'rap_app.Evenement': ('details', 'description_autre'),
+    'rap_app.Document': ('nom_fichier', 'source'),
+}
+
+# Configuration linguistique utilisée par PostgreSQL pour `to_tsvector` / `to_tsquery`
+CONFIG_POSTGRES = 'french'
+
+MOTEURS_SUPPORTES = ('sqlite', 'postgresql')
+
+
+def nom_table(model):
+    """Retourne le nom de la table d'index associée au modèle."""
+    return f"{model._meta.db_table}_fts"
+
+
+def est_indexe(model):
+    """Indique si le modèle possède un index plein texte."""
+    return model._meta.label in CHAMPS_INDEXES
+
+
+def _moteur_supporte(conn=None):
+    return (conn or connection).vendor in MOTEURS_SUPPORTES
+
+
+def _mots(terme):
+    """Découpe le terme en mots (lettres, chiffres) : aucune syntaxe de requête n'est transmise telle quelle."""
+    return re.findall(r'\w+', terme or '')
+
+
+def _expression_match(terme, vendor):
+    """Construit l'expression de recherche (tous les mots, en préfixe)."""
+    mots = _mots(terme)
+    if vendor == 'postgresql':
+        return ' & '.join(f"{mot}:*" for mot in mots)
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+### 🚀 Création et reconstruction des tables d'index
+
+def creer_tables(conn=None, registre=None):
+    """Crée les tables d'index si elles n'existent pas (sans effet sur un moteur non supporté)."""
+    conn = conn or connection
+    registre = registre or registre_global
+    if not _moteur_supporte(conn):
+        return
+
+    with conn.cursor() as cursor:
+        for label, champs in CHAMPS_INDEXES.items():
+            table = conn.ops.quote_name(nom_table(registre.get_model(label)))
+            if conn.vendor == 'sqlite':
+                colonnes = ', '.join(champs)
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                    f"USING fts5({colonnes}, tokenize='unicode61 remove_diacritics 2')"
+                )
+            else:
+                index = conn.ops.quote_name(f"{nom_table(registre.get_model(label))}_document_idx")
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (id bigint PRIMARY KEY, document tsvector NOT NULL)")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING GIN (document)")
+
+
+def supprimer_tables(conn=None, registre=None):
+    """Supprime les tables d'index."""
+    conn = conn or connection
+    registre = registre or registre_global
+    if not _moteur_supporte(conn):
+        return
+
+    with conn.cursor() as cursor:
+        for label in CHAMPS_INDEXES:
+            cursor.execute(f"DROP TABLE IF EXISTS {conn.ops.quote_name(nom_table(registre.get_model(label)))}")
+
+
+def _sql_insertion(model, conn):
+    """Retourne la requête d'insertion / remplacement d'une ligne d'index."""
+    table = conn.ops.quote_name(nom_table(model))
+    champs = CHAMPS_INDEXES[model._meta.label]
+    if conn.vendor == 'sqlite':
+        marqueurs = ', '.join(['%s'] * (len(champs) + 1))
+        return f"INSERT OR REPLACE INTO {table} (rowid, {', '.join(champs)}) VALUES ({marqueurs})"
+
+    poids = ['A'] + ['B'] * (len(champs) - 1)
+    document = ' || '.join(
+        f"setweight(to_tsvector('{CONFIG_POSTGRES}', %s), '{p}')" for p in poids
+    )
+    return (
+        f"INSERT INTO {table} (id, document) VALUES (%s, {document}) "
+        f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document"
+    )
+
+
+def reconstruire(model, conn=None, taille_lot=2000):
+    """
+    Vide puis reconstruit l'index d'un modèle par lots.
+    Retourne le nombre d'objets indexés.
+    """
+    conn = conn or connection
+    if not _moteur_supporte(conn):
+        return 0
+
+    champs = CHAMPS_INDEXES[model._meta.label]
+    sql = _sql_insertion(model, conn)
+    total = 0
+    lot = []
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {conn.ops.quote_name(nom_table(model))}")
+        for ligne in model._default_manager.values_list('pk', *champs).iterator(chunk_size=taille_lot):
+            lot.append([ligne[0]] + [valeur or '' for valeur in ligne[1:]])
+            if len(lot) >= taille_lot:
+                cursor.executemany(sql, lot)
+                total += len(lot)
+                lot = []
+        if lot:
+            cursor.executemany(sql, lot)
+            total += len(lot)
+    return total
+
+
+### 🚀 Mise à jour unitaire de l'index
+
+def indexer(instance):
+    """Ajoute ou remplace l'entrée d'index d'un objet."""
+    model = type(instance)
+    if not est_indexe(model) or not _moteur_supporte():
+        return
+
+    valeurs = [getattr(instance, champ) or '' for champ in CHAMPS_INDEXES[model._meta.label]]
+    with connection.cursor() as cursor:
+        cursor.execute(_sql_insertion(model, connection), [instance.pk] + valeurs)
+
+
+def indexer_lot(model, instances):
+    """Ajoute ou remplace les entrées d'index d'une liste d'objets en une seule requête groupée (imports en masse)."""
+    if not est_indexe(model) or not _moteur_supporte() or not instances:
+        return
+
+    champs = CHAMPS_INDEXES[model._meta.label]
+    lignes = [[instance.pk] + [getattr(instance, champ) or '' for champ in champs] for instance in instances]
+    with connection.cursor() as cursor:
+        cursor.executemany(_sql_insertion(model, connection), lignes)
+
+
+def desindexer(model, pk):
+    """Retire un objet de l'index."""
+    if not est_indexe(model) or not _moteur_supporte():
+        return
+
+    colonne = 'rowid' if connection.vendor == 'sqlite' else 'id'
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {connection.ops.quote_name(nom_table(model))} WHERE {colonne} = %s", [pk])
+
+
+def _apres_enregistrement(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Réindexe l'objet, sauf si l'enregistrement ne touche aucun champ indexé."""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(CHAMPS_INDEXES[sender._meta.label]):
+        return
+    indexer(instance)
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    desindexer(sender, instance.pk)
+
+
+def connecter_signaux():
+    """Connecte les signaux de mise à jour de l'index pour chaque modèle indexé."""
+    for label in CHAMPS_INDEXES:
+        model = registre_global.get_model(label)
+        post_save.connect(_apres_enregistrement, sender=model, dispatch_uid=f"index_recherche_save_{label}")
+        post_delete.connect(_apres_suppression, sender=model, dispatch_uid=f"index_recherche_delete_{label}")
+
+
+### 🚀 Interrogation de l'index
+
+def sous_requete(model, terme):
+    """
+    Retourne une sous-requête SQL des clés primaires correspondant au terme,
+    utilisable avec un filtre `pk__in`.
+    """
+    table = connection.ops.quote_name(nom_table(model))
+    expression = _expression_match(terme, connection.vendor)
+    if connection.vendor == 'sqlite':
+        return RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [expression])
+    return RawSQL(
+        f"SELECT id FROM {table} WHERE document @@ to_tsquery('{CONFIG_POSTGRES}', %s)", [expression]
+    )
+
+
+def _pertinence(model, terme):
+    """Score de pertinence (plus petit = plus pertinent), calculé pour la ligne courante."""
+    table = connection.ops.quote_name(nom_table(model))
+    cle = f"{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name(model._meta.pk.column)}"
+    expression = _expression_match(terme, connection.vendor)
+    if connection.vendor == 'sqlite':
+        sql = f"SELECT bm25({table}) FROM {table} WHERE {table} MATCH %s AND {table}.rowid = {cle}"
+    else:
+        sql = (
+            f"SELECT -ts_rank(document, to_tsquery('{CONFIG_POSTGRES}', %s)) "
+            f"FROM {table} WHERE {table}.id = {cle}"
+        )
+    return RawSQL(sql, [expression], output_field=FloatField())
+
+
+def q_recherche(model, terme, prefixe=''):
+    """
+    Retourne un objet `Q` sélectionnant les objets du modèle correspondant au terme.
+    `prefixe` permet de filtrer à travers une relation (ex: `formation__`).
+    """
+    if not _mots(terme):
+        return Q()
+    if not _moteur_supporte():
+        q = Q()
+        for champ in CHAMPS_INDEXES[model._meta.label]:
+            q |= Q(**{f"{prefixe}{champ}__icontains": terme})
+        return q
+    return Q(**{f"{prefixe}pk__in": sous_requete(model, terme)})
+
+
+def filtrer(queryset, terme, q_supplementaire=None):
+    """
+    Restreint le queryset aux objets correspondant au terme, triés par pertinence.
+    `q_supplementaire` élargit les résultats (ex: correspondance sur la formation liée) ;
+    ces résultats sont classés après les correspondances directes.
+    """
+    model = queryset.model
+    if not _mots(terme):
+        return queryset
+
+    q = q_recherche(model, terme)
+    if q_supplementaire is not None:
+        q |= q_supplementaire
+    queryset = queryset.filter(q)
+
+    if not _moteur_supporte():
+        return queryset
+
+    ordre = list(queryset.query.order_by or model._meta.ordering)
+    return queryset.annotate(pertinence=_pertinence(model, terme)).order_by(
+        F('pertinence').asc(nulls_last=True), *ordre
+    )
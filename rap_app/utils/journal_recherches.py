@@ -0,0 +1,99 @@
+"""
+Journal des recherches (modèle `Recherche`), sans écriture sur le chemin de la requête.
+
+Chaque recherche est ajoutée à un tampon en mémoire (une opération sous verrou, sans requête SQL).
+Un thread de fond, démarré à la première recherche du processus, écrit le tampon par `bulk_create`
+toutes les `RAP_APP_RECHERCHES_INTERVALLE_VIDAGE` secondes, ou dès `RAP_APP_RECHERCHES_TAILLE_LOT`
+recherches en attente ; le reste est écrit à l'arrêt du processus.
+
+Le journal est un outil d'analyse : si la base refuse un lot, il est perdu (et signalé dans les logs),
+et au-delà de `RAP_APP_RECHERCHES_CAPACITE` recherches en attente, les suivantes sont ignorées.
+"""
+import atexit
+import logging
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from . import versions_cache
+
+
+logger = logging.getLogger('rap_app.recherches')
+
+
+class JournalRecherches:
+    """Tampon des recherches à enregistrer et thread de fond qui les écrit par lots."""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._tampon = []
+        self._reveil = threading.Event()
+        self._thread = None
+        self._arret_enregistre = False
+        self.ignorees = 0
+
+    def enregistrer(self, **valeurs):
+        """Ajoute une recherche (champs du modèle `Recherche`) au tampon ; retourne immédiatement."""
+        valeurs.setdefault('created_at', timezone.now())
+        with self._verrou:
+            if len(self._tampon) >= settings.RAP_APP_RECHERCHES_CAPACITE:
+                self.ignorees += 1
+                return
+            self._tampon.append(valeurs)
+            plein = len(self._tampon) >= settings.RAP_APP_RECHERCHES_TAILLE_LOT
+
+        if settings.RAP_APP_RECHERCHES_VIDAGE_ARRIERE_PLAN:
+            self._demarrer()
+            if plein:
+                self._reveil.set()
+
+    def en_attente(self):
+        """Nombre de recherches pas encore écrites."""
+        with self._verrou:
+            return len(self._tampon)
+
+    def vider(self):
+        """Écrit les recherches en attente en une requête groupée ; retourne le nombre de recherches écrites."""
+        with self._verrou:
+            lot, self._tampon = self._tampon, []
+        if not lot:
+            return 0
+
+        Recherche = apps.get_model('rap_app', 'Recherche')
+        try:
+            Recherche.objects.bulk_create([Recherche(**valeurs) for valeurs in lot], batch_size=500)
+        except DatabaseError:
+            logger.exception("Journal des recherches : %s recherche(s) perdue(s)", len(lot))
+            return 0
+        versions_cache.invalider('recherche')  # `bulk_create` ne déclenche pas les signaux
+        return len(lot)
+
+    def _demarrer(self):
+        """Démarre le thread de fond s'il ne tourne pas (premier appel, ou processus issu d'un `fork`)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._verrou:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._boucle, name='journal-recherches', daemon=True)
+            self._thread.start()
+            if not self._arret_enregistre:
+                atexit.register(self.vider)
+                self._arret_enregistre = True
+
+    def _boucle(self):
+        while True:
+            self._reveil.wait(settings.RAP_APP_RECHERCHES_INTERVALLE_VIDAGE)
+            self._reveil.clear()
+            try:
+                self.vider()
+            except Exception:  # Le thread ne doit jamais s'arrêter
+                logger.exception("Journal des recherches : échec du vidage")
+            finally:
+                connection.close()  # Connexion propre à ce thread
+
+
+journal = JournalRecherches()
@@ -0,0 +1,102 @@
+"""
+Miniatures des documents (images et première page des PDF).
+
+Les miniatures sont générées hors requête HTTP par la tâche de fond `generer_miniature` (voir `rap_app.taches`),
+en JPEG de quelques Ko, et affichées à la place du fichier original dans l'administration et les gabarits.
+
+Dépendances optionnelles : Pillow pour les images ; `pdftoppm` (poppler-utils) ou PyMuPDF pour les PDF.
+Sans elles, aucune miniature n'est produite et l'affichage retombe sur l'icône du type de document.
+"""
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    fitz = None
+
+
+# Dimensions maximales (en pixels) et qualité JPEG des miniatures
+TAILLE_MINIATURE = (320, 320)
+QUALITE_JPEG = 75
+
+# Délai maximal de rendu de la première page d'un PDF (secondes)
+DELAI_RENDU_PDF = 30
+
+EXTENSIONS_IMAGE = ('.jpg', '.jpeg', '.png', '.gif')
+EXTENSIONS_PDF = ('.pdf',)
+
+
+def type_apercu(nom_fichier):
+    """`'image'`, `'pdf'` ou `None` selon l'extension du fichier."""
+    extension = os.path.splitext(nom_fichier)[1].lower()
+    if extension in EXTENSIONS_IMAGE:
+        return 'image'
+    if extension in EXTENSIONS_PDF:
+        return 'pdf'
+    return None
+
+
+def apercu_disponible(nom_fichier):
+    """Indique si une miniature peut être produite pour ce fichier avec les dépendances installées."""
+    apercu = type_apercu(nom_fichier)
+    if apercu == 'image':
+        return Image is not None
+    if apercu == 'pdf':
+        return Image is not None and (fitz is not None or shutil.which('pdftoppm') is not None)
+    return False
+
+
+def _reduire(image):
+    """Réduit une image PIL aux dimensions de miniature et la retourne encodée en JPEG."""
+    image.thumbnail(TAILLE_MINIATURE)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    sortie = io.BytesIO()
+    image.save(sortie, format='JPEG', quality=QUALITE_JPEG, optimize=True)
+    return sortie.getvalue()
+
+
+def _premiere_page_pdf(chemin):
+    """Rendu de la première page d'un PDF en image PIL (PyMuPDF, sinon `pdftoppm`)."""
+    if fitz is not None:
+        with fitz.open(chemin) as pdf:
+            page = pdf.load_page(0)
+            echelle = max(TAILLE_MINIATURE) / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(echelle, echelle))
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        sortie = os.path.join(dossier, 'page')
+        subprocess.run(
+            ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png',
+             '-scale-to', str(max(TAILLE_MINIATURE)), chemin, sortie],
+            check=True, capture_output=True, timeout=DELAI_RENDU_PDF,
+        )
+        with Image.open(f"{sortie}.png") as page:
+            page.load()
+            return page
+
+
+def generer(fichier):
+    """
+    Contenu JPEG de la miniature du `FieldFile` donné, ou `None` si le type n'a pas d'aperçu
+    ou si les dépendances nécessaires ne sont pas installées.
+    """
+    if not apercu_disponible(fichier.name):
+        return None
+
+    if type_apercu(fichier.name) == 'image':
+        with fichier.storage.open(fichier.name, 'rb') as contenu, Image.open(contenu) as image:
+            image.draft('RGB', TAILLE_MINIATURE)  # ✅ Décodage JPEG directement à taille réduite
+            return _reduire(image)
+
+    return _reduire(_premiere_page_pdf(fichier.path))
@@ -0,0 +1,188 @@
+"""
+Pagination par curseur (keyset / seek) pour les listes volumineuses.
+
+Au lieu de `COUNT(*)` + `LIMIT/OFFSET`, chaque page est obtenue en filtrant sur les valeurs
+des colonnes de tri du dernier (ou du premier) élément de la page courante :
+le coût d'une page ne dépend plus de sa position dans la liste.
+
+Les curseurs sont signés (`django.core.signing`) : ils sont opaques pour l'utilisateur
+et un curseur modifié ou obtenu avec un autre tri est ignoré (retour à la première page).
+"""
+import datetime
+from functools import reduce
+from operator import and_, or_
+
+from django.core import signing
+from django.db.models import F, Q
+
+
+SEL_CURSEUR = 'rap_app.pagination'
+
+
+class PageCurseur:
+    """Page de résultats obtenue par curseur : pas de nombre total ni de numéro de page."""
+
+    curseur = True
+    paginator = None
+
+    def __init__(self, object_list, curseur_suivant=None, curseur_precedent=None, parametres='', nom_parametre='curseur'):
+        self.object_list = object_list
+        self.curseur_suivant = curseur_suivant
+        self.curseur_precedent = curseur_precedent
+        self.parametres = parametres
+        self.nom_parametre = nom_parametre
+
+    def has_next(self):
+        return self.curseur_suivant is not None
+
+    def has_previous(self):
+        return self.curseur_precedent is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _lien(self, curseur):
+        prefixe = f"{self.parametres}&" if self.parametres else ''
+        return f"?{prefixe}{self.nom_parametre}={curseur}"
+
+    @property
+    def lien_suivant(self):
+        return self._lien(self.curseur_suivant) if self.has_next() else ''
+
+    @property
+    def lien_precedent(self):
+        return self._lien(self.curseur_precedent) if self.has_previous() else ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class PaginationCurseur:
+    """
+    Paginateur par curseur.
+
+    `ordre` : liste de champs de tri au format `order_by` (ex: `['-start_date', 'nom', 'id']`),
+    éventuellement à travers des relations (ex: `'centre__nom'`). La clé primaire est ajoutée
+    en dernier critère si elle est absente, pour garantir un ordre total.
+    Les valeurs `NULL` sont toujours placées en fin de liste.
+    """
+
+    def __init__(self, model, ordre, taille_page, nom_parametre='curseur'):
+        self.model = model
+        self.taille_page = taille_page
+        self.nom_parametre = nom_parametre
+        self.champs = []
+        for champ in ordre:
+            chemin = champ.lstrip('-')
+            chemin = model._meta.pk.name if chemin == 'pk' else chemin
+            self.champs.append((chemin, champ.startswith('-')))
+        if not any(chemin == model._meta.pk.name for chemin, _ in self.champs):
+            self.champs.append((model._meta.pk.name, False))
+        self.signature_ordre = ','.join(f"{'-' if desc else ''}{chemin}" for chemin, desc in self.champs)
+
+    ### Résolution et (dé)sérialisation des valeurs
+
+    def _champ_modele(self, chemin):
+        model = self.model
+        champ = None
+        for nom in chemin.split('__'):
+            champ = model._meta.get_field(nom)
+            model = champ.related_model if champ.is_relation else model
+        return champ
+
+    def _valeur(self, obj, chemin):
+        valeur = obj
+        for nom in chemin.split('__'):
+            valeur = getattr(valeur, nom, None) if valeur is not None else None
+        if hasattr(valeur, 'pk'):
+            valeur = valeur.pk
+        return valeur
+
+    def _encoder(self, obj, sens):
+        valeurs = []
+        for chemin, _ in self.champs:
+            valeur = self._valeur(obj, chemin)
+            if isinstance(valeur, (datetime.date, datetime.datetime)):
+                valeur = valeur.isoformat()
+            valeurs.append(valeur)
+        return signing.dumps({'o': self.signature_ordre, 's': sens, 'v': valeurs}, salt=SEL_CURSEUR, compress=True)
+
+    def _decoder(self, curseur):
+        """Retourne `(sens, valeurs)` ou `None` si le curseur est invalide ou obtenu avec un autre tri."""
+        try:
+            donnees = signing.loads(curseur, salt=SEL_CURSEUR)
+        except signing.BadSignature:
+            return None
+        if donnees.get('o') != self.signature_ordre or len(donnees.get('v', [])) != len(self.champs):
+            return None
+        valeurs = [
+            None if valeur is None else self._champ_modele(chemin).to_python(valeur)
+            for (chemin, _), valeur in zip(self.champs, donnees['v'])
+        ]
+        return donnees.get('s'), valeurs
+
+    ### Construction de la requête
+
+    def _ordre_sql(self, avant):
+        ordre = []
+        for chemin, desc in self.champs:
+            # En lecture arrière, le sens et la position des NULL sont inversés
+            descendant = desc != avant
+            if avant:
+                ordre.append(F(chemin).desc(nulls_first=True) if descendant else F(chemin).asc(nulls_first=True))
+            else:
+                ordre.append(F(chemin).desc(nulls_last=True) if descendant else F(chemin).asc(nulls_last=True))
+        return ordre
+
+    def _condition(self, valeurs, avant):
+        """Condition « strictement après » (ou « avant ») le tuple de valeurs, NULL placés en dernier."""
+        termes = []
+        egalites = []
+        for (chemin, desc), valeur in zip(self.champs, valeurs):
+            operateur = 'lt' if desc != avant else 'gt'
+            if valeur is None:
+                terme = Q(**{f"{chemin}__isnull": False}) if avant else None
+                egalite = Q(**{f"{chemin}__isnull": True})
+            else:
+                terme = Q(**{f"{chemin}__{operateur}": valeur})
+                if not avant and self._champ_modele(chemin).null:
+                    terme |= Q(**{f"{chemin}__isnull": True})
+                egalite = Q(**{chemin: valeur})
+            if terme is not None:
+                termes.append(reduce(and_, egalites + [terme]))
+            egalites.append(egalite)
+        return reduce(or_, termes) if termes else Q(pk__in=[])
+
+    def paginer(self, queryset, request):
+        """Retourne la `PageCurseur` demandée par le paramètre `curseur` de la requête."""
+        parametres = request.GET.copy()
+        curseur = parametres.pop(self.nom_parametre, [None])[-1]
+        parametres.pop('page', None)
+        decode = self._decoder(curseur) if curseur else None
+        avant = bool(decode and decode[0] == 'avant')
+
+        if decode:
+            queryset = queryset.filter(self._condition(decode[1], avant))
+        lignes = list(queryset.order_by(*self._ordre_sql(avant))[:self.taille_page + 1])
+        plus = len(lignes) > self.taille_page
+        lignes = lignes[:self.taille_page]
+
+        if avant:
+            lignes.reverse()
+            a_precedent, a_suivant = plus, True
+        else:
+            a_precedent, a_suivant = decode is not None, plus
+
+        return PageCurseur(
+            lignes,
+            curseur_suivant=self._encoder(lignes[-1], 'apres') if a_suivant and lignes else None,
+            curseur_precedent=self._encoder(lignes[0], 'avant') if a_precedent and lignes else None,
+            parametres=parametres.urlencode(),
+            nom_parametre=self.nom_parametre,
+        )
@@ -0,0 +1,54 @@
+"""
+Recalcul différé des compteurs des formations (nombre d'événements, dernier commentaire, saturation).
+
+Hors de ce mécanisme, les signaux de `Commentaire` et `Evenement` mettent à jour la formation à chaque ligne
+écrite ou supprimée. Dans un bloc `recalculs_differes()`, ils se contentent de noter la formation concernée ;
+les compteurs de chaque formation notée sont recalculés une seule fois, par requêtes ensemblistes,
+à la fin du bloc (juste avant la validation de sa transaction) :
+
+    with recalculs_differes():
+        Commentaire.objects.filter(formation=formation).delete()
+
+À utiliser pour les écritures en masse : suppressions en cascade, actions d'administration, imports.
+Les instances de `Formation` déjà chargées en mémoire ne sont pas mises à jour.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import transaction
+
+
+_etat = threading.local()
+
+
+def differer(*formation_ids):
+    """
+    Note les formations à recalculer si un bloc `recalculs_differes()` est en cours et retourne `True` ;
+    retourne `False` sinon (l'appelant met alors la formation à jour lui-même).
+    """
+    formations = getattr(_etat, 'formations', None)
+    if formations is None:
+        return False
+    formations.update(pk for pk in formation_ids if pk is not None)
+    return True
+
+
+@contextmanager
+def recalculs_differes():
+    """
+    Bloc transactionnel dans lequel les compteurs des formations sont recalculés une seule fois, à la fin.
+    Un bloc imbriqué dans un autre n'a pas d'effet propre : le recalcul a lieu à la fin du bloc extérieur.
+    """
+    if getattr(_etat, 'formations', None) is not None:
+        yield
+        return
+
+    _etat.formations = set()
+    try:
+        with transaction.atomic():
+            yield
+            if _etat.formations:
+                apps.get_model('rap_app', 'Formation').objects.recalculer_compteurs(_etat.formations)
+    finally:
+        _etat.formations = None
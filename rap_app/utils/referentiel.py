@@ -0,0 +1,144 @@
+"""
+Référentiel en mémoire des données de référence (centres, statuts, types d'offre).
+
+Ces tables sont petites et changent rarement : elles sont chargées une fois par processus,
+puis servies depuis la mémoire (listes déroulantes, libellés, couleurs, recherche par id).
+
+Invalidation :
+- les signaux `post_save` / `post_delete` (connectés dans `RapAppConfig.ready()`) vident le référentiel
+  du processus courant et changent son numéro de version dans le cache Django, une fois la transaction validée ;
+- à chaque accès, la version en cache est comparée à celle du chargement, ce qui propage
+  l'invalidation aux autres processus lorsque le cache est partagé (Redis, Memcached...).
+"""
+import threading
+import uuid
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+
+class ListeReferentiel(list):
+    """Liste d'objets de référence, avec un accès par id sans requête (voir le filtre `get_value`)."""
+
+    def __init__(self, objets, par_id):
+        super().__init__(objets)
+        self._par_id = par_id
+
+    def get(self, pk):
+        try:
+            return self._par_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+
+class Referentiel:
+    """
+    Table de référence chargée en mémoire.
+
+    `libelle` : fonction retournant le libellé affiché d'un objet (par défaut `str`).
+    """
+
+    def __init__(self, label_modele, libelle=str):
+        self.label_modele = label_modele
+        self.libelle_objet = libelle
+        self._verrou = threading.Lock()
+        self._objets = None
+        self._version = None
+
+    @property
+    def model(self):
+        return apps.get_model(self.label_modele)
+
+    @property
+    def cle_version(self):
+        return f"referentiel_version_{self.label_modele}"
+
+    def _donnees(self):
+        """Retourne `(liste, dict par id)`, en (re)chargeant si nécessaire."""
+        version = cache.get(self.cle_version)
+        donnees = self._objets
+        if donnees is None or version != self._version:
+            with self._verrou:
+                if self._objets is None or version != self._version:
+                    objets = list(self.model._default_manager.all())
+                    self._objets = (objets, {obj.pk: obj for obj in objets})
+                    self._version = version
+                donnees = self._objets
+        return donnees
+
+    def invalider(self):
+        """
+        Vide le référentiel de ce processus et signale le changement aux autres processus,
+        après la validation de la transaction en cours : un rechargement plus tôt pourrait lire
+        (et garder jusqu'à la prochaine écriture) des lignes non validées ou annulées.
+        """
+        transaction.on_commit(self.vider)
+
+    def vider(self):
+        """Vide immédiatement le référentiel, dans ce processus comme dans les autres."""
+        with self._verrou:
+            self._objets = None
+        cache.set(self.cle_version, uuid.uuid4().hex, None)
+
+    ### Accès aux données
+
+    def tous(self):
+        """Tous les objets, dans l'ordre par défaut du modèle."""
+        objets, par_id = self._donnees()
+        return ListeReferentiel(objets, par_id)
+
+    def get(self, pk):
+        """Objet d'id `pk` (entier ou chaîne), ou `None`."""
+        return self.tous().get(pk)
+
+    def par_id(self):
+        """Dictionnaire id → objet."""
+        return dict(self._donnees()[1])
+
+    def choix(self, vide="---------", libelle=None):
+        """
+        Choix pour une liste déroulante : `[(id, libellé), ...]`, précédés d'un choix vide si demandé.
+        `libelle` remplace la fonction de libellé du référentiel (ex: `str` pour un formulaire de modèle).
+        """
+        libelle = libelle or self.libelle_objet
+        choix = [(obj.pk, libelle(obj)) for obj in self._donnees()[0]]
+        return [('', vide)] + choix if vide is not None else choix
+
+    def libelle(self, pk, defaut=''):
+        """Libellé affiché de l'objet d'id `pk`."""
+        obj = self.get(pk)
+        return self.libelle_objet(obj) if obj is not None else defaut
+
+    def attribut(self, pk, nom, defaut=None):
+        """Valeur d'un attribut de l'objet d'id `pk` (ex: `couleur` d'un statut)."""
+        obj = self.get(pk)
+        return getattr(obj, nom, defaut) if obj is not None else defaut
+
+
+centres = Referentiel('rap_app.Centre')
+statuts = Referentiel('rap_app.Statut', libelle=lambda statut: statut.get_nom_display())
+types_offre = Referentiel('rap_app.TypeOffre')
+
+REFERENTIELS = (centres, statuts, types_offre)
+
+
+def couleur_statut(pk):
+    """Couleur d'affichage d'un statut."""
+    return statuts.attribut(pk, 'couleur', '')
+
+
+def _invalider(sender, **kwargs):
+    for referentiel in REFERENTIELS:
+        if sender._meta.label == referentiel.label_modele:
+            referentiel.invalider()
+
+
+def connecter_signaux():
+    """Invalide le référentiel concerné à chaque écriture sur un centre, un statut ou un type d'offre."""
+    for referentiel in REFERENTIELS:
+        model = referentiel.model
+        uid = f"referentiel_{referentiel.label_modele}"
+        post_save.connect(_invalider, sender=model, dispatch_uid=f"{uid}_save")
+        post_delete.connect(_invalider, sender=model, dispatch_uid=f"{uid}_delete")
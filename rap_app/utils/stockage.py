@@ -0,0 +1,124 @@
+"""
+Stockage adressé par le contenu des fichiers de documents.
+
+Chaque fichier est enregistré sous l'empreinte SHA-256 de son contenu (`<dossier>/<aa>/<empreinte><extension>`) :
+un même contenu déposé plusieurs fois (conventions, contrats types...) n'est écrit et stocké qu'une fois,
+et tous les `Document` correspondants pointent vers le même fichier.
+
+Le nombre de références d'un fichier est le nombre de `Document` qui le désignent (colonne indexée) ;
+il n'est supprimé du disque qu'à la disparition de sa dernière référence (voir `models/documents.py`).
+
+Concurrence : le dépôt d'un contenu et la libération de son fichier verrouillent la même ligne `FichierStocke`,
+jusqu'à la fin de leur transaction. Une libération attend donc la validation d'un dépôt en cours du même contenu
+(dont elle voit alors le document), et un dépôt qui suit une libération réécrit le fichier supprimé.
+"""
+import hashlib
+import logging
+import operator
+import os
+from functools import reduce
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Q
+from django.utils.deconstruct import deconstructible
+
+
+logger = logging.getLogger('rap_app.stockage')
+
+# Taille des blocs lus pour le calcul de l'empreinte
+TAILLE_BLOC = 64 * 1024
+
+# Longueur maximale de l'extension conservée dans le nom stocké (le nom tient dans `FileField(max_length=255)`)
+LONGUEUR_MAX_EXTENSION = 16
+
+
+def empreinte_contenu(content):
+    """Empreinte SHA-256 d'un fichier, calculée par blocs (sans le charger entièrement en mémoire)."""
+    empreinte = hashlib.sha256()
+    for bloc in content.chunks(TAILLE_BLOC):
+        empreinte.update(bloc if isinstance(bloc, bytes) else bloc.encode())
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return empreinte.hexdigest()
+
+
+@deconstructible
+class StockageDedoublonne(FileSystemStorage):
+    """
+    `FileSystemStorage` qui range les fichiers par empreinte de contenu.
+    Un contenu déjà présent n'est pas réécrit : son nom existant est retourné.
+    """
+
+    def nom_pour_contenu(self, name, content):
+        """Nom de stockage du contenu : dossier d'origine, préfixe de l'empreinte, empreinte et extension."""
+        empreinte = empreinte_contenu(content)
+        dossier = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()[:LONGUEUR_MAX_EXTENSION]
+        return os.path.join(dossier, empreinte[:2], f"{empreinte}{extension}")
+
+    def verrouiller(self, name):
+        """
+        Verrouille le fichier `name` jusqu'à la fin de la transaction en cours (une écriture sur sa ligne
+        `FichierStocke` : verrou de ligne, ou de la base sous SQLite). L'appelant doit être dans une transaction.
+        """
+        from ..models import FichierStocke
+
+        FichierStocke.objects.update_or_create(nom=name)
+
+    def _save(self, name, content):
+        nom = self.nom_pour_contenu(name, content)
+        # ✅ Verrou tenu jusqu'à la validation du document (voir `Document.save`) : pas de libération concurrente
+        self.verrouiller(nom)
+        if self.exists(nom):
+            return nom  # ✅ Contenu déjà stocké : aucune écriture
+        return super()._save(nom, content)
+
+    def nombre_references(self, name, exclure_pk=None, champ='fichier'):
+        """
+        Nombre de documents qui désignent ce fichier par leur `champ` (hors document `exclure_pk`),
+        ou par l'un de leurs champs fichiers si `champ` est `None`.
+        """
+        from ..models import Document
+        from ..models.documents import CHAMPS_FICHIERS
+
+        champs = CHAMPS_FICHIERS if champ is None else (champ,)
+        documents = Document.objects.filter(reduce(operator.or_, (Q(**{nom_champ: name}) for nom_champ in champs)))
+        if exclure_pk is not None:
+            documents = documents.exclude(pk=exclure_pk)
+        return documents.count()
+
+    def liberer(self, name, exclure_pk=None, champ='fichier'):
+        """Supprime le fichier s'il n'est plus référencé par aucun document. Retourne `True` s'il a été supprimé."""
+        from ..models import FichierStocke
+
+        if not name:
+            return False
+        with transaction.atomic():
+            self.verrouiller(name)
+            if self.nombre_references(name, exclure_pk, champ) > 0:
+                return False
+            self.delete(name)
+            FichierStocke.objects.filter(nom=name).delete()
+        return True
+
+
+def liberer_apres_validation(storage, name, champ='fichier'):
+    """
+    Programme la libération d'un fichier à la validation de la transaction en cours (immédiatement hors transaction).
+    Si la transaction est annulée, le fichier est conservé ; le nombre de références est compté après validation.
+    """
+    def liberer():
+        try:
+            storage.liberer(name, champ=champ)
+        except OSError as e:
+            logger.warning("Erreur lors de la suppression du fichier %s : %s", name, e)
+
+    transaction.on_commit(liberer)
+
+
+stockage_documents = StockageDedoublonne()
+
+
+def get_stockage_documents():
+    return stockage_documents
@@ -0,0 +1,91 @@
+"""
+Exécution des tâches de fond (modèle `Tache`).
+
+Les traitements sont enregistrés par nom avec le décorateur `@tache('nom')` (voir `rap_app.taches`)
+et reçoivent la tâche en cours puis ses paramètres : `traitement(tache, **parametres)`.
+Un traitement signale son avancement avec `tache.avancer(pourcentage, message)` et retourne
+un résultat sérialisable en JSON, enregistré dans `Tache.resultat`.
+
+En cas d'exception, la tâche est remise en file avec un délai croissant
+jusqu'à `max_tentatives`, puis passe en échec.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+logger = logging.getLogger('rap_app.taches')
+
+TRAITEMENTS = {}
+
+# Délai avant une nouvelle tentative : DELAI_REPRISE * 2^(tentatives - 1)
+DELAI_REPRISE = timedelta(seconds=30)
+
+
+class TacheInconnue(Exception):
+    """Aucun traitement n'est enregistré pour ce type de tâche."""
+
+
+def tache(nom):
+    """Décorateur enregistrant un traitement de tâche de fond sous le nom donné."""
+    def decorateur(fonction):
+        TRAITEMENTS[nom] = fonction
+        return fonction
+    return decorateur
+
+
+def identifiant_executeur():
+    """Identifiant du worker courant (machine et processus)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def executer(tache_a_executer):
+    """Exécute une tâche réservée et enregistre son résultat, sa reprise ou son échec."""
+    from ..models import Tache
+
+    traitement = TRAITEMENTS.get(tache_a_executer.type_tache)
+    try:
+        if traitement is None:
+            raise TacheInconnue(f"Type de tâche inconnu : {tache_a_executer.type_tache}")
+        resultat = traitement(tache_a_executer, **tache_a_executer.parametres)
+    except Exception as e:
+        reprise = not isinstance(e, TacheInconnue) and tache_a_executer.tentatives < tache_a_executer.max_tentatives
+        champs = {
+            'erreur': traceback.format_exc(),
+            'message': str(e)[:255],
+            'executeur': '',
+        }
+        if reprise:
+            delai = DELAI_REPRISE * 2 ** max(tache_a_executer.tentatives - 1, 0)
+            champs.update(statut=Tache.EN_ATTENTE, executer_apres=timezone.now() + delai)
+            logger.warning("Tâche %s en erreur (tentative %d), reprise dans %s : %s",
+                           tache_a_executer, tache_a_executer.tentatives, delai, e)
+        else:
+            champs.update(statut=Tache.ECHEC, fin_execution=timezone.now())
+            logger.error("Tâche %s en échec après %d tentative(s) : %s", tache_a_executer, tache_a_executer.tentatives, e)
+        Tache.objects.filter(pk=tache_a_executer.pk).update(**champs)
+        return False
+
+    Tache.objects.filter(pk=tache_a_executer.pk).update(
+        statut=Tache.TERMINEE, resultat=resultat, progression=100,
+        fin_execution=timezone.now(), erreur='', executeur='',
+    )
+    logger.info("Tâche %s terminée", tache_a_executer)
+    return True
+
+
+def traiter_suivante(executeur=None):
+    """
+    Réserve et exécute la prochaine tâche en attente.
+    Retourne la tâche traitée, ou `None` si la file est vide.
+    """
+    from ..models import Tache
+
+    tache_reservee = Tache.objects.reserver(executeur or identifiant_executeur())
+    if tache_reservee is not None:
+        executer(tache_reservee)
+    return tache_reservee
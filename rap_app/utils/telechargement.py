@@ -0,0 +1,151 @@
+"""
+Téléchargement de fichiers stockés (documents...).
+
+Le fichier est envoyé par blocs, sans jamais être chargé en mémoire :
+- réponse complète : `FileResponse`, transmise au serveur WSGI (`wsgi.file_wrapper`, donc `sendfile()` si disponible) ;
+- requête `Range` (reprise de téléchargement, lecture partielle) : réponse `206` limitée à la plage demandée ;
+- `ETag` / `Last-Modified` : réponses `304` aux requêtes conditionnelles ;
+- mode délégué (`RAP_APP_TELECHARGEMENT_DELEGUE`) : seuls les en-têtes sont produits et le proxy frontal
+  (Apache `X-Sendfile`, Nginx `X-Accel-Redirect`) envoie lui-même les octets.
+"""
+import hashlib
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import escape_uri_path
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+
+# Taille des blocs lus pour une réponse partielle
+TAILLE_BLOC = 64 * 1024
+
+X_SENDFILE = 'x-sendfile'
+X_ACCEL_REDIRECT = 'x-accel-redirect'
+
+_PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _date_modification(fichier):
+    """Date de dernière modification du fichier, si le stockage la fournit."""
+    try:
+        return fichier.storage.get_modified_time(fichier.name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def etag_fichier(fichier, taille, modifie_le):
+    """ETag dérivé du nom, de la taille et de la date de modification (sans lire le contenu)."""
+    empreinte = hashlib.sha1(
+        f"{fichier.name}:{taille}:{modifie_le.timestamp() if modifie_le else ''}".encode()
+    ).hexdigest()[:20]
+    return quote_etag(empreinte)
+
+
+def plage_demandee(request, taille, etag, modifie_le):
+    """
+    Retourne la plage `(debut, fin)` (bornes incluses) demandée par l'en-tête `Range`,
+    `None` pour envoyer le fichier complet, ou `False` si la plage n'est pas satisfiable.
+    Seules les plages simples sont prises en charge ; une plage multiple reçoit le fichier complet.
+    """
+    entete = request.headers.get('Range', '').replace(' ', '')
+    correspondance = _PLAGE.match(entete)
+    if not correspondance:
+        return None
+
+    # `If-Range` : la reprise n'est valable que si le fichier n'a pas changé depuis
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        date_if_range = parse_http_date_safe(if_range)
+        if date_if_range is None:
+            if if_range.strip() != etag:
+                return None
+        elif modifie_le is None or int(modifie_le.timestamp()) > date_if_range:
+            return None
+
+    debut, fin = correspondance.groups()
+    if not debut and not fin:
+        return None
+    if not debut:
+        # `bytes=-N` : les N derniers octets
+        longueur = int(fin)
+        if longueur == 0 or taille == 0:
+            return False
+        return max(0, taille - longueur), taille - 1
+    debut = int(debut)
+    fin = min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille or debut > fin:
+        return False
+    return debut, fin
+
+
+def _lire_plage(fichier, debut, longueur, taille_bloc=TAILLE_BLOC):
+    """Générateur des blocs d'une plage du fichier ; le fichier est fermé à la fin."""
+    try:
+        fichier.seek(debut)
+        while longueur > 0:
+            bloc = fichier.read(min(taille_bloc, longueur))
+            if not bloc:
+                break
+            longueur -= len(bloc)
+            yield bloc
+    finally:
+        fichier.close()
+
+
+def reponse_fichier(request, fichier, nom_fichier=None, en_ligne=False):
+    """
+    Réponse HTTP de téléchargement du `FieldFile` donné, en mémoire constante quelle que soit sa taille.
+    Gère les requêtes conditionnelles (`304`), les plages (`206` / `416`) et le mode délégué au proxy.
+    """
+    nom_fichier = nom_fichier or fichier.name.rsplit('/', 1)[-1]
+    content_type = mimetypes.guess_type(nom_fichier)[0] or 'application/octet-stream'
+    taille = fichier.storage.size(fichier.name)
+    modifie_le = _date_modification(fichier)
+    etag = etag_fichier(fichier, taille, modifie_le)
+    derniere_modification = int(modifie_le.timestamp()) if modifie_le else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=derniere_modification)
+    if response is None:
+        response = _reponse_contenu(request, fichier, taille, content_type, etag, modifie_le)
+
+    response['ETag'] = etag
+    if derniere_modification is not None:
+        response['Last-Modified'] = http_date(derniere_modification)
+    response['Accept-Ranges'] = 'bytes'
+    if response.status_code != 304:
+        response['Content-Disposition'] = content_disposition_header(not en_ligne, nom_fichier)
+    return response
+
+
+def _reponse_contenu(request, fichier, taille, content_type, etag, modifie_le):
+    mode_delegue = getattr(settings, 'RAP_APP_TELECHARGEMENT_DELEGUE', None)
+    if mode_delegue:
+        # ✅ Le proxy frontal envoie le fichier (et gère lui-même les plages)
+        response = HttpResponse(content_type=content_type)
+        if mode_delegue == X_ACCEL_REDIRECT:
+            prefixe = getattr(settings, 'RAP_APP_TELECHARGEMENT_PREFIXE_INTERNE', '/protege/')
+            response['X-Accel-Redirect'] = escape_uri_path(prefixe.rstrip('/') + '/' + fichier.name)
+        else:
+            response['X-Sendfile'] = fichier.path
+        return response
+
+    plage = plage_demandee(request, taille, etag, modifie_le)
+    if plage is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{taille}'
+        return response
+
+    contenu = fichier.storage.open(fichier.name, 'rb')
+    if plage is None:
+        response = FileResponse(contenu, content_type=content_type)
+        response['Content-Length'] = taille
+        return response
+
+    debut, fin = plage
+    response = StreamingHttpResponse(_lire_plage(contenu, debut, fin - debut + 1), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+    response['Content-Length'] = fin - debut + 1
+    return response
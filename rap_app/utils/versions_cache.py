@@ -0,0 +1,72 @@
+"""
+Versions de cache par table.
+
+Chaque table suivie a une version en cache, renouvelée par `post_save` / `post_delete` à la validation de la transaction.
+Une valeur calculée à partir de plusieurs tables est mise en cache sous une clé qui contient leurs versions :
+dès qu'une de ces tables change, la clé change et la valeur est recalculée ; les autres valeurs restent valides.
+Les anciennes entrées ne sont jamais relues et expirent d'elles-mêmes.
+"""
+import uuid
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+PREFIXE_VERSION = 'version_table_'
+
+# Tables suivies : nom de version -> modèle
+TABLES_VERSIONNEES = {
+    'formation': 'rap_app.Formation',
+    'evenement': 'rap_app.Evenement',
+    'historique': 'rap_app.HistoriqueFormation',
+    'statut': 'rap_app.Statut',
+    'centre': 'rap_app.Centre',
+    'type_offre': 'rap_app.TypeOffre',
+    'recherche': 'rap_app.Recherche',
+    'agregat_recherche': 'rap_app.AgregatRecherche',
+    'entreprise': 'rap_app.Entreprise',
+    'parametre': 'rap_app.Parametre',
+}
+
+
+def versions(*tables):
+    """Versions courantes des tables données (une seule lecture du cache), initialisées si besoin."""
+    cles = {table: f"{PREFIXE_VERSION}{table}" for table in tables}
+    trouvees = cache.get_many(cles.values())
+    nouvelles = {cle: uuid.uuid4().hex for cle in cles.values() if cle not in trouvees}
+    if nouvelles:
+        cache.set_many(nouvelles, None)
+        trouvees.update(nouvelles)
+    return {table: trouvees[cle] for table, cle in cles.items()}
+
+
+def invalider(table):
+    """
+    Renouvelle la version d'une table : les valeurs qui en dépendent seront recalculées.
+    Dans une transaction, le renouvellement attend sa validation : sinon une requête concurrente pourrait
+    mettre en cache, sous la nouvelle version, des données lues avant le commit (et les garder sans expiration).
+    """
+    cle = f"{PREFIXE_VERSION}{table}"
+    transaction.on_commit(lambda: cache.set(cle, uuid.uuid4().hex, None))
+
+
+def cle_versionnee(nom, tables, versions_connues, *suffixes):
+    """Clé de cache d'une valeur dépendant des `tables` (versions lues par `versions()`)."""
+    return ':'.join([nom, *map(str, suffixes), *(versions_connues[table] for table in tables)])
+
+
+def _invalider(sender, **kwargs):
+    for table, label_modele in TABLES_VERSIONNEES.items():
+        if sender._meta.label == label_modele:
+            invalider(table)
+
+
+def connecter_signaux():
+    """Renouvelle la version d'une table à chaque enregistrement ou suppression (appelé dans `AppConfig.ready`)."""
+    for table, label_modele in TABLES_VERSIONNEES.items():
+        model = apps.get_model(label_modele)
+        uid = f"versions_cache_{table}"
+        post_save.connect(_invalider, sender=model, dispatch_uid=f"{uid}_save")
+        post_delete.connect(_invalider, sender=model, dispatch_uid=f"{uid}_delete")
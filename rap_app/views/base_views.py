@@ -1,13 +1,133 @@
+import hashlib
+import time
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.contrib import messages
+from django.forms import ModelChoiceField
+
+from ..models import Tache
+from ..utils import autocompletion, export_csv, referentiel, versions_cache
+from ..utils.journal_recherches import journal
+from ..utils.pagination import PaginationCurseur
 
 
 class BaseListView(LoginRequiredMixin, ListView):
-    """Vue de base pour les listes avec pagination"""
+    """
+    Vue de base pour les listes avec pagination.
+
+    Par défaut la pagination est classique (numéros de page, `COUNT` + `OFFSET`).
+    Avec `pagination_curseur = True`, la vue passe en pagination par curseur (keyset) :
+    pas de nombre total, et des pages profondes aussi rapides que la première.
+    """
     paginate_by = 20
     template_name_suffix = '_list'
+    pagination_curseur = False
+    ordre_curseur = None  # Par défaut : le tri du queryset, sinon celui du modèle
+
+    def get_ordre_curseur(self, queryset):
+        """Retourne les champs de tri utilisés par la pagination par curseur."""
+        return list(self.ordre_curseur or queryset.query.order_by or queryset.model._meta.ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Pagine par curseur si la vue l'a activé et si le tri ne porte que sur des champs."""
+        if not self.pagination_curseur:
+            return super().paginate_queryset(queryset, page_size)
+
+        ordre = self.get_ordre_curseur(queryset)
+        if not all(isinstance(champ, str) for champ in ordre):
+            # Tri par expression (ex: pertinence d'une recherche) : pagination classique
+            return super().paginate_queryset(queryset, page_size)
+
+        page = PaginationCurseur(queryset.model, ordre, page_size).paginer(queryset, self.request)
+        return (None, page, page.object_list, page.has_other_pages())
+
+
+class ExportCSVMixin:
+    """
+    Export CSV en streaming d'une vue de liste : l'export reprend les filtres de `get_queryset()`.
+
+    Avec le paramètre `arriere_plan=1`, l'export est confié à une tâche de fond (`export_csv`)
+    et la réponse (202) indique l'URL de suivi ; le fichier produit est attaché à la tâche.
+    """
+    nom_fichier = 'export.csv'
+    entete = []
+
+    def get_lignes(self):
+        """Itérable (paresseux) des lignes exportées."""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('arriere_plan'):
+            return self.mettre_en_file()
+        return export_csv.reponse_csv(self.nom_fichier, self.entete, self.get_lignes())
+
+    def mettre_en_file(self):
+        from .taches_views import reponse_tache
+
+        parametres = self.request.GET.copy()
+        parametres.pop('arriere_plan', None)
+        tache = Tache.objects.mettre_en_file(
+            'export_csv',
+            {'vue': f"{type(self).__module__}.{type(self).__qualname__}", 'parametres': parametres.urlencode()},
+            utilisateur=self.request.user,
+        )
+        return reponse_tache(tache)
+
+
+class JournalRechercheMixin:
+    """
+    Journalise les recherches d'une vue de liste (modèle `Recherche`) : terme, filtres, nombre de résultats
+    et temps d'exécution (du début de `get()` à l'évaluation de la page).
+    Seule la première page d'une recherche (terme ou filtre renseigné) est journalisée, via le tampon
+    en mémoire de `rap_app.utils.journal_recherches` : aucune écriture sur le chemin de la requête.
+
+    Avec la pagination par curseur, le nombre total n'est pas calculé : `nombre_resultats` est alors
+    le nombre de résultats de la première page (exact s'il n'y a qu'une page, nul si aucun résultat).
+    """
+    # Paramètre de la requête -> (champ de `Recherche`, référentiel) : un id inconnu n'est pas journalisé,
+    # sans quoi la contrainte de clé étrangère ferait échouer tout le lot
+    filtres_journalises = {
+        'centre': ('filtre_centre_id', referentiel.centres),
+        'type_offre': ('filtre_type_offre_id', referentiel.types_offre),
+        'statut': ('filtre_statut_id', referentiel.statuts),
+    }
+    parametres_pagination = ('page', 'curseur')
+
+    def get(self, request, *args, **kwargs):
+        self._debut_recherche = time.perf_counter()
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        self.journaliser_recherche(context)
+        return context
+
+    def journaliser_recherche(self, context):
+        parametres = self.request.GET
+        terme = parametres.get('q', '').strip()
+        filtres = {
+            champ: int(parametres[nom]) for nom, (champ, table) in self.filtres_journalises.items()
+            if parametres.get(nom, '').strip().isdigit() and table.get(parametres[nom].strip()) is not None
+        }
+        if not (terme or filtres) or any(parametres.get(nom) for nom in self.parametres_pagination):
+            return
+
+        resultats = len(context['object_list'])  # Évalue la page (résultat mis en cache pour le gabarit)
+        paginator = context.get('paginator')
+        if paginator is not None:
+            resultats = paginator.count
+        journal.enregistrer(
+            terme_recherche=terme[:255] or None,
+            nombre_resultats=resultats,
+            temps_execution=round((time.perf_counter() - self._debut_recherche) * 1000, 3),
+            **filtres,
+        )
 
 
 class BaseDetailView(LoginRequiredMixin, DetailView):
@@ -15,7 +135,105 @@ class BaseDetailView(LoginRequiredMixin, DetailView):
     template_name_suffix = '_detail'
 
 
-class BaseCreateView(LoginRequiredMixin, CreateView):
+class GetConditionnelMixin:
+    """
+    GET conditionnel (`ETag` / `Last-Modified`) : la vue fournit un validateur peu coûteux (`get_validateurs()`) ;
+    si le client a déjà la version courante, la réponse est un 304, sans requête principale ni rendu du gabarit.
+
+    L'ETag dépend aussi de l'utilisateur (la page affiche ses droits) et n'est pas utilisé quand des messages
+    sont en attente d'affichage. `Cache-Control: private, no-cache` : le navigateur garde la réponse
+    mais la revalide à chaque affichage. À placer avant `LoginRequiredMixin` : un visiteur anonyme
+    n'obtient jamais de 304.
+    """
+
+    def get_validateurs(self):
+        """
+        Retourne `(clé du contenu, date de dernière modification ou None)` ; `(None, None)` désactive le mécanisme.
+        La date (`Last-Modified`, seul validateur de certains clients et proxys) n'est à fournir que si elle change
+        avec tout ce que couvre la clé ; sinon un `If-Modified-Since` obtiendrait un 304 sur un contenu périmé.
+        """
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD') or not request.user.is_authenticated
+                or len(messages.get_messages(request))):
+            return super().dispatch(request, *args, **kwargs)
+
+        cle, derniere_modification = self.get_validateurs()
+        etag = None
+        if cle is not None:
+            etag = quote_etag(hashlib.md5(f"{request.user.pk}:{cle}".encode()).hexdigest())
+        horodatage = int(derniere_modification.timestamp()) if derniere_modification else None
+
+        reponse = get_conditional_response(request, etag=etag, last_modified=horodatage)
+        if reponse is None:
+            reponse = super().dispatch(request, *args, **kwargs)
+            if reponse.status_code != 200:
+                return reponse
+        if etag:
+            reponse['ETag'] = etag
+        if horodatage:
+            reponse['Last-Modified'] = http_date(horodatage)
+        patch_cache_control(reponse, private=True, no_cache=True)
+        return reponse
+
+
+class DetailConditionnelMixin(GetConditionnelMixin):
+    """
+    GET conditionnel d'une vue de détail. Validateur calculé en une requête : `updated_at` de l'objet,
+    et pour chaque relation affichée (`relations_validateur`), le plus récent `updated_at` et le nombre de lignes
+    (une suppression ne change aucune date) ; s'y ajoutent les versions des tables de référence
+    affichées (`tables_validateur`, voir `rap_app.utils.versions_cache`) et la date du jour.
+    Pas de `Last-Modified` : aucune date ne reflète une suppression, un changement de version ou de jour.
+    """
+    relations_validateur = ()
+    tables_validateur = ()
+
+    def get_validateurs(self):
+        annotations = {}
+        for relation in self.relations_validateur:
+            champ = self.model._meta.get_field(relation)
+            # Chemin de la table liée vers l'objet : nom du champ pour une relation inverse, `related_name` sinon
+            chemin = champ.field.name if champ.auto_created and not champ.concrete else champ.related_query_name()
+            lignes = champ.related_model._default_manager.filter(**{chemin: OuterRef('pk')}).order_by().values(chemin)
+            annotations[f'max_{relation}'] = Subquery(lignes.annotate(derniere=Max('updated_at')).values('derniere'))
+            annotations[f'nb_{relation}'] = Subquery(lignes.annotate(nombre=Count('pk')).values('nombre'))
+
+        valeurs = self.model._default_manager.filter(pk=self.kwargs.get(self.pk_url_kwarg)).values(
+            'updated_at', **annotations
+        ).first()
+        if valeurs is None:
+            return None, None  # 404 rendu par la vue
+
+        versions = versions_cache.versions(*self.tables_validateur) if self.tables_validateur else {}
+        return repr((sorted(valeurs.items()), sorted(versions.items()), timezone.localdate())), None
+
+
+class ChoixRelationsMixin:
+    """
+    Listes déroulantes des formulaires :
+    - les champs de `champs_autocompletion` ne rendent que l'option sélectionnée et se remplissent
+      par autocomplétion (voir `rap_app.utils.autocompletion`) : la page ne contient plus tout le catalogue ;
+    - les autres chargent les relations utilisées par le libellé de leurs options
+      (ex: `Formation.__str__` affiche le centre) : une seule requête par liste au lieu d'une par option.
+    """
+    relations_choix = {'formation': ('centre',)}  # {champ du formulaire: relations à charger}
+    champs_autocompletion = {'formation': 'formations', 'entreprise': 'entreprises'}  # {champ: source}
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        for champ, relations in self.relations_choix.items():
+            queryset = getattr(form.fields.get(champ), 'queryset', None)
+            if queryset is not None:
+                form.fields[champ].queryset = queryset.select_related(*relations)
+        for champ, source in self.champs_autocompletion.items():
+            field = form.fields.get(champ)
+            if isinstance(field, ModelChoiceField) and not field.widget.allow_multiple_selected:
+                field.widget = autocompletion.SelectAutocompletion(source)
+        return form
+
+
+class BaseCreateView(LoginRequiredMixin, ChoixRelationsMixin, CreateView):
     """Vue de base pour créer un objet"""
 
     def form_valid(self, form):
@@ -25,7 +243,7 @@ class BaseCreateView(LoginRequiredMixin, CreateView):
         return response
 
 
-class BaseUpdateView(LoginRequiredMixin, UpdateView):
+class BaseUpdateView(LoginRequiredMixin, ChoixRelationsMixin, UpdateView):
     """Vue de base pour modifier un objet"""
 
     def form_valid(self, form):
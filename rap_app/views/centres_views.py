@@ -4,7 +4,9 @@ from django.utils import timezone
 from django.contrib.auth.mixins import PermissionRequiredMixin
 
 from ..models import Centre, Formation
-from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
+from .base_views import (
+    BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView, DetailConditionnelMixin
+)
 
 
 class CentreListView(BaseListView):
@@ -63,11 +65,13 @@ class CentreListView(BaseListView):
         return context
 
 
-class CentreDetailView(BaseDetailView):
-    """Vue affichant les détails d'un centre de formation"""
+class CentreDetailView(DetailConditionnelMixin, BaseDetailView):
+    """Vue affichant les détails d'un centre de formation (GET conditionnel : 304 si rien n'a changé)"""
     model = Centre
     context_object_name = 'centre'
     template_name = 'centres/centre_detail.html'  # Vérifie que ce fichier existe
+    relations_validateur = ('formations',)
+    tables_validateur = ('type_offre', 'statut')
 
     def get_context_data(self, **kwargs):
         """Ajoute au contexte les formations associées au centre"""
@@ -3,7 +3,8 @@ from django.db.models import Q
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.shortcuts import redirect, get_object_or_404
 
-from ..models import Commentaire, Formation
+from ..models import Commentaire
+from ..utils import autocompletion, index_recherche
 from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
 
 
@@ -12,6 +13,14 @@ class CommentaireListView(BaseListView):
     model = Commentaire
     context_object_name = 'commentaires'
     template_name = 'commentaires/commentaire_list.html'
+    pagination_curseur = True
+    ordre_curseur = ['-created_at', '-id']
+
+    def get_ordre_curseur(self, queryset):
+        """Tri par date, sauf pour une recherche : tri par pertinence (et pagination classique)."""
+        if self.request.GET.get('q', '').strip():
+            return list(queryset.query.order_by)
+        return super().get_ordre_curseur(queryset)
     
     def get_queryset(self):
         """
@@ -32,10 +41,10 @@ class CommentaireListView(BaseListView):
         if utilisateur_id:
             queryset = queryset.filter(utilisateur_id=utilisateur_id)
             
-        # Recherche textuelle
+        # Recherche plein texte, triée par pertinence
         q = self.request.GET.get('q')
         if q:
-            queryset = queryset.filter(contenu__icontains=q)
+            queryset = index_recherche.filtrer(queryset, q)
             
         return queryset
     
@@ -50,8 +59,8 @@ class CommentaireListView(BaseListView):
             'q': self.request.GET.get('q', ''),
         }
         
-        # Liste des formations pour le filtrage
-        context['formations'] = Formation.objects.all()
+        # Formation filtrée (libellé lu dans l'index d'autocomplétion) : la liste n'est plus rendue en entier
+        context['formation_filtree'] = autocompletion.SOURCES['formations'].libelle(context['filters']['formation'])
         
         return context
 
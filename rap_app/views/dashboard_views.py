@@ -1,68 +1,186 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
 from django.db.models import Count, Sum, Avg, F, Q, Case, When, IntegerField, Value
+from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.utils import timezone
+from collections import Counter
 from datetime import datetime, timedelta
 
-from ..models import Formation, Centre, TypeOffre, Statut, Evenement, HistoriqueFormation, Recherche
+from ..models import Formation, Centre, Statut, Evenement, AgregatHistoriqueFormation, Parametre, Recherche, AgregatRecherche
+from ..models.historique_formations import debut_periode
+from ..utils import referentiel, versions_cache
+from .base_views import GetConditionnelMixin
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
-    """Vue du tableau de bord principal"""
+    """
+    Vue du tableau de bord principal.
+
+    Chaque widget est mis en cache séparément sous une clé qui contient la version des tables dont il dépend
+    (voir `rap_app.utils.versions_cache`) : un affichage courant ne lit que le cache,
+    et seuls les widgets dont une table a changé sont recalculés.
+    """
     template_name = 'rap_app/dashboard.html'
-    
+
+    # Widget -> (tables dont il dépend, dépend de la date du jour)
+    WIDGETS = {
+        'statuts': (('formation', 'statut'), False),
+        'taux_remplissage_moyen': (('formation',), True),
+        'formations_recentes': (('formation', 'centre', 'type_offre', 'statut'), False),
+        'evenements_a_venir': (('evenement', 'formation'), True),
+        'recherches_recentes': (('recherche',), False),
+        'synthese_recherches': (('agregat_recherche', 'centre', 'type_offre', 'statut'), True),
+    }
+    WIDGETS_STAFF = ('recherches_recentes', 'synthese_recherches')
+    DUREE_CACHE_WIDGETS = 60 * 60
+    # Période (en jours) de la synthèse des recherches, et nombre de termes et de filtres affichés
+    JOURS_SYNTHESE_RECHERCHES = 30
+    TOP_SYNTHESE_RECHERCHES = 10
+
+    def get_widgets(self):
+        """Widgets affichés pour l'utilisateur courant."""
+        return [
+            widget for widget in self.WIDGETS
+            if widget not in self.WIDGETS_STAFF or self.request.user.is_staff
+        ]
+
+    def widgets_en_cache(self, widgets):
+        """Valeurs des widgets : lues dans le cache en deux accès, recalculées seulement si absentes."""
+        tables = {table for widget in widgets for table in self.WIDGETS[widget][0]}
+        versions = versions_cache.versions(*tables)
+        jour = timezone.now().date().isoformat()
+        cles = {
+            widget: versions_cache.cle_versionnee(
+                f"tableau_de_bord:{widget}", self.WIDGETS[widget][0], versions, jour if self.WIDGETS[widget][1] else ''
+            )
+            for widget in widgets
+        }
+
+        en_cache = cache.get_many(cles.values())
+        valeurs, a_enregistrer = {}, {}
+        for widget, cle in cles.items():
+            if cle in en_cache:
+                valeurs[widget] = en_cache[cle]
+            else:
+                valeurs[widget] = a_enregistrer[cle] = getattr(self, f"widget_{widget}")()
+        if a_enregistrer:
+            cache.set_many(a_enregistrer, self.DUREE_CACHE_WIDGETS)
+        return valeurs
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Statistiques globales
-        context['total_formations'] = Formation.objects.count()
-        context['formations_actives'] = Formation.objects.formations_actives().count()
-        context['formations_a_venir'] = Formation.objects.formations_a_venir().count()
-        
-        # Formations par statut
-        statuts = Statut.objects.annotate(
+        # Statistiques globales (une seule requête, mise en cache)
+        stats = Formation.objects.statistiques()
+        context['total_formations'] = stats['total']
+        context['formations_actives'] = stats['actives']
+        context['formations_a_venir'] = stats['a_venir']
+
+        context.update(self.widgets_en_cache(self.get_widgets()))
+        return context
+
+    ### ✅ Widgets (valeurs sérialisables, mises en cache)
+
+    def widget_statuts(self):
+        """Formations par statut"""
+        return list(Statut.objects.annotate(
             nb_formations=Count('formations')
-        ).filter(nb_formations__gt=0).order_by('-nb_formations')
-        
-        context['statuts'] = statuts
-        
-        # Taux de remplissage moyen des formations actives
-        from django.db.models.functions import Coalesce
-        
-        taux_remplissage = Formation.objects.formations_actives().aggregate(
-            taux=Avg(
-                100 * (F('inscrits_crif') + F('inscrits_mp')) / 
-                Coalesce(F('prevus_crif') + F('prevus_mp'), Value(1), output_field=IntegerField())
-            )
-        )
-        
-        context['taux_remplissage_moyen'] = taux_remplissage['taux'] or 0
-        
-        # Formations récentes
-        context['formations_recentes'] = Formation.objects.select_related(
+        ).filter(nb_formations__gt=0).order_by('-nb_formations'))
+
+    def widget_taux_remplissage_moyen(self):
+        """Taux de remplissage moyen des formations actives"""
+        return Formation.objects.formations_actives().aggregate(
+            taux=Avg('taux_saturation')
+        )['taux'] or 0
+
+    def widget_formations_recentes(self):
+        """Formations récentes"""
+        return list(Formation.objects.select_related(
             'centre', 'type_offre', 'statut'
-        ).order_by('-created_at')[:5]
-        
-        # Événements à venir
-        context['evenements_a_venir'] = Evenement.objects.select_related(
+        ).order_by('-created_at')[:5])
+
+    def widget_evenements_a_venir(self):
+        """Événements à venir"""
+        return list(Evenement.objects.select_related(
             'formation'
         ).filter(
             event_date__gte=timezone.now().date()
-        ).order_by('event_date')[:5]
-        
-        # Récentes recherches (pour administrateurs)
-        if self.request.user.is_staff:
-            context['recherches_recentes'] = Recherche.objects.select_related(
-                'utilisateur'
-            ).order_by('-created_at')[:10]
-        
-        return context
+        ).order_by('event_date')[:5])
 
+    def widget_recherches_recentes(self):
+        """Récentes recherches (pour administrateurs)"""
+        return list(Recherche.objects.order_by('-created_at')[:10])
+
+    def widget_synthese_recherches(self):
+        """
+        Synthèse des recherches des derniers jours (pour administrateurs), lue dans les agrégats quotidiens :
+        volumes et termes sommés sur la période, percentiles du temps d'exécution jour par jour
+        (des percentiles ne s'additionnent pas).
+        """
+        depuis = timezone.localdate() - timedelta(days=self.JOURS_SYNTHESE_RECHERCHES)
+        agregats = list(AgregatRecherche.objects.filter(jour__gte=depuis).order_by('-jour'))
+
+        termes, sans_resultat, filtres = Counter(), Counter(), {}
+        for agregat in agregats:
+            for terme, nombre, nb_sans_resultat in agregat.termes:
+                termes[terme] += nombre
+                sans_resultat[terme] += nb_sans_resultat
+            for nom, lignes in agregat.filtres.items():
+                compteur = filtres.setdefault(nom, Counter())
+                for pk, nombre in lignes:
+                    compteur[pk] += nombre
+
+        total = sum(agregat.nb_recherches for agregat in agregats)
+        total_sans_resultat = sum(agregat.nb_sans_resultat for agregat in agregats)
+        tables = {
+            'centre': ("Centre", referentiel.centres),
+            'type_offre': ("Type d'offre", referentiel.types_offre),
+            'statut': ("Statut", referentiel.statuts),
+        }
+        top = self.TOP_SYNTHESE_RECHERCHES
+        return {
+            'jours': self.JOURS_SYNTHESE_RECHERCHES,
+            'nb_recherches': total,
+            'taux_sans_resultat': 100 * total_sans_resultat / total if total else 0,
+            'termes': termes.most_common(top),
+            'termes_sans_resultat': [
+                (terme, nombre) for terme, nombre in sans_resultat.most_common(top) if nombre
+            ],
+            'filtres': [
+                (tables[nom][0], tables[nom][1].libelle(pk, defaut=f"#{pk}"), nombre)
+                for nom, compteur in filtres.items() for pk, nombre in compteur.most_common(top)
+            ],
+            'temps': [
+                (agregat.jour, agregat.nb_recherches, agregat.temps_p50, agregat.temps_p95, agregat.temps_p99)
+                for agregat in agregats[:7]
+            ],
+        }
+
+
+class StatsAPIView(GetConditionnelMixin, LoginRequiredMixin, TemplateView):
+    """
+    API pour les données statistiques.
+    GET conditionnel : l'ETag est formé des versions des tables dont dépend l'action (et de la date du jour),
+    les graphiques qui interrogent l'API périodiquement reçoivent un 304 sans requête tant que rien ne change.
+    """
+
+    # Action -> tables dont dépend sa réponse (voir `rap_app.utils.versions_cache`)
+    TABLES_PAR_ACTION = {
+        'formations_par_statut': ('formation', 'statut'),
+        'evolution_formations': ('historique',),
+        'formations_par_type': ('formation', 'type_offre'),
+        'taux_remplissage': ('formation', 'parametre'),
+    }
+
+    def get_validateurs(self):
+        tables = self.TABLES_PAR_ACTION.get(self.request.GET.get('action'))
+        if tables is None:
+            return None, None
+        versions = versions_cache.versions(*tables)
+        return versions_cache.cle_versionnee('statistiques', tables, versions, timezone.localdate().isoformat()), None
 
-class StatsAPIView(LoginRequiredMixin, TemplateView):
-    """API pour les données statistiques"""
-    
     def get(self, request, *args, **kwargs):
         action = request.GET.get('action')
         
@@ -81,88 +199,132 @@ class StatsAPIView(LoginRequiredMixin, TemplateView):
         """Renvoie le nombre de formations par statut"""
         from django.db.models.functions import Coalesce
         
-        statuts = Statut.objects.annotate(
-            nb_formations=Count('formations'),
-            taux_moyen=Coalesce(
-                Avg(
-                    100 * (F('formations__inscrits_crif') + F('formations__inscrits_mp')) / 
-                    Coalesce(F('formations__prevus_crif') + F('formations__prevus_mp'), Value(1), output_field=IntegerField())
-                ),
-                0
-            )
-        ).values('nom', 'nb_formations', 'taux_moyen', 'couleur')
+        # Regroupement sur la seule table des formations, libellés et couleurs lus dans le référentiel
+        par_statut = {
+            ligne['statut']: ligne
+            for ligne in Formation.objects.values('statut').annotate(
+                nb_formations=Count('id'),
+                taux_moyen=Coalesce(Avg('taux_saturation'), 0.0)
+            ).order_by()
+        }
+        statuts = [
+            {
+                'nom': statut.nom,
+                'nb_formations': par_statut.get(statut.pk, {}).get('nb_formations', 0),
+                'taux_moyen': par_statut.get(statut.pk, {}).get('taux_moyen', 0.0),
+                'couleur': statut.couleur,
+            }
+            for statut in referentiel.statuts.tous()
+        ]
         
         return JsonResponse({
-            'statuts': list(statuts)
+            'statuts': statuts
         })
     
+    # Profondeur (en jours) des courbes d'évolution selon la granularité
+    PROFONDEUR_EVOLUTION = {
+        AgregatHistoriqueFormation.JOUR: 90,
+        AgregatHistoriqueFormation.SEMAINE: 365,
+        AgregatHistoriqueFormation.MOIS: 365,
+    }
+
     def evolution_formations(self):
-        """Renvoie l'évolution du nombre de formations et d'inscrits par mois"""
-        from django.db.models.functions import TruncMonth
-        
-        # Historique des 12 derniers mois
-        date_limite = timezone.now().date() - timedelta(days=365)
-        
-        evolution = HistoriqueFormation.objects.filter(
-            created_at__gte=date_limite
-        ).annotate(
-            mois=TruncMonth('created_at')
-        ).values('mois').annotate(
-            nb_inscrits=Sum('inscrits_total'),
-            nb_formations=Count('formation', distinct=True)
-        ).order_by('mois')
-        
-        # Convertir les dates en chaînes pour JSON
-        for item in evolution:
-            if item['mois']:
-                item['mois'] = item['mois'].strftime('%Y-%m')
-        
+        """
+        Renvoie l'évolution du nombre de formations et d'inscrits par jour, semaine ou mois (`granularite`),
+        éventuellement limitée à un centre (`centre`) ou un type d'offre (`type_offre`).
+        Lit les agrégats de l'historique (`AgregatHistoriqueFormation`) au lieu de l'historique brut.
+        """
+        granularite = self.request.GET.get('granularite', AgregatHistoriqueFormation.MOIS)
+        if granularite not in self.PROFONDEUR_EVOLUTION:
+            return JsonResponse({'error': 'Granularité non reconnue'}, status=400)
+
+        date_limite = debut_periode(
+            granularite, timezone.localdate() - timedelta(days=self.PROFONDEUR_EVOLUTION[granularite])
+        )
+        agregats = AgregatHistoriqueFormation.objects.filter(granularite=granularite, debut_periode__gte=date_limite)
+        for filtre in ('centre', 'type_offre'):
+            valeur = self.request.GET.get(filtre, '')
+            if valeur.isdigit():
+                agregats = agregats.filter(**{f"{filtre}_id": int(valeur)})
+
+        format_periode = '%Y-%m' if granularite == AgregatHistoriqueFormation.MOIS else '%Y-%m-%d'
+        evolution = [
+            {
+                'periode': ligne['debut_periode'].strftime(format_periode),
+                'nb_inscrits': ligne['nb_inscrits'],
+                'nb_formations': ligne['nb_formations'],
+            }
+            for ligne in agregats.values('debut_periode').annotate(
+                nb_inscrits=Sum('nb_inscrits'),
+                nb_formations=Sum('nb_formations'),
+            ).order_by('debut_periode')
+        ]
+
         return JsonResponse({
-            'evolution': list(evolution)
+            'granularite': granularite,
+            'evolution': evolution,
         })
     
     def formations_par_type(self):
         """Renvoie le nombre de formations par type d'offre"""
-        types = TypeOffre.objects.annotate(
-            nb_formations=Count('formations')
-        ).filter(nb_formations__gt=0).values('nom', 'nb_formations')
+        par_type = Formation.objects.filter(type_offre__isnull=False).values('type_offre').annotate(
+            nb_formations=Count('id')
+        ).order_by()
+        types = [
+            {'nom': referentiel.types_offre.attribut(ligne['type_offre'], 'nom'), 'nb_formations': ligne['nb_formations']}
+            for ligne in par_type
+        ]
         
         return JsonResponse({
-            'types': list(types)
+            'types': types
         })
     
+    # Pagination de la liste optionnelle des formations de `taux_remplissage`
+    TAILLE_PAGE_FORMATIONS = 50
+    TAILLE_PAGE_FORMATIONS_MAX = 200
+
     def taux_remplissage(self):
-        """Renvoie le taux de remplissage des formations actives"""
-        from django.db.models.functions import Coalesce
-        
-        formations = Formation.objects.formations_actives().annotate(
-            taux=100 * (F('inscrits_crif') + F('inscrits_mp')) / 
-                Coalesce(F('prevus_crif') + F('prevus_mp'), Value(1), output_field=IntegerField())
-        ).values('id', 'nom', 'taux')
-        
-        # Calculer la répartition par tranches
-        tranches = {
-            '0-25%': 0,
-            '25-50%': 0,
-            '50-75%': 0,
-            '75-100%': 0,
-            '>100%': 0
+        """
+        Répartition des formations actives par tranche de taux de remplissage, en une requête CASE / GROUP BY.
+        Les bornes des tranches sont les seuils `ALERTE_TAUX_REMPLISSAGE_*` (et 100 %).
+        La liste des formations n'est renvoyée que sur demande (`formations=1`), paginée
+        (`page`, `par_page`) et éventuellement limitée à une tranche (`tranche`, indice de la tranche).
+        """
+        bornes = list(Parametre.objects.seuils_taux_remplissage())
+        if bornes[-1] < 100:
+            bornes.append(100.0)
+        libelles = [f"{bas:g}-{haut:g}%" for bas, haut in zip([0.0] + bornes, bornes)] + [f">{bornes[-1]:g}%"]
+
+        tranche = Case(
+            *[When(taux_saturation__lte=borne, then=Value(indice)) for indice, borne in enumerate(bornes)],
+            default=Value(len(bornes)),
+            output_field=IntegerField(),
+        )
+        formations = Formation.objects.formations_actives().annotate(tranche=tranche).order_by()
+        effectifs = dict(formations.values_list('tranche').annotate(nb=Count('id')))
+
+        donnees = {
+            'tranches': {libelle: effectifs.get(indice, 0) for indice, libelle in enumerate(libelles)},
+            'bornes': bornes,
         }
-        
-        for f in formations:
-            taux = f['taux']
-            if taux <= 25:
-                tranches['0-25%'] += 1
-            elif taux <= 50:
-                tranches['25-50%'] += 1
-            elif taux <= 75:
-                tranches['50-75%'] += 1
-            elif taux <= 100:
-                tranches['75-100%'] += 1
-            else:
-                tranches['>100%'] += 1
-        
-        return JsonResponse({
-            'formations': list(formations),
-            'tranches': tranches
-        })
\ No newline at end of file
+
+        if self.request.GET.get('formations'):
+            indice = self.request.GET.get('tranche', '')
+            if indice.isdigit():
+                formations = formations.filter(tranche=int(indice))
+            try:
+                par_page = min(int(self.request.GET.get('par_page', self.TAILLE_PAGE_FORMATIONS)), self.TAILLE_PAGE_FORMATIONS_MAX)
+            except ValueError:
+                par_page = self.TAILLE_PAGE_FORMATIONS
+            page = Paginator(
+                formations.values('id', 'nom', taux=F('taux_saturation')).order_by('-taux_saturation', 'id'),
+                max(par_page, 1)
+            ).get_page(self.request.GET.get('page'))
+            donnees['formations'] = list(page)
+            donnees['pagination'] = {
+                'page': page.number,
+                'pages': page.paginator.num_pages,
+                'total': page.paginator.count,
+            }
+
+        return JsonResponse(donnees)
@@ -1,11 +1,13 @@
+import os
+
 from django.urls import reverse_lazy
-from django.db.models import Q
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.shortcuts import  get_object_or_404
-from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect
+from django.http import Http404, HttpResponseBadRequest, HttpResponseRedirect
 
 
-from ..models import Document, Formation
+from ..models import Document
+from ..utils import autocompletion, index_recherche, telechargement
 from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
 
 
@@ -34,13 +36,10 @@ class DocumentListView(BaseListView):
         if type_doc:
             queryset = queryset.filter(type_document=type_doc)
             
-        # Recherche textuelle
+        # Recherche plein texte (nom du fichier, source), triée par pertinence
         q = self.request.GET.get('q')
         if q:
-            queryset = queryset.filter(
-                Q(nom_fichier__icontains=q) | 
-                Q(source__icontains=q)
-            )
+            queryset = index_recherche.filtrer(queryset, q)
             
         return queryset
     
@@ -55,20 +54,31 @@ class DocumentListView(BaseListView):
             'q': self.request.GET.get('q', ''),
         }
         
-        # Liste des formations pour le filtrage
-        context['formations'] = Formation.objects.all()
+        # Formation filtrée (libellé lu dans l'index d'autocomplétion) : la liste n'est plus rendue en entier
+        context['formation_filtree'] = autocompletion.SOURCES['formations'].libelle(context['filters']['formation'])
         
         # Types de documents pour le filtrage
         context['types_document'] = Document.TYPE_DOCUMENT_CHOICES
         
         return context
+
+
 class DocumentDownloadView(BaseDetailView):
-    """Vue pour télécharger un document"""
+    """Vue pour télécharger un document (streaming, reprise `Range`, `304`, envoi délégué au proxy)"""
     def get(self, request, pk):
-        document = get_object_or_404(Document, pk=pk)
-        response = HttpResponse(document.fichier, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{document.nom_fichier}"'
-        return response
+        document = get_object_or_404(Document.objects.only('fichier', 'nom_fichier'), pk=pk)
+        if not document.fichier:
+            raise Http404("Ce document n'a pas de fichier.")
+        nom_fichier = document.nom_fichier
+        extension = os.path.splitext(document.fichier.name)[1]
+        if extension and not nom_fichier.lower().endswith(extension.lower()):
+            nom_fichier += extension
+        try:
+            return telechargement.reponse_fichier(request, document.fichier, nom_fichier)
+        except FileNotFoundError:
+            raise Http404("Le fichier de ce document est introuvable.")
+
+
 class DocumentDetailView(BaseDetailView):
     """Vue affichant les détails d'un document"""
     model = Document
@@ -8,7 +8,9 @@ from django.http import HttpResponseRedirect
 from ..models.entreprises import Entreprise
 
 from ..models import  Formation
-from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
+from .base_views import (
+    BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView, DetailConditionnelMixin
+)
 
 
 class EntrepriseListView(BaseListView):
@@ -61,11 +63,13 @@ class EntrepriseListView(BaseListView):
         return context
 
 
-class EntrepriseDetailView(BaseDetailView):
-    """Vue affichant les détails d'une entreprise"""
+class EntrepriseDetailView(DetailConditionnelMixin, BaseDetailView):
+    """Vue affichant les détails d'une entreprise (GET conditionnel : 304 si rien n'a changé)"""
     model = Entreprise
     context_object_name = 'entreprise'
     template_name = 'entreprises/entreprise_detail.html'
+    relations_validateur = ('formations',)
+    tables_validateur = ('centre', 'type_offre', 'statut')
 
     def get_context_data(self, **kwargs):
         """Ajoute au contexte les formations associées à l'entreprise"""
@@ -1,10 +1,10 @@
 from django.urls import reverse_lazy
-from django.db.models import Q
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.shortcuts import redirect, get_object_or_404
 from django.utils import timezone
 
 from ..models import Evenement, Formation
+from ..utils import autocompletion, index_recherche
 from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
 
 
@@ -40,13 +40,11 @@ class EvenementListView(BaseListView):
         elif periode == 'past':
             queryset = queryset.filter(event_date__lt=timezone.now().date())
             
-        # Recherche textuelle
+        # Recherche plein texte sur l'événement et sa formation, triée par pertinence
         q = self.request.GET.get('q')
         if q:
-            queryset = queryset.filter(
-                Q(details__icontains=q) | 
-                Q(description_autre__icontains=q) |
-                Q(formation__nom__icontains=q)
+            queryset = index_recherche.filtrer(
+                queryset, q, q_supplementaire=index_recherche.q_recherche(Formation, q, prefixe='formation__')
             )
             
         return queryset
@@ -63,8 +61,8 @@ class EvenementListView(BaseListView):
             'q': self.request.GET.get('q', ''),
         }
         
-        # Liste des formations pour le filtrage
-        context['formations'] = Formation.objects.all()
+        # Formation filtrée (libellé lu dans l'index d'autocomplétion) : la liste n'est plus rendue en entier
+        context['formation_filtree'] = autocompletion.SOURCES['formations'].libelle(context['filters']['formation'])
         
         # Types d'événements pour le filtrage
         context['types_evenement'] = Evenement.TYPE_EVENEMENT_CHOICES
@@ -1,6 +1,5 @@
 from urllib import request
 from django.urls import reverse_lazy
-from django.db.models import Q, F, ExpressionWrapper, IntegerField, FloatField
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.utils import timezone
 from django.db import transaction
@@ -14,57 +13,79 @@ from ..models.entreprises import Entreprise
 from ..models import Formation
 
 
-from ..models.centres import Centre
-from ..models.statut import Statut
-from ..models.types_offre import TypeOffre
-
 from ..models.commentaires import Commentaire
 from ..models import Formation, HistoriqueFormation
-from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
-
-
-class FormationListView(BaseListView):
-    """Vue listant toutes les formations avec options de filtrage et indicateurs dynamiques."""
+from ..utils import export_csv, index_recherche, referentiel
+from .base_views import (
+    BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView, DetailConditionnelMixin, ExportCSVMixin,
+    JournalRechercheMixin,
+)
+
+
+def appliquer_choix_referentiel(form):
+    """
+    Remplace les choix des champs centre / type d'offre / statut par ceux du référentiel :
+    l'affichage du formulaire n'interroge plus ces tables (la validation reste faite en base).
+    """
+    for nom, table in (('centre', referentiel.centres), ('type_offre', referentiel.types_offre), ('statut', referentiel.statuts)):
+        if nom in form.fields:
+            form.fields[nom].choices = [('', form.fields[nom].empty_label or '')] + table.choix(vide=None, libelle=str)
+    return form
+
+
+class FormationListView(JournalRechercheMixin, BaseListView):
+    """Vue listant toutes les formations avec options de filtrage et indicateurs dynamiques (recherches journalisées)."""
     model = Formation
     context_object_name = 'formations'
     template_name = 'formations/formation_list.html'
     paginate_by = 10  # ✅ Ajout de la pagination
+    pagination_curseur = True
+    ordre_curseur = ['-start_date', 'nom', 'id']
+
+    # ✅ Colonnes affichables et triables (paramètre `tri`, préfixe `-` pour un tri décroissant)
+    colonnes = [
+        {'nom': 'Nom', 'field': 'nom'},
+        {'nom': 'Centre', 'field': 'centre__nom'},
+        {'nom': 'Type', 'field': 'type_offre__nom'},
+        {'nom': 'Statut', 'field': 'statut__nom'},
+        {'nom': 'N° Offre', 'field': 'num_offre'},
+        {'nom': 'Début', 'field': 'start_date'},
+        {'nom': 'Fin', 'field': 'end_date'},
+        {'nom': 'Places CRIF', 'field': 'places_restantes_crif'},
+        {'nom': 'Places MP', 'field': 'places_restantes_mp'},
+        {'nom': 'Total places', 'field': 'total_places'},
+        {'nom': 'Disponibles', 'field': 'places_disponibles'},
+        {'nom': 'Saturation (%)', 'field': 'taux_saturation'},
+    ]
+
+    def get_tri(self):
+        """Retourne le tri choisi par l'utilisateur s'il porte sur une colonne autorisée, sinon `None`."""
+        tri = self.request.GET.get('tri', '').strip()
+        if tri.lstrip('-') in {colonne['field'] for colonne in self.colonnes}:
+            return tri
+        return None
+
+    def get_ordre_curseur(self, queryset):
+        """Tri choisi par l'utilisateur (départagé par l'id), sinon tri par défaut ou par pertinence."""
+        tri = self.get_tri()
+        if tri:
+            return [tri, 'id']
+        if self.request.GET.get('q', '').strip():
+            return list(queryset.query.order_by)
+        return super().get_ordre_curseur(queryset)
 
     def get_queryset(self):
         """Récupère la liste des formations avec options de filtrage et recherche par mots-clés."""
         today = timezone.now().date()
 
-        queryset = Formation.objects.select_related('centre', 'type_offre', 'statut').annotate(
-            total_places=ExpressionWrapper(
-                F('prevus_crif') + F('prevus_mp'), output_field=IntegerField()
-            ),
-            total_inscrits=ExpressionWrapper(
-                F('inscrits_crif') + F('inscrits_mp'), output_field=IntegerField()
-            ),
-            places_restantes_crif=ExpressionWrapper(
-                F('prevus_crif') - F('inscrits_crif'), output_field=IntegerField()
-            ),
-            places_restantes_mp=ExpressionWrapper(
-                F('prevus_mp') - F('inscrits_mp'), output_field=IntegerField()
-            ),
-            taux_saturation=ExpressionWrapper(
-                100.0 * (F('inscrits_crif') + F('inscrits_mp')) / 
-                (F('prevus_crif') + F('prevus_mp')), output_field=FloatField()
-            ),
-        )
-
-        print("Formations récupérées avant filtrage :", queryset)  # ✅ Debug
+        # Les indicateurs de remplissage (total_places, taux_saturation...) sont des colonnes indexées,
+        # le dernier commentaire est lu par jointure sur son pointeur
+        queryset = Formation.objects.select_related('centre', 'type_offre', 'statut', 'dernier_commentaire')
 
-        # 🔍 Ajout de la recherche par mots-clés
+        # 🔍 Recherche plein texte (nom, n° d'offre, n° Kairos), triée par pertinence
         mot_cle = self.request.GET.get('q', '').strip()
         if mot_cle:
-            queryset = queryset.filter(
-                Q(nom__icontains=mot_cle) |
-                Q(num_offre__icontains=mot_cle) |
-                Q(centre__nom__icontains=mot_cle) |
-                Q(type_offre__nom__icontains=mot_cle) |
-                Q(statut__nom__icontains=mot_cle)
-            )
+            queryset = index_recherche.filtrer(queryset, mot_cle)
 
         # 🔍 Application des filtres SEULEMENT si une valeur est sélectionnée
         centre_id = self.request.GET.get('centre', '').strip()
@@ -86,9 +107,8 @@ class FormationListView(BaseListView):
             elif periode == 'terminee':
                 queryset = queryset.filter(end_date__lt=today)
             elif periode == 'a_recruter':
-                queryset = queryset.filter(total_places__gt=F('total_inscrits'))
+                queryset = queryset.filter(places_disponibles__gt=0)
 
-        print("Formations après filtrage :", queryset)  # ✅ Debug
 
         return queryset
 
@@ -96,18 +116,20 @@ class FormationListView(BaseListView):
         """Ajoute les statistiques, les centres, types d'offres et statuts au contexte pour le template."""
         context = super().get_context_data(**kwargs)
 
+        # 📊 Statistiques calculées en une seule requête (et mises en cache)
+        stats = Formation.objects.statistiques()
         context['stats'] = [
-            (Formation.objects.count(), "Total", "primary"),
-            (Formation.objects.formations_actives().count(), "Actives", "success"),
-            (Formation.objects.formations_a_venir().count(), "À venir", "info"),
-            (Formation.objects.formations_terminees().count(), "Terminées", "secondary"),
-            (Formation.objects.formations_a_recruter().count(), "À recruter", "warning"),
+            (stats['total'], "Total", "primary"),
+            (stats['actives'], "Actives", "success"),
+            (stats['a_venir'], "À venir", "info"),
+            (stats['terminees'], "Terminées", "secondary"),
+            (stats['a_recruter'], "À recruter", "warning"),
         ]
 
-        # ✅ Ajout des données pour les filtres
-        context['centres'] = Centre.objects.all()
-        context['types_offre'] = TypeOffre.objects.all()
-        context['statuts'] = Statut.objects.all()
+        # ✅ Ajout des données pour les filtres (référentiel en mémoire, sans requête)
+        context['centres'] = referentiel.centres.tous()
+        context['types_offre'] = referentiel.types_offre.tous()
+        context['statuts'] = referentiel.statuts.tous()
 
         # ✅ Ajout des filtres actifs pour ne pas les perdre après soumission
         context['filters'] = {
@@ -116,49 +138,72 @@ class FormationListView(BaseListView):
             'statut': self.request.GET.get('statut', ''),
             'periode': self.request.GET.get('periode', ''),
             'q': self.request.GET.get('q', ''),  # ✅ Ajout de la recherche au contexte
+            'tri': self.get_tri() or '',
         }
 
-        # ✅ Ajout des noms de colonnes pour l'affichage
-        context['colonnes'] = [
-            {'nom': 'Nom', 'field': 'nom'},
-            {'nom': 'Centre', 'field': 'centre__nom'},
-            {'nom': 'Type', 'field': 'type_offre__nom'},
-            {'nom': 'Statut', 'field': 'statut__nom'},
-            {'nom': 'N° Offre', 'field': 'num_offre'},
-            {'nom': 'Début', 'field': 'start_date'},
-            {'nom': 'Fin', 'field': 'end_date'},
-            {'nom': 'Places CRIF', 'field': 'places_restantes_crif'},
-            {'nom': 'Places MP', 'field': 'places_restantes_mp'},
-            {'nom': 'Total places', 'field': 'total_places'},
-            {'nom': 'Disponibles', 'field': 'places_disponibles'},
-            {'nom': 'Saturation (%)', 'field': 'taux_saturation'},
-        ]
+        # ✅ Ajout des noms de colonnes pour l'affichage et le tri
+        context['colonnes'] = self.colonnes
         return context
 
 
-class FormationDetailView(BaseDetailView):
-    """Vue affichant les détails d'une formation"""
+class FormationExportView(ExportCSVMixin, FormationListView):
+    """
+    Export CSV (en streaming) des formations de la liste, avec les mêmes filtres, la même recherche et le même tri.
+    """
+    # Colonnes relationnelles lues par identifiant et traduites par le référentiel en mémoire (sans jointure)
+    colonnes_referentiel = {
+        'centre__nom': ('centre_id', referentiel.centres),
+        'type_offre__nom': ('type_offre_id', referentiel.types_offre),
+        'statut__nom': ('statut_id', referentiel.statuts),
+    }
+
+    nom_fichier = 'formations.csv'
+
+    @property
+    def entete(self):
+        return ['ID'] + [colonne['nom'] for colonne in self.colonnes]
+
+    def get_lignes(self):
+        queryset = self.get_queryset()
+        queryset = queryset.order_by(*self.get_ordre_curseur(queryset))
+
+        champs = ['id'] + [
+            self.colonnes_referentiel.get(colonne['field'], (colonne['field'],))[0] for colonne in self.colonnes
+        ]
+        tables = [None] + [
+            self.colonnes_referentiel.get(colonne['field'], (None, None))[1] for colonne in self.colonnes
+        ]
+        return (
+            [table.libelle(valeur) if table else valeur for table, valeur in zip(tables, ligne)]
+            for ligne in export_csv.lire_par_lots(queryset, champs)
+        )
+
+
+class FormationDetailView(DetailConditionnelMixin, BaseDetailView):
+    """Vue affichant les détails d'une formation (GET conditionnel : 304 si rien n'a changé)"""
     model = Formation
     context_object_name = 'formation'
     template_name = 'formations/formation_detail.html'
+    relations_validateur = ('commentaires', 'evenements', 'documents', 'entreprises', 'historique_formations')
+    tables_validateur = ('centre', 'type_offre', 'statut')
+
+    def get_queryset(self):
+        """Charge centre, type d'offre et statut avec la formation"""
+        return super().get_queryset().select_related('centre', 'type_offre', 'statut')
 
     def get_context_data(self, **kwargs):
         """Ajoute les commentaires, evenements et autres données au contexte"""
         context = super().get_context_data(**kwargs)
         formation = self.object
 
-    # Récupération du dernier commentaire avec toutes ses infos
-        dernier_commentaire = formation.get_commentaires().order_by('-created_at').first()
-
-    # ✅ Entreprises associées
-        context['entreprises'] = formation.entreprises.all()
+        # ✅ Commentaires évalués une seule fois : le dernier commentaire est le premier de la liste
+        commentaires = list(formation.get_commentaires().order_by('-created_at'))
 
         # ✅ Entreprises disponibles (celles qui ne sont pas encore associées)
         context['entreprises_disponibles'] = Entreprise.objects.exclude(id__in=formation.entreprises.values_list('id', flat=True))
 
-
-        context['dernier_commentaire'] = dernier_commentaire  # ✅ Ajout du dernier commentaire complet
-        context['commentaires'] = formation.get_commentaires().order_by('-created_at')
+        context['dernier_commentaire'] = commentaires[0] if commentaires else None  # ✅ Ajout du dernier commentaire complet
+        context['commentaires'] = commentaires
         context['evenements'] = formation.get_evenements().order_by('-event_date')
         context['documents'] = formation.documents.all().order_by('-created_at')
         context['entreprises'] = formation.get_entreprises()
@@ -249,6 +294,11 @@ class FormationCreateView(PermissionRequiredMixin, BaseCreateView):
         'entresformation', 'nombre_candidats', 'nombre_entretiens'
     ]
 
+    def get_form(self, form_class=None):
+        """Alimente les listes déroulantes de référence depuis le référentiel en mémoire"""
+        form = super().get_form(form_class)
+        return appliquer_choix_referentiel(form)
+
     def form_valid(self, form):
         """Associe l'utilisateur connecté à la formation et crée un historique"""
         with transaction.atomic():
@@ -276,6 +326,11 @@ class FormationUpdateView(PermissionRequiredMixin, BaseUpdateView):
     template_name = 'formations/formation_form.html'
     fields = FormationCreateView.fields  # ✅ Réutilisation des champs
 
+    def get_form(self, form_class=None):
+        """Alimente les listes déroulantes de référence depuis le référentiel en mémoire"""
+        form = super().get_form(form_class)
+        return appliquer_choix_referentiel(form)
+
     def form_valid(self, form):
         """Détecte les modifications et met à jour l'historique"""
         with transaction.atomic():
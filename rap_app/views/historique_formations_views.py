@@ -1,17 +1,17 @@
-from django.views.generic import TemplateView
-from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import F, Q
-from django.http import JsonResponse, HttpResponse
-import csv
+from django.http import JsonResponse
 
 from ..models import HistoriqueFormation, Formation
-from .base_views import BaseListView, BaseDetailView
+from ..utils import export_csv, index_recherche
+from .base_views import BaseListView, BaseDetailView, ExportCSVMixin
 
 
 class HistoriqueFormationListView(BaseListView):
     """Liste des historiques de formation"""
     model = HistoriqueFormation
     context_object_name = 'historiques'
+    pagination_curseur = True
+    ordre_curseur = ['-created_at', '-id']
     
     def get_queryset(self):
         queryset = super().get_queryset().select_related('formation', 'utilisateur')
@@ -45,7 +45,7 @@ class HistoriqueFormationListView(BaseListView):
         if q:
             queryset = queryset.filter(
                 Q(action__icontains=q) |
-                Q(formation__nom__icontains=q) |
+                index_recherche.q_recherche(Formation, q, prefixe='formation__') |
                 Q(utilisateur__username__icontains=q) |
                 Q(utilisateur__first_name__icontains=q) |
                 Q(utilisateur__last_name__icontains=q)
@@ -89,61 +89,35 @@ class HistoriqueFormationDetailView(BaseDetailView):
         return context
 
 
-class HistoriqueFormationExportView(LoginRequiredMixin, TemplateView):
-    """Vue pour exporter les historiques de formation"""
+class HistoriqueFormationExportView(ExportCSVMixin, HistoriqueFormationListView):
+    """
+    Vue pour exporter les historiques de formation (CSV en streaming).
+    Reprend les filtres de la liste (`get_queryset`) : l'export correspond exactement aux résultats affichés.
+    """
+    nom_fichier = 'historique_formations.csv'
+    entete = [
+        'ID', 'Formation', 'Utilisateur', 'Action', 
+        'Ancien statut', 'Nouveau statut', 
+        'Inscrits CRIF', 'Inscrits MP', 'Total inscrits', 'Total places', 
+        'Taux remplissage', 'Date'
+    ]
+    champs = [
+        'id', 'formation__nom', 'utilisateur__username', 'action',
+        'ancien_statut', 'nouveau_statut',
+        'inscrits_crif', 'inscrits_mp', 'inscrits_total', 'total_places',
+        'taux_remplissage', 'created_at'
+    ]
     
-    def get(self, request, *args, **kwargs):
-        # Récupérer les paramètres de filtrage
-        formation_id = request.GET.get('formation')
-        utilisateur_id = request.GET.get('utilisateur')
-        action = request.GET.get('action')
-        date_debut = request.GET.get('date_debut')
-        date_fin = request.GET.get('date_fin')
-        
-        # Construire la requête
-        queryset = HistoriqueFormation.objects.select_related('formation', 'utilisateur')
-        
-        if formation_id:
-            queryset = queryset.filter(formation_id=formation_id)
-        
-        if utilisateur_id:
-            queryset = queryset.filter(utilisateur_id=utilisateur_id)
-        
-        if action:
-            queryset = queryset.filter(action__icontains=action)
-        
-        if date_debut:
-            queryset = queryset.filter(created_at__date__gte=date_debut)
-            
-        if date_fin:
-            queryset = queryset.filter(created_at__date__lte=date_fin)
-        
-        # Export en CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="historique_formations.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Formation', 'Utilisateur', 'Action', 
-            'Ancien statut', 'Nouveau statut', 
-            'Inscrits CRIF', 'Inscrits MP', 'Total inscrits', 'Total places', 
-            'Taux remplissage', 'Date'
-        ])
-        
-        for historique in queryset:
-            writer.writerow([
-                historique.id,
-                historique.formation.nom if historique.formation else 'N/A',
-                str(historique.utilisateur) if historique.utilisateur else 'N/A',
-                historique.action,
-                historique.ancien_statut or 'N/A',
-                historique.nouveau_statut or 'N/A',
-                historique.inscrits_crif or 0,
-                historique.inscrits_mp or 0,
-                historique.inscrits_total or 0,
-                historique.total_places or 0,
-                "{:.2f}%".format(historique.taux_remplissage) if historique.taux_remplissage else '0.00%',
-                historique.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        return response
\ No newline at end of file
+    def get_lignes(self):
+        return (
+            [
+                id_, formation or 'N/A', utilisateur or 'N/A', action,
+                ancien_statut or 'N/A', nouveau_statut or 'N/A',
+                inscrits_crif or 0, inscrits_mp or 0, inscrits_total or 0, total_places or 0,
+                "{:.2f}%".format(taux) if taux else '0.00%',
+                created_at.strftime('%Y-%m-%d %H:%M:%S')
+            ]
+            for (id_, formation, utilisateur, action, ancien_statut, nouveau_statut,
+                 inscrits_crif, inscrits_mp, inscrits_total, total_places, taux, created_at)
+            in export_csv.lire_par_lots(self.get_queryset(), self.champs)
+        )
@@ -1,18 +1,18 @@
-from django.views import View
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.db.models import Count, Sum, Avg, F, Q
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponseRedirect
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
-import csv
 import io
 
-from ..models import Rapport, Formation, Centre, TypeOffre, Statut, Evenement, HistoriqueFormation
-from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView
+from ..models import Rapport, Formation, Centre, TypeOffre, Statut, HistoriqueFormation, Tache
+from ..utils import export_csv
+from .base_views import BaseListView, BaseDetailView, BaseCreateView, BaseUpdateView, BaseDeleteView, ExportCSVMixin
 
 
 class RapportListView(BaseListView):
@@ -132,7 +132,7 @@ class RapportCreateView(PermissionRequiredMixin, BaseCreateView):
                 form.initial['formation'] = formation
                 
                 # Pré-remplir avec les données actuelles de la formation
-                form.initial['total_inscrits'] = formation.inscrits_total
+                form.initial['total_inscrits'] = formation.total_inscrits
                 form.initial['inscrits_crif'] = formation.inscrits_crif
                 form.initial['inscrits_mp'] = formation.inscrits_mp
                 form.initial['total_places'] = formation.total_places
@@ -269,160 +269,102 @@ class RapportGenerationView(LoginRequiredMixin, TemplateView):
                     messages.error(request, "La date de début doit être antérieure à la date de fin.")
                     return self.get(request, *args, **kwargs)
             
-            # Génération par période (pour toutes les formations)
+            # Génération confiée à une tâche de fond (suivi via l'endpoint de statut des tâches)
+            if request.POST.get('arriere_plan') and periode and type_generation in ('periode', 'formation'):
+                if not (date_debut and date_fin):
+                    raise ValidationError("Les dates de début et de fin sont obligatoires.")
+                parametres = {
+                    'periode': periode,
+                    'date_debut': date_debut.isoformat(),
+                    'date_fin': date_fin.isoformat(),
+                }
+                if type_generation == 'formation':
+                    parametres['formations'] = [get_object_or_404(Formation, pk=formation_id).pk]
+                tache = Tache.objects.mettre_en_file('generer_rapports', parametres, utilisateur=request.user)
+                messages.info(request, f"La génération des rapports a été lancée en arrière-plan (tâche n°{tache.pk}).")
+                return self.get(request, *args, **kwargs)
+            
+            # Génération par période (pour toutes les formations actives), en quelques requêtes
             if type_generation == 'periode' and periode:
-                formations = Formation.objects.formations_actives()
-                
-                for formation in formations:
-                    # Vérifier si un rapport similaire existe déjà
-                    rapport_existant = Rapport.objects.filter(
-                        formation=formation,
-                        periode=periode,
-                        date_debut=date_debut,
-                        date_fin=date_fin
-                    ).exists()
-                    
-                    if not rapport_existant:
-                        # Calculer les valeurs à partir des données existantes
-                        nombre_evenements = Evenement.objects.filter(
-                            formation=formation,
-                            event_date__gte=date_debut,
-                            event_date__lte=date_fin
-                        ).count()
-                        
-                        # Créer le rapport
-                        Rapport.objects.create(
-                            formation=formation,
-                            periode=periode,
-                            date_debut=date_debut,
-                            date_fin=date_fin,
-                            total_inscrits=formation.inscrits_total,
-                            inscrits_crif=formation.inscrits_crif,
-                            inscrits_mp=formation.inscrits_mp,
-                            total_places=formation.total_places,
-                            nombre_evenements=nombre_evenements,
-                            nombre_candidats=getattr(formation.ressource, 'nombre_candidats', 0) or 0,
-                            nombre_entretiens=getattr(formation.ressource, 'nombre_entretiens', 0) or 0
-                        )
-                        rapports_crees += 1
+                rapports_crees = Rapport.objects.generer(periode, date_debut, date_fin)
             
             # Génération pour une formation spécifique
             elif type_generation == 'formation' and formation_id:
                 formation = get_object_or_404(Formation, pk=formation_id)
-                
-                # Vérifier si un rapport similaire existe déjà
-                rapport_existant = Rapport.objects.filter(
-                    formation=formation,
-                    periode=periode,
-                    date_debut=date_debut,
-                    date_fin=date_fin
-                ).exists()
-                
-                if not rapport_existant:
-                    # Calculer les valeurs à partir des données existantes
-                    nombre_evenements = Evenement.objects.filter(
-                        formation=formation,
-                        event_date__gte=date_debut,
-                        event_date__lte=date_fin
-                    ).count()
-                    
-                    # Créer le rapport
-                    Rapport.objects.create(
-                        formation=formation,
-                        periode=periode,
-                        date_debut=date_debut,
-                        date_fin=date_fin,
-                        total_inscrits=formation.inscrits_total,
-                        inscrits_crif=formation.inscrits_crif,
-                        inscrits_mp=formation.inscrits_mp,
-                        total_places=formation.total_places,
-                        nombre_evenements=nombre_evenements,
-                        nombre_candidats=getattr(formation.ressource, 'nombre_candidats', 0) or 0,
-                        nombre_entretiens=getattr(formation.ressource, 'nombre_entretiens', 0) or 0
-                    )
-                    rapports_crees += 1
+                rapports_crees = Rapport.objects.generer(
+                    periode, date_debut, date_fin, formations=Formation.objects.filter(pk=formation.pk)
+                )
             
             if rapports_crees > 0:
                 messages.success(request, f"{rapports_crees} rapport(s) généré(s) avec succès.")
             else:
                 messages.info(request, "Aucun nouveau rapport n'a été généré. Peut-être qu'ils existent déjà pour cette période.")
                 
+        except ValidationError as e:
+            messages.error(request, f"Erreur lors de la génération des rapports : {' '.join(e.messages)}")
         except Exception as e:
             messages.error(request, f"Erreur lors de la génération des rapports : {str(e)}")
         
         return self.get(request, *args, **kwargs)
 
 
-class RapportExportView(LoginRequiredMixin, View):
-    """Vue pour exporter les données des rapports"""
+class RapportExportView(ExportCSVMixin, RapportListView):
+    """
+    Vue pour exporter les données des rapports (CSV en streaming).
+    Reprend les filtres de la liste (`get_queryset`) : l'export correspond exactement aux résultats affichés.
+    """
+    nom_fichier = 'rapports.csv'
+    entete = [
+        'ID', 'Formation', 'Centre', 'Type d\'offre', 'Période', 
+        'Date début', 'Date fin', 'Inscrits CRIF', 'Inscrits MP', 
+        'Total inscrits', 'Total places', 'Taux remplissage (%)',
+        'Nombre événements', 'Nombre candidats', 'Nombre entretiens',
+        'Taux transformation (%)', 'Date création'
+    ]
+    champs = [
+        'id', 'formation__nom', 'formation__centre__nom', 'formation__type_offre__nom', 'periode',
+        'date_debut', 'date_fin', 'inscrits_crif', 'inscrits_mp',
+        'total_inscrits', 'total_places', 'nombre_evenements', 'nombre_candidats', 'nombre_entretiens',
+        'created_at', 'formation_id'
+    ]
     
     def get(self, request, *args, **kwargs):
         from django.contrib import messages
         
         format_export = request.GET.get('format', 'csv')
         
-        # Récupérer les filtres
-        periode = request.GET.get('periode')
-        formation_id = request.GET.get('formation')
-        date_debut = request.GET.get('date_debut')
-        date_fin = request.GET.get('date_fin')
-        
-        # Construire la requête en fonction des filtres
-        queryset = Rapport.objects.select_related('formation', 'formation__centre', 'formation__type_offre')
-        
-        if periode:
-            queryset = queryset.filter(periode=periode)
-        
-        if formation_id:
-            queryset = queryset.filter(formation_id=formation_id)
-        
-        if date_debut:
-            queryset = queryset.filter(date_fin__gte=date_debut)
-            
-        if date_fin:
-            queryset = queryset.filter(date_debut__lte=date_fin)
-        
-        # Ordonner les résultats
-        queryset = queryset.order_by('-date_fin')
-        
-        # Export CSV
-        if format_export == 'csv':
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="rapports.csv"'
-            
-            writer = csv.writer(response)
-            writer.writerow([
-                'ID', 'Formation', 'Centre', 'Type d\'offre', 'Période', 
-                'Date début', 'Date fin', 'Inscrits CRIF', 'Inscrits MP', 
-                'Total inscrits', 'Total places', 'Taux remplissage (%)',
-                'Nombre événements', 'Nombre candidats', 'Nombre entretiens',
-                'Taux transformation (%)', 'Date création'
-            ])
-            
-            for rapport in queryset:
-                writer.writerow([
-                    rapport.id,
-                    rapport.formation.nom if rapport.formation else 'Global',
-                    rapport.formation.centre.nom if rapport.formation and rapport.formation.centre else '-',
-                    rapport.formation.type_offre.nom if rapport.formation and rapport.formation.type_offre else '-',
-                    rapport.get_periode_display(),
-                    rapport.date_debut,
-                    rapport.date_fin,
-                    rapport.inscrits_crif,
-                    rapport.inscrits_mp,
-                    rapport.total_inscrits,
-                    rapport.total_places,
-                    "{:.2f}".format(rapport.taux_remplissage),
-                    rapport.nombre_evenements,
-                    rapport.nombre_candidats,
-                    rapport.nombre_entretiens,
-                    "{:.2f}".format(rapport.taux_transformation),
-                    rapport.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                ])
-            
-            return response
-            
         # Format non pris en charge
-        else:
+        if format_export != 'csv':
             messages.error(request, f"Format d'export '{format_export}' non pris en charge.")
-            return reverse('rapport-list')
\ No newline at end of file
+            return HttpResponseRedirect(reverse('rapport-list'))
+        
+        return super().get(request, *args, **kwargs)
+    
+    def get_lignes(self):
+        periodes = dict(Rapport.PERIODE_CHOICES)
+        for (id_, formation, centre, type_offre, periode, date_debut, date_fin, inscrits_crif, inscrits_mp,
+             total_inscrits, total_places, nombre_evenements, nombre_candidats, nombre_entretiens,
+             created_at, formation_id) in export_csv.lire_par_lots(self.get_queryset(), self.champs):
+            # Mêmes formules que Rapport.taux_remplissage / Rapport.taux_transformation
+            taux_remplissage = (total_inscrits / total_places) * 100 if total_places > 0 else 0
+            taux_transformation = (total_inscrits / nombre_candidats) * 100 if nombre_candidats > 0 else 0
+            yield [
+                id_,
+                formation if formation_id else 'Global',
+                centre or '-',
+                type_offre or '-',
+                periodes.get(periode, periode),
+                date_debut,
+                date_fin,
+                inscrits_crif,
+                inscrits_mp,
+                total_inscrits,
+                total_places,
+                "{:.2f}".format(taux_remplissage),
+                nombre_evenements,
+                nombre_candidats,
+                nombre_entretiens,
+                "{:.2f}".format(taux_transformation),
+                created_at.strftime('%Y-%m-%d %H:%M:%S')
+            ]
+    
\ No newline at end of file
@@ -0,0 +1,22 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
+from django.views import View
+
+from ..utils import autocompletion
+
+
+class AutocompletionView(LoginRequiredMixin, View):
+    """
+    Autocomplétion par préfixe (`?q=pyth&limite=10`) des formations, centres ou entreprises,
+    servie par l'index en mémoire : aucune requête SQL tant que les tables n'ont pas changé.
+    """
+
+    def get(self, request, source):
+        index = autocompletion.SOURCES.get(source)
+        if index is None:
+            raise Http404("Source d'autocomplétion inconnue.")
+        try:
+            limite = min(max(int(request.GET.get('limite', 10)), 1), autocompletion.LIMITE_MAXIMALE)
+        except ValueError:
+            limite = 10
+        return JsonResponse({'resultats': index.rechercher(request.GET.get('q', ''), limite)})
@@ -0,0 +1,58 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+
+from ..models import Tache
+from ..utils import telechargement
+
+
+def etat_tache(tache):
+    """Représentation JSON de l'état d'une tâche de fond."""
+    return {
+        'id': tache.pk,
+        'type': tache.type_tache,
+        'statut': tache.statut,
+        'statut_display': tache.get_statut_display(),
+        'progression': tache.progression,
+        'message': tache.message,
+        'tentatives': tache.tentatives,
+        'resultat': tache.resultat,
+        'fichier': reverse('tache-fichier', args=[tache.pk]) if tache.fichier else None,
+        'terminee': tache.est_terminee,
+        'url_statut': reverse('tache-statut', args=[tache.pk]),
+    }
+
+
+def reponse_tache(tache):
+    """Réponse `202 Accepted` renvoyée lorsqu'un traitement est confié à une tâche de fond."""
+    return JsonResponse(etat_tache(tache), status=202)
+
+
+def tache_autorisee(request, pk):
+    """Tâche d'id `pk`, si l'utilisateur en est le demandeur ou membre du staff (sinon `404`)."""
+    tache = get_object_or_404(Tache, pk=pk)
+    if not request.user.is_staff and tache.utilisateur_id != request.user.pk:
+        raise Http404
+    return tache
+
+
+class TacheStatutView(LoginRequiredMixin, View):
+    """Statut et progression d'une tâche de fond (JSON), pour son demandeur ou un membre du staff"""
+
+    def get(self, request, pk):
+        return JsonResponse(etat_tache(tache_autorisee(request, pk)))
+
+
+class TacheFichierView(LoginRequiredMixin, View):
+    """Téléchargement du fichier produit par une tâche de fond (export...), pour son demandeur ou un membre du staff"""
+
+    def get(self, request, pk):
+        tache = tache_autorisee(request, pk)
+        if not tache.fichier:
+            raise Http404("Cette tâche n'a pas produit de fichier.")
+        try:
+            return telechargement.reponse_fichier(request, tache.fichier, (tache.resultat or {}).get('nom_fichier'))
+        except FileNotFoundError:
+            raise Http404("Le fichier de cette tâche est introuvable.")
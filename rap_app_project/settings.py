@@ -50,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'rap_app.middleware.InstrumentationSQLMiddleware',
 ]
 
 ROOT_URLCONF = 'rap_app_project.urls'
@@ -125,3 +126,38 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Instrumentation SQL (rap_app.middleware.InstrumentationSQLMiddleware)
+# Au-delà de ce nombre de requêtes SQL, la requête HTTP est journalisée en avertissement
+
+RAP_APP_SEUIL_REQUETES_SQL = 30
+
+# Tâches de fond (manage.py executer_taches)
+# Durée (en secondes) au-delà de laquelle une tâche « en cours » est considérée comme bloquée et remise en file
+
+RAP_APP_TACHES_DELAI_BLOCAGE = 3600
+
+# Téléchargement des documents (rap_app.utils.telechargement)
+# None : fichiers envoyés par Django en streaming ; 'x-sendfile' (Apache) ou 'x-accel-redirect' (Nginx) :
+# envoi délégué au proxy frontal, qui sert les fichiers sous RAP_APP_TELECHARGEMENT_PREFIXE_INTERNE (Nginx)
+
+RAP_APP_TELECHARGEMENT_DELEGUE = None
+RAP_APP_TELECHARGEMENT_PREFIXE_INTERNE = '/protege/'
+
+# Journal des recherches (rap_app.utils.journal_recherches)
+# Les recherches sont mises en tampon en mémoire et écrites par lots (bulk_create) par un thread de fond :
+# toutes les RAP_APP_RECHERCHES_INTERVALLE_VIDAGE secondes, ou dès RAP_APP_RECHERCHES_TAILLE_LOT recherches.
+# Au-delà de RAP_APP_RECHERCHES_CAPACITE recherches en attente, les suivantes sont ignorées.
+
+RAP_APP_RECHERCHES_INTERVALLE_VIDAGE = 5
+RAP_APP_RECHERCHES_TAILLE_LOT = 200
+RAP_APP_RECHERCHES_CAPACITE = 10000
+RAP_APP_RECHERCHES_VIDAGE_ARRIERE_PLAN = True
+
+# Agrégats quotidiens des recherches (manage.py agreger_recherches)
+# Nombre de termes conservés par jour, et durée (en jours) pendant laquelle les recherches brutes
+# agrégées sont gardées avant d'être supprimées
+
+RAP_APP_RECHERCHES_TERMES_PAR_JOUR = 100
+RAP_APP_RECHERCHES_RETENTION_JOURS = 30